@@ -0,0 +1,393 @@
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+from utils import merge_markdown_files, OrderedMarkdownMerger, PDF_CHUNK_SIZE, PDF_TABLES, DOCX_STREAM_THRESHOLD
+from batch import convert_to_markdown, convert_from_markdown, convert_merge_part, default_workers, split_workers
+from cache import ConversionCache, PageCache
+from jobs import JobScheduler
+from assets import assets_dir_for
+from merge_docs import concat_docx, concat_pdf, pdf_concat_available
+
+# 批量转换结果
+# success: 批次是否完成（单个文件出错不影响）; message: 完成消息; processed: 成功处理的文件数;
+# sections: 章节总数; cached: 使用缓存的文件数; outputs: 输出文件列表; errors: [(输入文件, 错误信息)];
+# cancelled: 批次是否被取消
+BatchResult = namedtuple('BatchResult', ['success', 'message', 'processed', 'sections',
+                                         'cached', 'outputs', 'errors', 'cancelled'], defaults=[False])
+
+
+def detect_file_type(path):
+    """根据扩展名判断输入文件类型：'pdf' 或 'word'"""
+    return 'pdf' if os.path.splitext(path)[1].lower() == '.pdf' else 'word'
+
+
+class DocumentConverter:
+    """
+    不依赖PyQt5的批量转换接口
+
+    ToMarkdownThread/FromMarkdownThread 和命令行都通过它完成转换，
+    进度通过回调报告：on_progress(进度值, 消息)、on_file_progress(已完成文件数, 总文件数)。
+    传入 profiler（profiling.BatchProfiler）时记录每个文件各阶段的耗时，批次结束后写出报告。
+    传入 token（jobs.CancellationToken）可从其他线程取消或暂停批次；timeout 限制单个文件的转换秒数。
+    """
+
+    def __init__(self, output_dir, max_workers=None, pdf_chunk_size=PDF_CHUNK_SIZE,
+                 cache_dir=None, force=False, on_progress=None, on_file_progress=None, profiler=None,
+                 incremental=False, token=None, timeout=None, stream_threshold=DOCX_STREAM_THRESHOLD,
+                 extract_images=False, docx_engine=None, pdf_tables=PDF_TABLES):
+        self.output_dir = output_dir
+        self.max_workers = max_workers or default_workers()  # 并行进程数
+        self.pdf_chunk_size = pdf_chunk_size  # PDF页面分片大小
+        self.cache_dir = cache_dir  # 转换缓存目录，None表示不使用缓存
+        self.force = force  # 忽略缓存强制重新转换
+        self.on_progress = on_progress
+        self.on_file_progress = on_file_progress
+        self.profiler = profiler
+        self.incremental = incremental  # 分割模式下只重写发生变化的章节
+        self.token = token  # 取消/暂停标志
+        self.timeout = timeout  # 单个文件的超时秒数，None表示不限制
+        self.stream_threshold = stream_threshold  # Word文件达到此大小（字节）时改为流式读取
+        self.extract_images = extract_images  # 导出图片到输出目录的 assets 目录
+        self.docx_engine = docx_engine  # Markdown转Word的引擎 'native'/'pandoc'，None为默认
+        self.pdf_tables = pdf_tables  # PDF表格的处理方式，见 utils.PDF_TABLE_MODES
+
+    def _progress(self, value, message):
+        if self.on_progress:
+            self.on_progress(value, message)
+
+    def _file_progress(self, current, total):
+        if self.on_file_progress:
+            self.on_file_progress(current, total)
+
+    @property
+    def cancelled(self):
+        return bool(self.token and self.token.cancelled)
+
+    def _run(self, func, tasks, paths, kind, max_workers, on_progress=None):
+        """
+        通过 JobScheduler 执行任务（支持取消、暂停和单文件超时）
+        启用性能记录时由工作进程记录各阶段耗时，产出的结果与未启用时相同
+        """
+        scheduler = JobScheduler(max_workers, self.timeout, self.token)
+        if not self.profiler:
+            yield from scheduler.run(func, tasks, on_progress=on_progress)
+            return
+        func, tasks = self.profiler.wrap(func, tasks, paths, kind)
+        for idx, result, error in scheduler.run(func, tasks, on_progress=on_progress):
+            yield idx, self.profiler.unwrap(paths[idx], kind, result, error), error
+
+    def _cancelled_result(self, completed, total, processed, sections, cached, outputs, errors):
+        return BatchResult(False, f"转换已取消（已完成 {completed}/{total} 个文件）", processed, sections,
+                           cached, outputs, errors, True)
+
+    def _finish_profile(self):
+        if self.profiler:
+            report_path = self.profiler.finish()
+            self._progress(100, f"性能报告已写入 {report_path}，最慢的文件: {self.profiler.summary()}")
+
+    def to_markdown(self, paths, mode='simple', merge=False, file_type=None):
+        """
+        将Word/PDF文档转换为Markdown
+        :param paths: 输入文件路径列表
+        :param mode: 'simple' 或 'sections'（仅Word有效）
+        :param merge: 是否额外生成合并文档
+        :param file_type: 'word' 或 'pdf'，为None时按扩展名逐个判断
+        :return: BatchResult
+        """
+        try:
+            return self._to_markdown(list(paths), mode, merge, file_type)
+        except Exception as e:
+            return BatchResult(False, f"转换失败: {str(e)}", 0, 0, 0, [], [])
+
+    def _to_markdown(self, paths, mode, merge, file_type):
+        # 确保输出目录存在
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        file_types = [file_type or detect_file_type(path) for path in paths]
+        batch_type = 'pdf' if file_types and all(t == 'pdf' for t in file_types) else 'word'
+
+        total_files = len(paths)
+        processed_count = 0
+        total_sections = 0
+        cached_count = 0
+        page_hits = page_misses = 0  # PDF页面缓存的命中/未命中页数
+        completed = 0
+        outputs = []
+        errors = []
+        assets = set()  # 批次中引用的图片文件（内容相同的图片只有一个文件）
+        page_fraction = {}  # 进行中文件的页面完成比例
+        logged_percent = {}
+
+        type_name = "PDF" if batch_type == 'pdf' else "Word"
+        self._progress(0, f"正在处理 {total_files} 个{type_name}文件（{self.max_workers} 个进程）...")
+
+        # 大PDF无法从文件级并行中获益，文件较少时把空闲进程用于页面分片
+        file_workers, page_workers = split_workers(self.max_workers, total_files)
+
+        tasks = [(path, self.output_dir, mode, ftype, page_workers if ftype == 'pdf' else 1,
+                  self.pdf_chunk_size, self.cache_dir, self.force, self.incremental, self.stream_threshold,
+                  self.extract_images, self.pdf_tables)
+                 for path, ftype in zip(paths, file_types)]
+
+        def on_page_progress(idx, current, total):
+            # 总进度 = 已完成文件 + 进行中文件的页面比例
+            page_fraction[idx] = current / total if total else 1
+            overall = int((completed + sum(page_fraction.values())) / total_files * 100)
+            percent = int(page_fraction[idx] * 100) // 10 * 10
+            if percent > logged_percent.get(idx, -1):
+                logged_percent[idx] = percent
+                file_name = os.path.basename(paths[idx])
+                self._progress(overall, f"正在提取PDF内容: {file_name} 第{current}/{total}页")
+
+        # 合并文档在转换过程中按输入顺序增量写出
+        merger = OrderedMarkdownMerger(os.path.join(self.output_dir, "合并文档.md"), total_files) if merge else None
+        try:
+            # 结果按完成顺序返回
+            for idx, result, error in self._run(convert_to_markdown, tasks, paths, 'to_md', file_workers,
+                                                on_page_progress if 'pdf' in file_types else None):
+                page_fraction.pop(idx, None)
+                completed += 1
+                self._file_progress(completed, total_files)
+                progress = int(completed / total_files * 100)
+
+                file_path = paths[idx]
+                file_name = os.path.splitext(os.path.basename(file_path))[0]
+
+                if error is not None:
+                    errors.append((file_path, str(error)))
+                    self._progress(progress, f"处理文件 {os.path.basename(file_path)} 时出错: {str(error)}")
+                    if merger:
+                        merger.skip(idx)
+                    continue
+
+                processed_count += result.files
+                total_sections += result.sections
+                cached_count += result.cached
+                page_hits += result.page_hits
+                page_misses += result.page_misses
+                outputs.extend(result.md_paths)
+                assets.update(result.assets)
+
+                if merger:
+                    # 轮到的文档立即写入合并文档，提前完成的只暂存输出文件路径
+                    merger.add(idx, file_name, result.md_paths)
+
+                suffix = "（使用缓存）" if result.cached else ""
+                if result.updated is not None:
+                    suffix = f"（更新 {result.updated} 个章节）"
+                if file_types[idx] == 'pdf':
+                    self._progress(progress, f"已完成PDF转换: {file_name}.md{suffix}")
+                elif mode == 'simple':
+                    self._progress(progress, f"已完成转换: {file_name}.md{suffix}")
+                else:
+                    self._progress(progress, f"已完成转换: {file_name} ({result.sections}个章节){suffix}")
+        finally:
+            merged = merger.close() if merger else False
+
+        if self.cancelled:
+            return self._cancelled_result(completed, total_files, processed_count, total_sections,
+                                          cached_count, outputs, errors)
+
+        if merged:
+            outputs.append(merger.output_path)
+            self._progress(100, f"已创建合并文档: 合并文档.md")
+
+        if self.extract_images:
+            self._progress(100, f"已导出 {len(assets)} 个图片（按内容去重）到 {assets_dir_for(self.output_dir)}")
+
+        if self.cache_dir:
+            evicted = ConversionCache(self.cache_dir).evict()
+            self._progress(100, f"缓存命中 {cached_count}/{total_files} 个文件，淘汰 {evicted} 个旧条目")
+            if page_hits or page_misses:
+                page_cache = PageCache(self.cache_dir)
+                evicted = page_cache.evict()
+                page_cache.close()
+                page_total = page_hits + page_misses
+                self._progress(100, f"PDF页面缓存命中 {page_hits}/{page_total} 页（{page_hits / page_total:.0%}），"
+                                    f"淘汰 {evicted} 个旧页面")
+        self._finish_profile()
+
+        # 完成消息
+        if batch_type == 'pdf':
+            msg = f"成功转换 {processed_count} 个PDF文件！"
+        elif mode == 'simple':
+            msg = f"成功转换 {processed_count} 个Word文件！"
+        else:
+            msg = f"成功转换 {processed_count} 个Word文件，共 {total_sections} 个章节！"
+        if merge and batch_type != 'pdf':
+            msg += " 并已合并为一个文档"
+
+        return BatchResult(True, msg, processed_count, total_sections, cached_count, outputs, errors)
+
+    def from_markdown(self, paths, fmt='word', merge=False):
+        """
+        将Markdown文件转换为Word/PDF
+        :param paths: Markdown文件路径列表
+        :param fmt: 目标格式 'word' 或 'pdf'
+        :param merge: 是否合并为一个输出文件（各文件并行转换后拼接）
+        :return: BatchResult
+        """
+        try:
+            return self._from_markdown(list(paths), fmt, merge)
+        except Exception as e:
+            return BatchResult(False, f"转换失败: {str(e)}", 0, 0, 0, [], [])
+
+    def _from_markdown(self, paths, fmt, merge):
+        # 确保输出目录存在
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        total_files = len(paths)
+        processed_count = 0
+        cached_count = 0
+        outputs = []
+        errors = []
+        format_name = "Word" if fmt == 'word' else "PDF"
+
+        # 合并输出：各文件并行转换为中间文档后按顺序拼接
+        if merge and total_files > 1 and self.max_workers > 1 and (fmt == 'word' or pdf_concat_available()):
+            completed, cached_count = self._merge_parts(paths, fmt, format_name, outputs, errors)
+            if self.cancelled and not outputs:  # 取消时不拼接
+                return self._cancelled_result(completed, total_files, processed_count, 0,
+                                              cached_count, outputs, errors)
+            processed_count = 1 if outputs else 0
+
+        # 只有一个进程时拼接没有收益；未安装pypdf时无法拼接PDF。先合并Markdown文件再整体转换
+        elif merge and total_files > 1:
+            self._progress(10, "正在合并Markdown文件...")
+
+            # 合并所有Markdown文件
+            merged_md_path = os.path.join(self.output_dir, "合并文档.md")
+            stats = merge_markdown_files(paths, merged_md_path)
+
+            self._progress(40, f"已合并 {stats['files']} 个Markdown文件"
+                               f"（{stats['bytes'] / 1048576:.1f} MB，{stats['bytes_per_sec'] / 1048576:.1f} MB/秒），开始转换...")
+
+            # 转换合并后的文件
+            self._progress(50, f"正在转换为{format_name}文档...")
+            task = (merged_md_path, self.output_dir, fmt, self.cache_dir, self.force, self.docx_engine)
+            results = list(self._run(convert_from_markdown, [task], [merged_md_path], 'from_md', 1))
+            if not results:
+                return self._cancelled_result(0, total_files, processed_count, 0, cached_count, outputs, errors)
+            _, result, error = results[0]
+            if error is not None:
+                raise error
+            success, output_path, cached = result
+
+            if success:
+                suffix = "（使用缓存）" if cached else ""
+                self._progress(100, f"已完成合并转换: {os.path.basename(output_path)}{suffix}")
+                processed_count = 1
+                cached_count += cached
+                outputs.append(output_path)
+            else:
+                errors.append((merged_md_path, "合并文档转换失败"))
+                self._progress(0, "合并文档转换失败")
+
+        # 单独处理每个文件
+        else:
+            self._progress(0, f"正在将 {total_files} 个Markdown文件转换为{format_name}（{self.max_workers} 个进程）...")
+            tasks = [(md_path, self.output_dir, fmt, self.cache_dir, self.force, self.docx_engine)
+                     for md_path in paths]
+            completed = 0
+
+            for idx, result, error in self._run(convert_from_markdown, tasks, paths, 'from_md', self.max_workers):
+                completed += 1
+                self._file_progress(completed, total_files)
+                progress = int(completed / total_files * 100)
+
+                md_path = paths[idx]
+                file_name = os.path.splitext(os.path.basename(md_path))[0]
+
+                if error is not None:
+                    errors.append((md_path, str(error)))
+                    self._progress(progress, f"处理文件 {os.path.basename(md_path)} 时出错: {str(error)}")
+                    continue
+
+                success, output_path, cached = result
+                if success:
+                    suffix = "（使用缓存）" if cached else ""
+                    self._progress(progress, f"已完成转换: {os.path.basename(output_path)}{suffix}")
+                    processed_count += 1
+                    cached_count += cached
+                    outputs.append(output_path)
+                else:
+                    errors.append((md_path, f"转换 {file_name} 失败"))
+                    self._progress(progress, f"转换 {file_name} 失败")
+
+            if self.cancelled:
+                return self._cancelled_result(completed, total_files, processed_count, 0,
+                                              cached_count, outputs, errors)
+
+        if self.cache_dir:
+            ConversionCache(self.cache_dir).evict()
+        self._finish_profile()
+
+        # 完成消息
+        if merge and total_files > 1 and not outputs:
+            msg = f"合并转换失败，没有生成{format_name}文档"
+        elif merge and total_files > 1:
+            msg = f"已将 {total_files} 个Markdown文件合并并转换为{format_name}文档！"
+        else:
+            msg = f"成功转换 {processed_count} 个Markdown文件为{format_name}！"
+
+        return BatchResult(True, msg, processed_count, 0, cached_count, outputs, errors)
+
+    def _merge_parts(self, paths, fmt, format_name, outputs, errors):
+        """
+        合并输出：各Markdown文件并行转换为中间文档，再按输入顺序拼接为一个文档
+        转换失败的文件记入errors并跳过，合并文档写入outputs
+        :return: (已完成的文件数, 使用缓存的文件数)；批次被取消时不拼接
+        """
+        total_files = len(paths)
+        ext = 'docx' if fmt == 'word' else 'pdf'
+        output_path = os.path.join(self.output_dir, f"合并文档.{ext}")
+        parts_dir = tempfile.mkdtemp(prefix='.merge-', dir=self.output_dir)
+        try:
+            self._progress(0, f"正在将 {total_files} 个Markdown文件分别转换为{format_name}"
+                              f"（{self.max_workers} 个进程），完成后合并...")
+            tasks = [(md_path, parts_dir, idx, fmt, self.cache_dir, self.force, self.docx_engine)
+                     for idx, md_path in enumerate(paths)]
+            parts = [None] * total_files
+            completed = 0
+            cached_count = 0
+
+            for idx, result, error in self._run(convert_merge_part, tasks, paths, 'from_md', self.max_workers):
+                completed += 1
+                self._file_progress(completed, total_files)
+                progress = int(completed / total_files * 90)
+                md_path = paths[idx]
+                file_name = os.path.splitext(os.path.basename(md_path))[0]
+
+                if error is not None:
+                    errors.append((md_path, str(error)))
+                    self._progress(progress, f"处理文件 {os.path.basename(md_path)} 时出错: {str(error)}")
+                    continue
+
+                success, part_path, cached = result
+                if success:
+                    parts[idx] = part_path
+                    cached_count += cached
+                    suffix = "（使用缓存）" if cached else ""
+                    self._progress(progress, f"已转换: {os.path.basename(md_path)}{suffix}")
+                else:
+                    errors.append((md_path, f"转换 {file_name} 失败"))
+                    self._progress(progress, f"转换 {file_name} 失败")
+
+            if self.cancelled:
+                return completed, cached_count
+
+            merged = [(path, os.path.splitext(os.path.basename(md_path))[0])
+                      for path, md_path in zip(parts, paths) if path]
+            if merged:
+                self._progress(95, f"正在拼接 {len(merged)} 个{format_name}文档...")
+                if fmt == 'word':
+                    concat_docx([path for path, _ in merged], output_path, separator=True)
+                else:
+                    concat_pdf([path for path, _ in merged], output_path, [title for _, title in merged])
+                outputs.append(output_path)
+                self._progress(100, f"已完成合并转换: {os.path.basename(output_path)}")
+            return completed, cached_count
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
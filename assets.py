@@ -0,0 +1,209 @@
+"""
+图片资源的内容寻址存储
+
+转换时提取的图片按内容的SHA-256命名保存到输出目录下的 assets 目录，Markdown中以相对路径引用。
+同一批次中内容相同的图片（如模板里反复出现的徽标）只保存一份。
+图片字节原样复制，不做解码或重新编码：Word图片从.docx压缩包中流式读取，
+PDF只导出本身就是完整图片文件的JPEG（DCTDecode）和JPEG 2000（JPXDecode）数据流。
+多个工作进程可以同时写入同一目录：先写临时文件再原子重命名。
+"""
+import os
+import zipfile
+import hashlib
+import tempfile
+import posixpath
+
+from utils import docx_main_part, docx_relationships, RT_IMAGE
+
+ASSETS_DIR = "assets"
+COPY_CHUNK = 1024 * 1024
+
+# 允许作为图片扩展名保存的后缀，其余统一为 .bin
+_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff', '.emf', '.wmf', '.svg',
+                     '.jp2', '.webp'}
+
+
+def assets_dir_for(output_dir):
+    return os.path.join(output_dir, ASSETS_DIR)
+
+
+def _extension(name):
+    ext = posixpath.splitext(name)[1].lower()
+    return ext if ext in _IMAGE_EXTENSIONS else '.bin'
+
+
+def markdown_ref(asset_path, md_dir):
+    """图片相对于Markdown文件所在目录的引用路径（统一使用 / 分隔）"""
+    return os.path.relpath(asset_path, md_dir).replace(os.sep, '/')
+
+
+class AssetStore:
+    """
+    内容寻址的图片目录
+
+    用法:
+        store = AssetStore('out/assets')
+        path = store.add_bytes(data, '.jpg')
+    """
+
+    def __init__(self, assets_dir):
+        self.assets_dir = assets_dir
+        self.written = 0  # 新写入的图片数
+        self.reused = 0  # 内容已存在而跳过写入的次数
+
+    def _target(self, digest, ext):
+        return os.path.join(self.assets_dir, digest + ext)
+
+    def _existing(self, path):
+        if os.path.exists(path):
+            self.reused += 1
+            return True
+        return False
+
+    def _commit(self, write, path):
+        """通过 write(文件对象) 写入临时文件后重命名为目标文件"""
+        os.makedirs(self.assets_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.assets_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            # 其他进程同时写入同一内容时后者覆盖前者，文件内容相同
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.written += 1
+        return path
+
+    def add_bytes(self, data, ext):
+        """保存内存中的图片数据，返回图片文件路径"""
+        path = self._target(hashlib.sha256(data).hexdigest(), ext)
+        if self._existing(path):
+            return path
+        return self._commit(lambda f: f.write(data), path)
+
+    def add_zip_member(self, zf, name):
+        """
+        从压缩包中流式保存图片，返回图片文件路径
+        先计算哈希，只有内容尚未保存时才再读一遍写入，重复的图片不产生任何写操作
+        """
+        digest = hashlib.sha256()
+        with zf.open(name) as src:
+            while chunk := src.read(COPY_CHUNK):
+                digest.update(chunk)
+        path = self._target(digest.hexdigest(), _extension(name))
+        if self._existing(path):
+            return path
+
+        def write(f):
+            with zf.open(name) as src:
+                while chunk := src.read(COPY_CHUNK):
+                    f.write(chunk)
+        return self._commit(write, path)
+
+
+class DocxImages:
+    """
+    把Word文档中的图片关系ID解析为Markdown引用路径，供 utils.iter_markdown_blocks 使用；
+    同一文档中多次引用的图片只读取一次
+
+    用法:
+        with DocxImages('a.docx', 'out/assets', 'out') as images:
+            text = extract_text_simple(doc, images)
+        images.used  # 文档引用的图片文件
+    """
+
+    def __init__(self, docx_path, assets_dir, md_dir):
+        self.docx_path = docx_path
+        self.store = AssetStore(assets_dir)
+        self.md_dir = md_dir
+        self.zf = None
+        self.targets = None  # 关系ID -> 图片部件在zip中的路径
+        self.refs = {}  # 关系ID -> 引用路径
+        self.used = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.zf:
+            self.zf.close()
+            self.zf = None
+
+    def __call__(self, rel_id):
+        if rel_id in self.refs:
+            return self.refs[rel_id]
+        if self.targets is None:
+            # 第一次遇到图片时才打开压缩包，没有图片的文档不产生额外开销
+            self.zf = zipfile.ZipFile(self.docx_path)
+            self.targets = {rid: target for rid, (rel_type, target)
+                            in docx_relationships(self.zf, docx_main_part(self.zf)).items()
+                            if rel_type == RT_IMAGE and target}
+        ref = None
+        target = self.targets.get(rel_id)
+        if target:
+            try:
+                path = self.store.add_zip_member(self.zf, target)
+            except KeyError:
+                path = None  # 关系指向的部件不存在
+            if path:
+                self.used.append(path)
+                ref = markdown_ref(path, self.md_dir)
+        self.refs[rel_id] = ref
+        return ref
+
+
+# PDF中可以原样保存的图片编码
+_PDF_IMAGE_FILTERS = {'DCTDecode': '.jpg', 'DCT': '.jpg', 'JPXDecode': '.jp2'}
+
+
+class PdfImages:
+    """
+    把pdfplumber页面中的图片保存为文件并返回Markdown引用路径，供 utils.extract_pdf_page 使用；
+    需要解码才能得到图片文件的数据流（如FlateDecode的原始像素）不导出。
+    对象可被pickle，页面分片的工作进程各自写入同一目录
+    """
+
+    def __init__(self, assets_dir, md_dir):
+        self.assets_dir = assets_dir
+        self.md_dir = md_dir
+        self.used = set()
+        self._store = None
+        self._refs = {}  # PDF对象编号 -> 引用路径，同一对象在多页重复出现时只读取一次
+
+    def __getstate__(self):
+        return {'assets_dir': self.assets_dir, 'md_dir': self.md_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state['assets_dir'], state['md_dir'])
+
+    def __call__(self, image):
+        stream = image.get('stream')
+        if stream is None:
+            return None
+        key = getattr(stream, 'objid', None)
+        if key is not None and key in self._refs:
+            return self._refs[key]
+
+        ref = None
+        filters = stream.get_filters()
+        # 图片编码只能是最后一层；前面的ASCII85、Flate等传输编码和加密由get_data()去除，
+        # DCT/JPX数据本身原样返回，即为完整的图片文件
+        if filters:
+            name = getattr(filters[-1][0], 'name', filters[-1][0])
+            if isinstance(name, bytes):
+                name = name.decode('latin-1')
+            ext = _PDF_IMAGE_FILTERS.get(name)
+            data = stream.get_data() if ext else None
+            if data:
+                if self._store is None:
+                    self._store = AssetStore(self.assets_dir)
+                path = self._store.add_bytes(data, ext)
+                self.used.add(path)
+                ref = markdown_ref(path, self.md_dir)
+        if key is not None:
+            self._refs[key] = ref
+        return ref
@@ -0,0 +1,376 @@
+import os
+import json
+import codecs
+import hashlib
+from collections import namedtuple
+
+from utils import (extract_text_simple, extract_text_with_sections, write_pdf_markdown,
+                   convert_md_to_word, convert_md_to_pdf, iter_docx_blocks, use_docx_streaming,
+                   write_markdown_blocks, sections_from_blocks, copy_file_bytes, PDF_CHUNK_SIZE,
+                   DOCX_STREAM_THRESHOLD, PDF_TABLES)
+from cache import ConversionCache, PageCache
+from assets import DocxImages, PdfImages, assets_dir_for
+from profiling import stage
+
+# 单个文件的转换结果
+# files: 处理的文件数; sections: 章节数; md_paths: 输出文件列表（以 "---" 分隔拼接即为该文档的合并内容）;
+# cached: 是否直接使用了缓存; updated: 增量模式下实际重写的章节数（非增量模式为None）;
+# assets: 导出图片时该文档引用的图片文件（位于输出目录的 assets 目录，批次内的文档共享）;
+# page_hits/page_misses: PDF逐页提取时页面缓存的命中/未命中页数
+FileResult = namedtuple('FileResult', ['files', 'sections', 'md_paths', 'cached', 'updated', 'assets',
+                                       'page_hits', 'page_misses'],
+                        defaults=[False, None, (), 0, 0])
+
+# 增量模式下每个文档章节目录中的清单文件，记录各章节文件的内容哈希
+SECTIONS_MANIFEST = ".sections.json"
+
+
+def default_workers():
+    """默认并行进程数：CPU核心数"""
+    return os.cpu_count() or 1
+
+
+def safe_filename(title):
+    """将章节标题转换为安全的文件名"""
+    for ch in '/\\:*?"<>|':
+        title = title.replace(ch, '_')
+    return title
+
+
+# 以下函数均为模块级函数，可被工作进程直接调用
+def convert_pdf_file(pdf_path, output_dir, file_name, page_workers=1, chunk_size=PDF_CHUNK_SIZE,
+                     progress=None, extract_images=False, tables=PDF_TABLES, page_cache=None):
+    """
+    处理PDF文件转换，逐页写出；extract_images为True时同时导出页面中的图片；tables见 utils.PDF_TABLE_MODES；
+    page_cache为可选的 cache.PageCache，内容未变化的页面直接使用缓存的结果（导出图片时不使用）
+    """
+    md_path = os.path.join(output_dir, f"{file_name}.md")
+    images = PdfImages(assets_dir_for(output_dir), output_dir) if extract_images else None
+    if images is not None:
+        page_cache = None
+    try:
+        with stage('pdf_extract'):
+            write_pdf_markdown(pdf_path, md_path, page_workers, chunk_size, progress, images, tables, page_cache)
+    finally:
+        if page_cache is not None:
+            page_cache.close()
+
+    return FileResult(1, 0, [md_path], assets=tuple(sorted(images.used)) if images else (),
+                      page_hits=page_cache.hits if page_cache else 0,
+                      page_misses=page_cache.misses if page_cache else 0)
+
+
+def convert_word_simple(doc, output_dir, file_name, images=None):
+    """处理简单模式的文档转换；images见 utils.iter_markdown_blocks"""
+    with stage('extract'):
+        markdown_text = extract_text_simple(doc, images)
+    md_path = os.path.join(output_dir, f"{file_name}.md")
+
+    with stage('write'), open(md_path, 'w', encoding='utf-8') as f:
+        f.write(markdown_text)
+
+    return FileResult(1, 0, [md_path])
+
+
+def load_sections_manifest(file_dir):
+    """读取章节清单 {章节文件名: {'sha256': 内容哈希, 'size': 文件大小}}，不存在或损坏时返回空字典"""
+    try:
+        with open(os.path.join(file_dir, SECTIONS_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)['sections']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_sections_manifest(file_dir, entries):
+    manifest_path = os.path.join(file_dir, SECTIONS_MANIFEST)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'sections': entries}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def write_sections_incremental(file_dir, sections):
+    """
+    只重写内容发生变化的章节文件，并删除上次存在、本次已消失的章节
+    :return: (输出文件列表, 重写的章节数)
+    """
+    previous = load_sections_manifest(file_dir)
+    entries = {}
+    md_paths = []
+    updated = 0
+    for title, content in sections.items():
+        name = f"{safe_filename(title)}.md"
+        md_path = os.path.join(file_dir, name)
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        md_paths.append(md_path)
+        # 哈希相同且文件未被删除或改动（大小一致）时跳过写入
+        old = previous.get(name)
+        if old and old.get('sha256') == digest and os.path.isfile(md_path) \
+                and os.path.getsize(md_path) == old.get('size'):
+            entries[name] = old
+            continue
+        with open(md_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        entries[name] = {'sha256': digest, 'size': os.path.getsize(md_path)}
+        updated += 1
+
+    # 只删除清单中记录过的文件，不碰用户放在目录中的其他文件
+    for name in previous.keys() - entries.keys():
+        try:
+            os.remove(os.path.join(file_dir, name))
+        except FileNotFoundError:
+            pass
+
+    save_sections_manifest(file_dir, entries)
+    return md_paths, updated
+
+
+def convert_word_sections(doc, output_dir, file_name, incremental=False, images=None):
+    """处理分割模式的文档转换；incremental为True时只重写发生变化的章节"""
+    with stage('extract'):
+        sections = extract_text_with_sections(doc, images)
+    return write_word_sections(sections, output_dir, file_name, incremental)
+
+
+def convert_word_streaming(file_path, output_dir, file_name, mode='simple', incremental=False, images=None):
+    """
+    流式转换大文档：逐个正文元素解析并立即释放，不构建python-docx文档对象
+    简单模式边解析边写入；分割模式只在内存中保留各章节的Markdown文本
+    """
+    blocks = iter_docx_blocks(file_path, images)
+    if mode == 'simple':
+        md_path = os.path.join(output_dir, f"{file_name}.md")
+        # 解析与写入交替进行，无法分开计时
+        with stage('extract'):
+            write_markdown_blocks(blocks, md_path)
+        return FileResult(1, 0, [md_path])
+
+    with stage('extract'):
+        sections = sections_from_blocks(blocks)
+    return write_word_sections(sections, output_dir, file_name, incremental)
+
+
+def write_word_sections(sections, output_dir, file_name, incremental=False):
+    """把章节字典写入以文件名命名的子目录"""
+    # 为每个文件创建子目录
+    file_dir = os.path.join(output_dir, file_name)
+    os.makedirs(file_dir, exist_ok=True)
+
+    if incremental:
+        with stage('write'):
+            md_paths, updated = write_sections_incremental(file_dir, sections)
+        return FileResult(1, len(sections), md_paths, updated=updated)
+
+    md_paths = []  # 用于可能的合并输出
+    with stage('write'):
+        for title, content in sections.items():
+            md_path = os.path.join(file_dir, f"{safe_filename(title)}.md")
+            with open(md_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            md_paths.append(md_path)
+
+    return FileResult(1, len(sections), md_paths)
+
+
+def convert_to_markdown(file_path, output_dir, mode='simple', file_type='word',
+                        pdf_page_workers=1, pdf_chunk_size=PDF_CHUNK_SIZE,
+                        cache_dir=None, force=False, incremental=False,
+                        stream_threshold=DOCX_STREAM_THRESHOLD, extract_images=False, pdf_tables=PDF_TABLES,
+                        progress=None):
+    """
+    转换单个Word/PDF文件为Markdown（工作进程入口）
+    :param file_path: 输入文件路径
+    :param output_dir: 输出目录
+    :param mode: 'simple' 或 'sections'（仅Word有效）
+    :param file_type: 'word' 或 'pdf'
+    :param pdf_page_workers: PDF页面分片并行的进程数
+    :param pdf_chunk_size: PDF每个分片的页数
+    :param cache_dir: 转换缓存目录，为None时不使用缓存；PDF同时使用其中的页面缓存（见 cache.PageCache）
+    :param force: 忽略已有缓存强制重新转换（结果仍会写入缓存）
+    :param incremental: 分割模式下只重写内容发生变化的章节，并删除已消失的章节
+                        （此时不使用转换缓存：从缓存恢复会整体覆盖章节目录，无法清理已消失的章节）
+    :param stream_threshold: Word文件达到此大小（字节）时改为流式读取，None表示从不使用，0表示总是使用
+    :param extract_images: 导出图片到输出目录的 assets 目录（按内容去重）并在Markdown中引用
+    :param pdf_tables: PDF表格的处理方式，见 utils.PDF_TABLE_MODES
+    :param progress: 可选回调 progress(当前页, 总页数)，目前仅PDF逐页报告
+    :return: FileResult
+    """
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    cache = key = None
+    if cache_dir and not (incremental and file_type != 'pdf' and mode != 'simple'):
+        cache = ConversionCache(cache_dir)
+        # 输出文件名由输入文件名决定，因此也计入缓存键
+        options = {'name': file_name, 'file_type': file_type}
+        if file_type != 'pdf':
+            options['mode'] = mode
+        elif pdf_tables != PDF_TABLES:
+            options['tables'] = pdf_tables
+        if extract_images:
+            options['images'] = True
+        with stage('cache_lookup'):
+            key = cache.make_key(file_path, **options)
+            if not force and (manifest := cache.lookup(key)):
+                try:
+                    paths = cache.restore(key, manifest, output_dir)
+                    # 图片文件保存在Markdown文件之后
+                    count = manifest['meta'].get('outputs', len(paths))
+                    return FileResult(1, manifest['meta'].get('sections', 0), paths[:count], True,
+                                      assets=tuple(paths[count:]))
+                except OSError:
+                    pass  # 条目已被淘汰，重新转换
+
+    if file_type == 'pdf':
+        # 文件内容变化时整体缓存不命中，未变化的页面仍可从页面缓存取得
+        page_cache = PageCache(cache_dir, lookup=not force) if cache_dir else None
+        result = convert_pdf_file(file_path, output_dir, file_name, pdf_page_workers, pdf_chunk_size, progress,
+                                  extract_images, pdf_tables, page_cache)
+    else:
+        images = None
+        if extract_images:
+            # 引用路径相对于Markdown文件所在目录：分割模式的章节位于以文件名命名的子目录中
+            md_dir = output_dir if mode == 'simple' else os.path.join(output_dir, file_name)
+            images = DocxImages(file_path, assets_dir_for(output_dir), md_dir)
+        try:
+            result = convert_word_file(file_path, output_dir, file_name, mode, incremental, stream_threshold,
+                                       images)
+        finally:
+            if images:
+                images.close()
+        if images:
+            result = result._replace(assets=tuple(sorted(set(images.used))))
+
+    if cache:
+        with stage('cache_store'):
+            cache.store(key, output_dir, result.md_paths + list(result.assets), sections=result.sections,
+                        outputs=len(result.md_paths))
+    return result
+
+
+def convert_word_file(file_path, output_dir, file_name, mode='simple', incremental=False,
+                      stream_threshold=DOCX_STREAM_THRESHOLD, images=None):
+    """按文件大小选择流式读取或python-docx读取Word文件并转换"""
+    if use_docx_streaming(file_path, stream_threshold):
+        return convert_word_streaming(file_path, output_dir, file_name, mode, incremental, images)
+
+    import docx  # 延迟导入，减少启动时间
+
+    with stage('load'):
+        doc = docx.Document(file_path)
+    if mode == 'simple':
+        return convert_word_simple(doc, output_dir, file_name, images)
+    return convert_word_sections(doc, output_dir, file_name, incremental, images)
+
+
+def convert_from_markdown(md_path, output_dir, target_format='word', cache_dir=None, force=False,
+                          docx_engine=None):
+    """
+    转换单个Markdown文件为Word/PDF（工作进程入口）
+    :param md_path: Markdown文件路径
+    :param output_dir: 输出目录
+    :param target_format: 'word' 或 'pdf'
+    :param cache_dir: 转换缓存目录，为None时不使用缓存
+    :param force: 忽略已有缓存强制重新转换
+    :param docx_engine: 转Word时使用的引擎 'native' 或 'pandoc'，None为默认（见 utils.convert_md_to_word）
+    :return: (是否成功, 输出文件路径, 是否使用了缓存)
+    """
+    file_name = os.path.splitext(os.path.basename(md_path))[0]
+    ext = 'docx' if target_format == 'word' else 'pdf'
+    output_path = os.path.join(output_dir, f"{file_name}.{ext}")
+
+    cache = key = None
+    if cache_dir:
+        cache = ConversionCache(cache_dir)
+        with stage('cache_lookup'):
+            options = {'name': file_name, 'target_format': target_format}
+            if docx_engine and target_format == 'word':
+                options['engine'] = docx_engine
+            key = cache.make_key(md_path, **options)
+            if not force and (manifest := cache.lookup(key)):
+                try:
+                    cache.restore(key, manifest, output_dir)
+                    return True, output_path, True
+                except OSError:
+                    pass
+
+    if target_format == 'word':
+        success = convert_md_to_word(md_path, output_path, docx_engine)
+    else:
+        success = convert_md_to_pdf(md_path, output_path)
+
+    if success and cache:
+        with stage('cache_store'):
+            cache.store(key, output_dir, [output_path])
+    return success, output_path, False
+
+
+def convert_merge_part(md_path, parts_dir, index, target_format='word', cache_dir=None, force=False,
+                       docx_engine=None):
+    """
+    合并导出时把单个Markdown文件转换为中间文档（工作进程入口），各中间文档再由 merge_docs 拼接
+    中间文档以 "# 文件名" 开头，与 merge_markdown_files 的格式一致；Word各部分之间的分隔线在拼接时插入
+    （见 merge_docs.concat_docx），转换失败的文件不会留下多余的分隔线；PDF的各部分从新的一页开始
+    :param parts_dir: 中间文档目录，第 index 个文件写入其中的 {index:05d} 子目录
+    :return: (是否成功, 中间文档路径, 是否使用了缓存)
+    """
+    file_name = os.path.splitext(os.path.basename(md_path))[0]
+    ext = 'docx' if target_format == 'word' else 'pdf'
+    part_dir = os.path.join(parts_dir, f"{index:05d}")
+    os.makedirs(part_dir, exist_ok=True)
+    output_path = os.path.join(part_dir, f"part.{ext}")
+
+    cache = key = None
+    if cache_dir:
+        cache = ConversionCache(cache_dir)
+        with stage('cache_lookup'):
+            options = {'name': file_name, 'target_format': target_format, 'merge_part': True}
+            if docx_engine and target_format == 'word':
+                options['engine'] = docx_engine
+            key = cache.make_key(md_path, **options)
+            if not force and (manifest := cache.lookup(key)):
+                try:
+                    cache.restore(key, manifest, part_dir)
+                    return True, output_path, True
+                except OSError:
+                    pass
+
+    part_md = os.path.join(part_dir, "part.md")
+    with stage('write'):
+        with open(part_md, 'wb') as out, open(md_path, 'rb') as src:
+            out.write(f"# {file_name}\n\n".encode('utf-8'))
+            # 标题之后的BOM会成为正文的一部分
+            if src.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                src.seek(0)
+            copy_file_bytes(src, out)
+
+    # 图片等相对路径仍以原Markdown文件所在目录为基准
+    resource_dir = os.path.dirname(os.path.abspath(md_path))
+    if target_format == 'word':
+        success = convert_md_to_word(part_md, output_path, docx_engine, resource_dir)
+    else:
+        success = convert_md_to_pdf(part_md, output_path, resource_dir)
+
+    if success and cache:
+        with stage('cache_store'):
+            cache.store(key, part_dir, [output_path])
+    return success, output_path, False
+
+
+def split_workers(max_workers, file_count):
+    """
+    文件数少于进程数时，把剩余的进程分给单个文件内部的页面分片
+    :return: (文件级进程数, 每个文件的页面级进程数)
+    """
+    file_workers = max(1, min(max_workers, file_count))
+    return file_workers, max(1, max_workers // file_workers)
+
+
+class QueueProgress:
+    """可被pickle的进度回调，把工作进程中的进度转发到父进程的队列"""
+
+    def __init__(self, progress_queue, index):
+        self.progress_queue = progress_queue
+        self.index = index
+
+    def __call__(self, current, total):
+        self.progress_queue.put((self.index, current, total))
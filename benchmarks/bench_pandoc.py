@@ -0,0 +1,81 @@
+"""
+pandoc吞吐量基准测试：逐文件启动pandoc vs 常驻pandoc server
+
+生成一批小型Markdown笔记，分别用以下方式转换为docx并计算吞吐量:
+  - per-file: pypandoc.convert_file，每个文件启动一次pandoc进程（原有方式）
+  - server:   常驻pandoc server，每个文件一次HTTP请求
+
+用法:
+    python benchmarks/bench_pandoc.py [--files 200] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pandoc_backend import get_pandoc_server  # noqa: E402
+
+
+def write_notes(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"note_{i:05d}.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# 笔记 {i}\n\n这是第 {i} 条笔记，包含**粗体**和*斜体*文字。\n\n"
+                    f"- 条目一\n- 条目二\n\n| 列1 | 列2 |\n| --- | --- |\n| {i} | {i * 2} |\n")
+        paths.append(path)
+    return paths
+
+
+def timed(name, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    result = {'name': name, 'files': count, 'seconds': elapsed, 'files_per_sec': count / elapsed}
+    print(f"{name:>8}: {elapsed:8.2f} s  {result['files_per_sec']:8.1f} 文件/秒")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较逐文件pandoc与常驻pandoc server的吞吐量")
+    parser.add_argument('--files', type=int, default=200, help="Markdown文件数量")
+    parser.add_argument('--json', help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    import pypandoc
+
+    with tempfile.TemporaryDirectory() as tmp:
+        md_paths = write_notes(tmp, args.files)
+        out_paths = [path[:-3] + '.docx' for path in md_paths]
+        results = []
+
+        def per_file():
+            for md_path, out_path in zip(md_paths, out_paths):
+                pypandoc.convert_file(md_path, 'docx', outputfile=out_path)
+
+        results.append(timed('per-file', per_file, args.files))
+
+        server = get_pandoc_server()
+        if server is None:
+            print("当前pandoc不支持server模式（需要pandoc 3.0以上），跳过server测试")
+        else:
+            def per_request():
+                for md_path, out_path in zip(md_paths, out_paths):
+                    with open(md_path, 'r', encoding='utf-8') as f:
+                        data = server.convert_text(f.read(), 'docx')
+                    with open(out_path, 'wb') as f:
+                        f.write(data)
+
+            results.append(timed('server', per_request, args.files))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
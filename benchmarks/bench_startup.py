@@ -0,0 +1,86 @@
+"""
+启动时间基准测试
+
+分别在全新的子进程中测量:
+  - import: 导入主界面模块 word_to_md_combined_refactored 的耗时
+  - window: 从进程启动到主窗口显示完成（处理完首批事件）的耗时
+并检查启动后哪些重量级后端已被加载（理想情况下应全部为延迟加载）。
+
+用法:
+    python benchmarks/bench_startup.py [--runs 5] [--json out.json]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['docx', 'pdfplumber', 'markdown', 'reportlab', 'pypandoc', 'docxtpl', 'lxml']
+
+IMPORT_SCRIPT = '''
+import sys, time, json
+start = time.perf_counter()
+import word_to_md_combined_refactored
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+''' % HEAVY_MODULES
+
+WINDOW_SCRIPT = '''
+import sys, time, json
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from word_to_md_combined_refactored import MainWindow
+app = QApplication(sys.argv)
+window = MainWindow()
+app.processEvents()
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+''' % HEAVY_MODULES
+
+
+def run_child(script):
+    env = dict(os.environ)
+    # 无显示器的环境下使用offscreen平台
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    output = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(name, script, runs):
+    samples = [run_child(script) for _ in range(runs)]
+    seconds = [sample['seconds'] for sample in samples]
+    return {
+        'name': name,
+        'runs': runs,
+        'min': min(seconds),
+        'median': statistics.median(seconds),
+        'max': max(seconds),
+        'loaded_heavy_modules': samples[-1]['loaded'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测量模块导入和主窗口显示耗时")
+    parser.add_argument('--runs', type=int, default=5, help="每项重复次数")
+    parser.add_argument('--json', help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    results = [measure('import', IMPORT_SCRIPT, args.runs),
+               measure('window', WINDOW_SCRIPT, args.runs)]
+
+    for result in results:
+        print(f"{result['name']:>7}: min {result['min'] * 1000:8.1f} ms  "
+              f"median {result['median'] * 1000:8.1f} ms  "
+              f"已加载的后端: {', '.join(result['loaded_heavy_modules']) or '无'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+表格转换微基准：XML直读的 convert_table_to_md vs 原有的 row.cells/cell.text 实现
+
+生成指定规模的合成表格（可选横向/纵向合并单元格），比较两种实现的耗时并校验输出一致。
+
+用法:
+    python benchmarks/bench_tables.py [--rows 5000] [--cols 10] [--merged] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import convert_table_to_md, W_NS  # noqa: E402
+
+
+def legacy_convert_table_to_md(table):
+    """原有实现：通过python-docx的 row.cells 和 cell.text 读取表格"""
+    if not table.rows:
+        return ""
+    header_cells = table.rows[0].cells
+    header_row = [cell.text.strip() or " " for cell in header_cells]
+    md_rows = [
+        "| " + " | ".join(header_row) + " |",
+        "| " + " | ".join(["---"] * len(header_row)) + " |"
+    ]
+    for row in table.rows[1:]:
+        cells = [cell.text.strip() or " " for cell in row.cells]
+        md_rows.append("| " + " | ".join(cells) + " |")
+    return "\n".join(md_rows)
+
+
+def build_table_xml(rows, cols, merged):
+    """直接拼接 w:tbl XML；merged 时每行第一对单元格横向合并，最后一列每两行纵向合并"""
+    parts = [f'<w:tbl xmlns:w="{W_NS}"><w:tblGrid>']
+    parts.extend('<w:gridCol/>' for _ in range(cols))
+    parts.append('</w:tblGrid>')
+    for r in range(rows):
+        parts.append('<w:tr>')
+        c = 0
+        while c < cols:
+            props = []
+            span = 1
+            if merged and c == 0 and cols > 2:
+                span = 2
+                props.append('<w:gridSpan w:val="2"/>')
+            if merged and c == cols - 1:
+                props.append('<w:vMerge w:val="restart"/>' if r % 2 == 0 else '<w:vMerge/>')
+            tcpr = f'<w:tcPr>{"".join(props)}</w:tcPr>' if props else ''
+            parts.append(f'<w:tc>{tcpr}<w:p><w:r><w:t>r{r}c{c}</w:t></w:r></w:p></w:tc>')
+            c += span
+        parts.append('</w:tr>')
+    parts.append('</w:tbl>')
+    return "".join(parts)
+
+
+def timed(func, table, repeat):
+    best = None
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(table)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较两种Word表格转换实现的速度")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--cols', type=int, default=10)
+    parser.add_argument('--merged', action='store_true', help="包含合并单元格")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    import docx
+    from docx.oxml import parse_xml
+    from docx.table import Table
+
+    doc = docx.Document()
+    tbl = parse_xml(build_table_xml(args.rows, args.cols, args.merged))
+    doc.element.body.append(tbl)
+    table = Table(tbl, doc)
+
+    cells = args.rows * args.cols
+    legacy_seconds, legacy_output = timed(legacy_convert_table_to_md, table, args.repeat)
+    fast_seconds, fast_output = timed(convert_table_to_md, table, args.repeat)
+
+    result = {
+        'rows': args.rows, 'cols': args.cols, 'cells': cells, 'merged': args.merged,
+        'legacy_seconds': legacy_seconds, 'fast_seconds': fast_seconds,
+        'speedup': legacy_seconds / fast_seconds if fast_seconds else None,
+        'identical_output': legacy_output == fast_output,
+    }
+    print(f"{cells} 个单元格{'（含合并）' if args.merged else ''}: "
+          f"原实现 {legacy_seconds * 1000:.1f} ms, XML直读 {fast_seconds * 1000:.1f} ms, "
+          f"加速 {result['speedup']:.1f}x, 输出一致: {result['identical_output']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+合成测试语料生成器
+
+在本地生成指定规模的 .docx / .pdf / .md 文件，供基准测试使用，不依赖外部数据。
+
+用法:
+    python benchmarks/corpus.py out_dir [--docx 5] [--pdf 5] [--md 50]
+                                [--paragraphs 500] [--tables 5] [--table-rows 50] [--table-cols 6]
+                                [--pages 50]
+"""
+import os
+import random
+import argparse
+
+LATIN_WORDS = "report revenue quarter growth margin forecast analysis summary appendix".split()
+WORDS = "合同 条款 甲方 乙方 付款 期限 交付 验收 违约 责任 保密 争议 解决".split() + LATIN_WORDS
+
+
+def sentence(rng, words=12, vocabulary=WORDS):
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def make_docx(path, paragraphs=500, tables=5, table_rows=50, table_cols=6, seed=0):
+    """生成Word文档：一级/二级标题、混合格式的段落（多个运行）以及表格"""
+    import docx
+
+    rng = random.Random(seed)
+    doc = docx.Document()
+    table_every = max(1, paragraphs // (tables + 1)) if tables else None
+    made_tables = 0
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            doc.add_heading(f"第{i // 50 + 1}章 {sentence(rng, 3)}", 1)
+        elif i % 10 == 0:
+            doc.add_heading(sentence(rng, 4), 2)
+        para = doc.add_paragraph()
+        # 每段拆成多个运行，部分运行加粗/斜体，模拟真实文档
+        for j in range(4):
+            run = para.add_run(sentence(rng, 5) + " ")
+            run.bold = j == 1
+            run.italic = j == 2
+        if table_every and made_tables < tables and i % table_every == table_every - 1:
+            table = doc.add_table(rows=table_rows, cols=table_cols)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"{r}-{c} {rng.choice(WORDS)}"
+            made_tables += 1
+    doc.save(path)
+    return path
+
+
+def make_pdf(path, pages=50, paragraphs_per_page=8, table_rows=10, table_cols=5, seed=0):
+    """生成PDF：每页若干段落，每隔一页带一个有边框的表格"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, PageBreak
+
+    rng = random.Random(seed)
+    styles = getSampleStyleSheet()
+    flowables = []
+    for page in range(pages):
+        # reportlab内置字体不含中文字形，PDF只使用英文词汇
+        flowables.append(Paragraph(f"Page {page + 1} {sentence(rng, 4, LATIN_WORDS)}", styles['Heading2']))
+        for _ in range(paragraphs_per_page):
+            flowables.append(Paragraph(sentence(rng, 30, LATIN_WORDS), styles['Normal']))
+        if page % 2 == 0 and table_rows:
+            data = [[f"{r}-{c}" for c in range(table_cols)] for r in range(table_rows)]
+            table = Table(data)
+            table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.5, colors.black)]))
+            flowables.append(table)
+        flowables.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4).build(flowables)
+    return path
+
+
+def make_markdown(path, paragraphs=50, tables=1, table_rows=10, table_cols=4, seed=0):
+    """生成Markdown笔记：标题、格式化段落、列表、代码块和表格"""
+    rng = random.Random(seed)
+    lines = [f"# {sentence(rng, 3)}", ""]
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            lines += [f"## {sentence(rng, 4)}", ""]
+        lines += [f"{sentence(rng, 8)} **{sentence(rng, 2)}** *{sentence(rng, 2)}* {sentence(rng, 6)}", ""]
+        if i % 15 == 7:
+            lines += [f"- {sentence(rng, 4)}" for _ in range(3)] + [""]
+        if i % 20 == 13:
+            lines += ["```python", "def f(x):", "    return x * 2", "```", ""]
+    for _ in range(tables):
+        lines.append("| " + " | ".join(f"列{c}" for c in range(table_cols)) + " |")
+        lines.append("| " + " | ".join("---" for _ in range(table_cols)) + " |")
+        for r in range(table_rows):
+            lines.append("| " + " | ".join(f"{r}-{c}" for c in range(table_cols)) + " |")
+        lines.append("")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    return path
+
+
+def generate_corpus(out_dir, docx_count=5, pdf_count=5, md_count=50, paragraphs=500, tables=5,
+                    table_rows=50, table_cols=6, pages=50, md_paragraphs=50):
+    """
+    生成完整语料
+    :return: {'docx': [...], 'pdf': [...], 'md': [...]} 各类文件路径
+    """
+    corpus = {'docx': [], 'pdf': [], 'md': []}
+    for kind in corpus:
+        os.makedirs(os.path.join(out_dir, kind), exist_ok=True)
+    for i in range(docx_count):
+        corpus['docx'].append(make_docx(os.path.join(out_dir, 'docx', f"doc_{i:04d}.docx"),
+                                        paragraphs, tables, table_rows, table_cols, seed=i))
+    for i in range(pdf_count):
+        corpus['pdf'].append(make_pdf(os.path.join(out_dir, 'pdf', f"report_{i:04d}.pdf"),
+                                      pages, seed=i))
+    for i in range(md_count):
+        corpus['md'].append(make_markdown(os.path.join(out_dir, 'md', f"note_{i:04d}.md"),
+                                          md_paragraphs, seed=i))
+    return corpus
+
+
+def add_corpus_arguments(parser):
+    """添加语料规模相关的命令行参数（供基准脚本复用）"""
+    parser.add_argument('--docx', type=int, default=5, help="Word文档数量")
+    parser.add_argument('--pdf', type=int, default=5, help="PDF文档数量")
+    parser.add_argument('--md', type=int, default=50, help="Markdown文件数量")
+    parser.add_argument('--paragraphs', type=int, default=500, help="每个Word文档的段落数")
+    parser.add_argument('--tables', type=int, default=5, help="每个Word文档的表格数")
+    parser.add_argument('--table-rows', type=int, default=50, help="Word表格行数")
+    parser.add_argument('--table-cols', type=int, default=6, help="Word表格列数")
+    parser.add_argument('--pages', type=int, default=50, help="每个PDF的页数")
+    parser.add_argument('--md-paragraphs', type=int, default=50, help="每个Markdown文件的段落数")
+
+
+def corpus_from_args(out_dir, args):
+    return generate_corpus(out_dir, args.docx, args.pdf, args.md, args.paragraphs, args.tables,
+                           args.table_rows, args.table_cols, args.pages, args.md_paragraphs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成的docx/pdf/md测试语料")
+    parser.add_argument('out_dir', help="输出目录")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+    corpus = corpus_from_args(args.out_dir, args)
+    for kind, paths in corpus.items():
+        print(f"{kind}: {len(paths)} 个文件")
+
+
+if __name__ == "__main__":
+    main()
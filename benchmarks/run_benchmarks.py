@@ -0,0 +1,210 @@
+"""
+转换流水线基准测试
+
+生成（或复用）合成语料，对各转换阶段分别计时，记录吞吐量（文件/秒、MB/秒，PDF另记页/秒）
+和峰值内存（tracemalloc统计的Python分配），结果写入JSON，可与上一次的结果对比。
+
+用法:
+    python benchmarks/run_benchmarks.py --out results.json [--corpus-dir DIR] [--compare old.json]
+                                        [--stages docx_load,extract_text_simple,...] [--no-memory]
+    语料规模参数见 benchmarks/corpus.py（--docx/--pdf/--md/--paragraphs/--pages 等）
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import add_corpus_arguments, corpus_from_args  # noqa: E402
+import utils  # noqa: E402
+from cache import PageCache  # noqa: E402
+
+
+def _size(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def _pdf_pages(paths):
+    import pdfplumber
+    total = 0
+    for path in paths:
+        with pdfplumber.open(path) as pdf:
+            total += len(pdf.pages)
+    return total
+
+
+def build_stages(corpus, work_dir):
+    """
+    返回 {阶段名: (执行函数, 输入文件列表, 页数或None)}
+    执行函数每次调用都完整处理一遍该阶段的输入
+    """
+    import docx
+
+    docx_paths = corpus['docx']
+    pdf_paths = corpus['pdf']
+    md_paths = corpus['md']
+    out_dir = os.path.join(work_dir, 'out')
+    os.makedirs(out_dir, exist_ok=True)
+    loaded = {}
+
+    def loaded_docs():
+        # 提取阶段单独计时，文档只加载一次
+        if not loaded:
+            for path in docx_paths:
+                loaded[path] = docx.Document(path)
+        return loaded.values()
+
+    def docx_load():
+        for path in docx_paths:
+            docx.Document(path)
+
+    def extract_simple():
+        for doc in loaded_docs():
+            utils.extract_text_simple(doc)
+
+    def extract_sections():
+        for doc in loaded_docs():
+            utils.extract_text_with_sections(doc)
+
+    def extract_pdf(tables):
+        def run():
+            for path in pdf_paths:
+                utils.extract_text_from_pdf(path, tables=tables)
+        return run
+
+    def extract_pdf_page_cache():
+        # 预热时写入页面缓存，计时的是所有页面都命中时的耗时（指纹计算 + SQLite读取）
+        with PageCache(os.path.join(work_dir, 'page_cache')) as page_cache:
+            for path in pdf_paths:
+                utils.extract_text_from_pdf(path, page_cache=page_cache)
+
+    def md_to_word(engine):
+        def run():
+            for path in md_paths:
+                utils.convert_md_to_word(path, os.path.join(out_dir, os.path.basename(path)[:-3] + '.docx'), engine)
+        return run
+
+    def md_to_pdf():
+        for path in md_paths:
+            utils.convert_md_to_pdf(path, os.path.join(out_dir, os.path.basename(path)[:-3] + '.pdf'))
+
+    def merge():
+        utils.merge_markdown_files(md_paths, os.path.join(out_dir, 'merged.md'))
+
+    pdf_pages = _pdf_pages(pdf_paths) if pdf_paths else 0
+    return {
+        'docx_load': (docx_load, docx_paths, None),
+        'extract_text_simple': (extract_simple, docx_paths, None),
+        'extract_text_with_sections': (extract_sections, docx_paths, None),
+        'extract_text_from_pdf': (extract_pdf('inline'), pdf_paths, pdf_pages),
+        'extract_text_from_pdf_append': (extract_pdf('append'), pdf_paths, pdf_pages),
+        'extract_pdf_page_cache': (extract_pdf_page_cache, pdf_paths, pdf_pages),
+        'convert_md_to_word': (md_to_word('native'), md_paths, None),
+        'convert_md_to_word_pandoc': (md_to_word('pandoc'), md_paths, None),
+        'convert_md_to_pdf': (md_to_pdf, md_paths, None),
+        'merge_markdown_files': (merge, md_paths, None),
+    }
+
+
+def run_stage(name, func, paths, pages, measure_memory):
+    # 预热一次（加载后端模块、填充缓存），不计入结果
+    func()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    input_mb = _size(paths) / (1024 * 1024)
+    result = {
+        'stage': name,
+        'files': len(paths),
+        'seconds': seconds,
+        'files_per_sec': len(paths) / seconds if seconds else None,
+        'input_mb': input_mb,
+        'mb_per_sec': input_mb / seconds if seconds else None,
+        'peak_memory_mb': peak_mb,
+    }
+    if pages is not None:
+        result['pages'] = pages
+        result['pages_per_sec'] = pages / seconds if seconds else None
+    return result
+
+
+def print_result(result, previous=None):
+    line = (f"{result['stage']:>28}: {result['seconds']:8.3f} s  "
+            f"{result['files_per_sec'] or 0:8.1f} 文件/秒  {result['mb_per_sec'] or 0:7.2f} MB/秒")
+    if 'pages_per_sec' in result:
+        line += f"  {result['pages_per_sec'] or 0:7.1f} 页/秒"
+    if result['peak_memory_mb'] is not None:
+        line += f"  峰值 {result['peak_memory_mb']:7.1f} MB"
+    if previous and previous.get('seconds'):
+        change = (result['seconds'] - previous['seconds']) / previous['seconds'] * 100
+        line += f"  ({change:+.1f}% 耗时)"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="转换流水线各阶段的吞吐量和内存基准测试")
+    parser.add_argument('--out', default='benchmark_results.json', help="结果JSON文件")
+    parser.add_argument('--corpus-dir', help="语料目录（不存在时生成；默认使用临时目录）")
+    parser.add_argument('--compare', help="与之前的结果JSON对比")
+    parser.add_argument('--stages', help="只运行指定阶段（逗号分隔）")
+    parser.add_argument('--no-memory', action='store_true', help="不测量峰值内存（tracemalloc会额外运行一遍）")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='md_converter_bench_')
+    try:
+        corpus_dir = args.corpus_dir or os.path.join(work_dir, 'corpus')
+        print(f"生成语料: {corpus_dir}")
+        corpus = corpus_from_args(corpus_dir, args)
+
+        stages = build_stages(corpus, work_dir)
+        selected = args.stages.split(',') if args.stages else list(stages)
+
+        previous = {}
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                previous = {item['stage']: item for item in json.load(f)['results']}
+
+        results = []
+        for name in selected:
+            func, paths, pages = stages[name]
+            if not paths:
+                continue
+            result = run_stage(name, func, paths, pages, not args.no_memory)
+            print_result(result, previous.get(name))
+            results.append(result)
+
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': {key: value for key, value in vars(args).items()
+                       if key in ('docx', 'pdf', 'md', 'paragraphs', 'tables', 'table_rows',
+                                  'table_cols', 'pages', 'md_paragraphs')},
+            'results': results,
+        }
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.out}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+
+from utils import CONVERTER_VERSION
+
+# 缓存默认上限：2GB
+DEFAULT_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+
+# PDF页面缓存：位于转换缓存目录中的SQLite数据库，默认最多保留20万页、256MB
+PAGE_CACHE_FILE = "pages.sqlite"
+DEFAULT_PAGE_CACHE_ENTRIES = 200000
+DEFAULT_PAGE_CACHE_SIZE = 256 * 1024 * 1024
+
+
+def default_cache_dir():
+    """默认缓存目录：~/.md_converter/cache"""
+    return os.path.join(os.path.expanduser("~"), ".md_converter", "cache")
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    基于输入内容哈希的转换结果缓存
+
+    每个条目是一个目录，包含 manifest.json 和输出文件副本；
+    条目的最近访问时间记录在 manifest.json 的修改时间上，超出容量时按LRU淘汰。
+    写入先落到临时目录再原子重命名，多个工作进程可以同时读写同一缓存目录。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, input_path, **options):
+        """
+        生成缓存键：输入内容哈希 + 转换选项 + 转换器版本
+        :param options: 影响输出的选项，如 mode、file_type、target_format
+        """
+        digest = hashlib.sha256()
+        digest.update(hash_file(input_path).encode())
+        digest.update(CONVERTER_VERSION.encode())
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        """
+        查找缓存条目
+        :return: manifest字典，未命中时返回None
+        """
+        manifest_path = os.path.join(self._entry_dir(key), "manifest.json")
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 刷新访问时间，供LRU淘汰使用
+        os.utime(manifest_path)
+        return manifest
+
+    def restore(self, key, manifest, output_dir):
+        """
+        将缓存的输出文件复制回输出目录
+        :return: 输出文件的绝对路径列表（与存入时顺序一致）
+        """
+        files_dir = os.path.join(self._entry_dir(key), "files")
+        paths = []
+        for rel_path in manifest['files']:
+            target = os.path.join(output_dir, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(files_dir, rel_path), target)
+            paths.append(target)
+        return paths
+
+    def store(self, key, output_dir, paths, **meta):
+        """
+        保存输出文件到缓存
+        :param output_dir: 输出目录，文件以相对该目录的路径保存
+        :param paths: 输出文件路径列表
+        :param meta: 需要随条目保存的附加信息（如章节数）
+        """
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        rel_paths = []
+        size = 0
+        for path in paths:
+            rel_path = os.path.relpath(path, output_dir)
+            target = os.path.join(tmp_dir, "files", rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+            rel_paths.append(rel_path)
+            size += os.path.getsize(target)
+
+        with open(os.path.join(tmp_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump({'files': rel_paths, 'size': size, 'meta': meta}, f, ensure_ascii=False)
+
+        try:
+            os.replace(tmp_dir, entry_dir)
+            return
+        except OSError:
+            pass
+        # 目标目录已存在（强制重新转换，或旧条目中的文件已丢失）：先把旧条目移开再替换，
+        # 旧条目可能正被其他进程移开，移动失败时直接再试一次
+        old_dir = f"{entry_dir}.old-{os.getpid()}"
+        try:
+            os.replace(entry_dir, old_dir)
+        except OSError:
+            old_dir = None
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # 其他进程在此期间写入了完整的同一条目
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    def evict(self):
+        """
+        按最近访问时间淘汰条目，直到总大小不超过上限
+        :return: 淘汰的条目数
+        """
+        entries = []
+        total = 0
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                manifest_path = os.path.join(prefix_dir, name, "manifest.json")
+                try:
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        size = json.load(f).get('size', 0)
+                    atime = os.path.getmtime(manifest_path)
+                except (OSError, ValueError):
+                    # 残留的临时目录或损坏的条目，超过一小时直接清理
+                    entry_dir = os.path.join(prefix_dir, name)
+                    if time.time() - os.path.getmtime(entry_dir) > 3600:
+                        shutil.rmtree(entry_dir, ignore_errors=True)
+                    continue
+                entries.append((atime, size, os.path.join(prefix_dir, name)))
+                total += size
+
+        evicted = 0
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+
+def _digest_pdf_object(digest, obj, memo):
+    """
+    把PDF对象的内容写入摘要；间接对象和数据流按对象编号记忆，
+    同一文档中被多个页面共用的字体、图片只计算一次，循环引用只展开一次
+    """
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+    if isinstance(obj, PDFObjRef):
+        if obj.objid not in memo:
+            memo[obj.objid] = b'cycle'
+            sub = hashlib.sha256()
+            _digest_pdf_object(sub, obj.resolve(), memo)
+            memo[obj.objid] = sub.digest()
+        digest.update(b'R' + memo[obj.objid])
+    elif isinstance(obj, PDFStream):
+        objid = obj.objid
+        if objid is None or objid not in memo:
+            sub = hashlib.sha256()
+            _digest_pdf_object(sub, obj.attrs, memo)
+            # 未解码时直接对原始数据取摘要，省去解压；已被解码的数据流只能使用解码后的数据
+            raw = obj.get_rawdata()
+            sub.update(b'raw' + raw if raw is not None else b'data' + obj.get_data())
+            if objid is None:
+                digest.update(b'S' + sub.digest())
+                return
+            memo[objid] = sub.digest()
+        digest.update(b'S' + memo[objid])
+    elif isinstance(obj, dict):
+        digest.update(b'{')
+        for name in sorted(obj):
+            digest.update(str(name).encode() + b':')
+            _digest_pdf_object(digest, obj[name], memo)
+        digest.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[')
+        for item in obj:
+            _digest_pdf_object(digest, item, memo)
+        digest.update(b']')
+    elif isinstance(obj, bytes):
+        digest.update(b'b%d:' % len(obj) + obj)
+    else:
+        # 数字、名称、关键字、布尔值等
+        digest.update(repr(obj).encode() + b';')
+
+
+class PageCache:
+    """
+    PDF单页提取结果的缓存（SQLite数据库）
+
+    键为页面指纹：页面内容流及其引用的资源（字体、图片、表单对象，按内容递归计算）的哈希，
+    加上页面框、表格处理方式和转换器版本；与所在文件和页码无关。
+    定期重新生成、大部分页面不变的报表再次转换时，只有变化的页面需要重新提取。
+    新结果和访问时间先在内存中累积，每 FLUSH_EVERY 条及 close() 时批量写入；
+    数据库使用WAL模式，多个工作进程可以同时读写。对象可被pickle，页面分片的工作进程各自打开数据库。
+
+    用法:
+        page_cache = PageCache('~/.md_converter/cache')
+        key = page_cache.make_key(page, 'inline')
+        text = page_cache.get(key)
+        if text is None:
+            page_cache.put(key, extract(page))
+        page_cache.close()
+        page_cache.hits, page_cache.misses
+    """
+
+    FLUSH_EVERY = 64
+
+    def __init__(self, cache_dir=None, lookup=True, max_entries=DEFAULT_PAGE_CACHE_ENTRIES,
+                 max_bytes=DEFAULT_PAGE_CACHE_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.lookup = lookup  # 为False时不读取已有结果（强制重新提取），新结果仍会写入
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._disabled = False  # 数据库无法打开时整批不再尝试
+        self._pending = {}  # 键 -> 待写入的Markdown文本
+        self._touched = set()  # 命中的键，写入时刷新访问时间
+        self._doc = None
+        self._memo = {}  # 当前文档中间接对象的摘要
+
+    def __getstate__(self):
+        return {'cache_dir': self.cache_dir, 'lookup': self.lookup, 'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        if self._conn is None and not self._disabled:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                conn = sqlite3.connect(os.path.join(self.cache_dir, PAGE_CACHE_FILE), timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, markdown TEXT NOT NULL, "
+                             "size INTEGER NOT NULL, atime REAL NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS pages_atime ON pages (atime)")
+                conn.commit()
+                self._conn = conn
+            except (OSError, sqlite3.Error):
+                self._disabled = True
+        return self._conn
+
+    def make_key(self, page, tables):
+        """
+        计算pdfplumber页面的指纹，只读取页面字典和数据流，不解析页面布局
+        :param tables: 表格的处理方式，见 utils.PDF_TABLE_MODES
+        """
+        page_obj = page.page_obj
+        doc = page.pdf.doc
+        if doc is not self._doc:
+            # 对象编号只在同一文档内有效
+            self._doc = doc
+            self._memo = {}
+        digest = hashlib.sha256()
+        digest.update(f"{CONVERTER_VERSION}|{tables}|{page_obj.mediabox}|{page_obj.cropbox}|"
+                      f"{page_obj.rotate}|".encode())
+        _digest_pdf_object(digest, page_obj.contents, self._memo)
+        _digest_pdf_object(digest, page_obj.resources, self._memo)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """返回缓存的页面Markdown文本，未命中时返回None"""
+        text = None
+        if self.lookup:
+            text = self._pending.get(key)
+            if text is None and (conn := self._connect()):
+                try:
+                    row = conn.execute("SELECT markdown FROM pages WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row:
+                    text = row[0]
+                    self._touched.add(key)
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        self._pending[key] = text
+        if len(self._pending) + len(self._touched) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """写入累积的新结果和访问时间"""
+        if (self._pending or self._touched) and (conn := self._connect()):
+            now = time.time()
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO pages (key, markdown, size, atime) VALUES (?, ?, ?, ?)",
+                                     [(key, text, len(text.encode('utf-8')), now)
+                                      for key, text in self._pending.items()])
+                    conn.executemany("UPDATE pages SET atime = ? WHERE key = ?",
+                                     [(now, key) for key in self._touched])
+            except sqlite3.Error:
+                pass  # 缓存写入失败不影响转换结果
+        self._pending.clear()
+        self._touched.clear()
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._doc = None
+        self._memo = {}
+
+    def evict(self):
+        """
+        按最近访问时间淘汰页面，直到页数和总大小都不超过上限
+        :return: 淘汰的页数
+        """
+        conn = self._connect()
+        if conn is None:
+            return 0
+        try:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return 0
+            keys = []
+            for key, size in conn.execute("SELECT key, size FROM pages ORDER BY atime"):
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                keys.append((key,))
+                count -= 1
+                total -= size
+            with conn:
+                conn.executemany("DELETE FROM pages WHERE key = ?", keys)
+            return len(keys)
+        except sqlite3.Error:
+            return 0
@@ -0,0 +1,257 @@
+"""
+命令行入口（无需PyQt5）
+
+用法示例:
+    python -m cli to-md 合同/*.docx -o out --mode sections --merge -j 8
+    python -m cli to-md reports/ -o out --type pdf --json
+    python -m cli from-md notes/ -o out --format pdf --merge
+    python -m cli to-md 合同/ -o out --profile report.csv --profile-top 5
+    python -m cli watch 共享盘/收件箱 -o out --poll
+    python -m cli serve --port 8765 -j 4
+
+退出码: 0 全部成功; 1 部分文件失败; 2 参数错误或批次失败
+"""
+import os
+import sys
+import json
+import argparse
+
+from api import DocumentConverter
+from batch import default_workers
+from cache import default_cache_dir
+from profiling import BatchProfiler
+from utils import PDF_CHUNK_SIZE, PDF_TABLES, PDF_TABLE_MODES, DOCX_STREAM_THRESHOLD
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_FAILED = 2
+
+TO_MD_EXTENSIONS = ('.docx', '.pdf')
+FROM_MD_EXTENSIONS = ('.md',)
+
+
+def expand_inputs(inputs, extensions):
+    """展开输入：文件原样保留，目录按扩展名收集其中的文件（按文件名排序）"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                path = os.path.join(item, name)
+                if os.path.isfile(path) and os.path.splitext(name)[1].lower() in extensions:
+                    paths.append(path)
+        else:
+            paths.append(item)
+    return paths
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Word/PDF与Markdown互相转换（命令行版）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='+', help="输入文件或目录")
+    common.add_argument('-o', '--output-dir', required=True, help="输出目录")
+    common.add_argument('--merge', action='store_true', help="合并为一个文档")
+    common.add_argument('-j', '--workers', type=int, default=default_workers(),
+                        help="并行进程数（默认: CPU核心数）")
+    common.add_argument('--cache', nargs='?', const=default_cache_dir(), metavar='DIR',
+                        help="启用转换缓存，可指定缓存目录")
+    common.add_argument('--force', action='store_true', help="忽略缓存强制重新转换")
+    common.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help="单个文件的转换超时秒数，超时的文件记为失败（默认不限制）")
+    common.add_argument('--json', action='store_true', help="以JSON Lines输出进度（机器可读）")
+    common.add_argument('--profile', metavar='REPORT',
+                        help="记录每个文件各阶段的耗时并写出报告（.csv 或 .json）")
+    common.add_argument('--profile-memory', action='store_true', help="报告中包含各阶段的峰值内存（较慢）")
+    common.add_argument('--profile-top', type=int, default=0, metavar='N',
+                        help="保存最慢的N个文件的cProfile数据（与报告同名的 _profiles 目录）")
+
+    to_md = subparsers.add_parser('to-md', parents=[common], help="Word/PDF转Markdown")
+    to_md.add_argument('--type', choices=['word', 'pdf'], help="输入文件类型（默认按扩展名判断）")
+    to_md.add_argument('--mode', choices=['simple', 'sections'], default='simple',
+                       help="Word转换模式: simple 或 sections（按一级标题分割）")
+    to_md.add_argument('--incremental', action='store_true',
+                       help="sections模式下只重写内容变化的章节，并删除已消失的章节")
+    to_md.add_argument('--images', action='store_true',
+                       help="导出图片到输出目录的 assets 目录（内容相同的图片只保存一份）并在Markdown中引用")
+    to_md.add_argument('--pdf-chunk-size', type=int, default=PDF_CHUNK_SIZE, help="PDF页面分片大小")
+    to_md.add_argument('--pdf-tables', choices=PDF_TABLE_MODES, default=PDF_TABLES,
+                       help="PDF表格: inline 表格按位置插入正文且文字不重复（默认），append 整页文字后追加表格（旧方式）")
+    to_md.add_argument('--stream-threshold', type=float, default=DOCX_STREAM_THRESHOLD // (1024 * 1024),
+                       metavar='MB', help="Word文件达到此大小时流式读取以降低内存占用（默认: %(default)g MB，0表示总是流式读取）")
+
+    from_md = subparsers.add_parser('from-md', parents=[common], help="Markdown转Word/PDF")
+    from_md.add_argument('--format', choices=['word', 'pdf'], default='word', help="目标格式")
+    from_md.add_argument('--engine', choices=['native', 'pandoc'],
+                         help="转Word的引擎：native 内置引擎（默认），pandoc（存在 reference.docx 时默认使用）")
+
+    watch = subparsers.add_parser('watch', help="监视目录，自动转换新增/修改的 .docx/.pdf/.md 文件")
+    watch.add_argument('inputs', nargs='+', help="要监视的目录")
+    watch.add_argument('-o', '--output-dir', required=True, help="输出目录")
+    watch.add_argument('-j', '--workers', type=int, default=default_workers(), help="并行进程数（默认: CPU核心数）")
+    watch.add_argument('--cache', nargs='?', const=default_cache_dir(), metavar='DIR',
+                       help="启用转换缓存，可指定缓存目录")
+    watch.add_argument('--json', action='store_true', help="以JSON Lines输出事件（机器可读）")
+    watch.add_argument('--mode', choices=['simple', 'sections'], default='simple', help="Word转换模式")
+    watch.add_argument('--format', choices=['word', 'pdf'], default='word', help="Markdown文件的目标格式")
+    watch.add_argument('--debounce', type=float, default=2.0, help="文件停止变化多少秒后开始转换（默认: 2）")
+    watch.add_argument('--poll', action='store_true', help="使用轮询代替文件系统事件（适用于网络共享盘）")
+    watch.add_argument('--interval', type=float, default=1.0, help="轮询间隔秒数（默认: 1）")
+    watch.add_argument('--queue-size', type=int, default=1000, help="待转换队列的最大长度")
+    watch.add_argument('--recursive', action='store_true', help="同时监视子目录")
+    watch.add_argument('--initial', action='store_true', help="启动时先转换目录中已有的文件")
+
+    serve = subparsers.add_parser('serve', help="启动本地HTTP转换服务（只监听本机地址）")
+    serve.add_argument('--port', type=int, default=8765, help="监听端口（默认: 8765）")
+    serve.add_argument('-j', '--workers', type=int, default=default_workers(), help="并行进程数（默认: CPU核心数）")
+    serve.add_argument('--queue-size', type=int, default=32, help="等待转换的任务上限，超出时返回503")
+    serve.add_argument('--cache', nargs='?', const=default_cache_dir(), metavar='DIR',
+                       help="启用转换缓存，可指定缓存目录")
+    serve.add_argument('--max-upload', type=int, default=200, metavar='MB', help="上传文件大小上限（MB）")
+
+    return parser
+
+
+def run_serve(args):
+    """运行本地转换服务直到按下Ctrl+C"""
+    import asyncio
+    from service import ConversionService
+
+    service = ConversionService('127.0.0.1', args.port, max(1, args.workers), max(1, args.queue_size),
+                                args.cache, args.max_upload * 1024 * 1024)
+
+    async def serve():
+        port = await service.start()
+        print(f"转换服务已启动: http://127.0.0.1:{port}（按Ctrl+C退出）", file=sys.stderr, flush=True)
+        try:
+            await service.server.serve_forever()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return EXIT_OK
+
+
+def run_watch(args):
+    """运行监视模式直到按下Ctrl+C"""
+    from watch import FolderWatcher, print_event
+
+    _, _, emit = make_reporter(args.json)
+    missing = [path for path in args.inputs if not os.path.isdir(path)]
+    if missing:
+        message = f"找不到监视目录: {', '.join(missing)}"
+        emit('finished', success=False, message=message, exit_code=EXIT_FAILED)
+        if not args.json:
+            print(message, file=sys.stderr)
+        return EXIT_FAILED
+
+    def on_event(event, path, detail):
+        if args.json:
+            emit(event, path=path, detail=detail)
+        else:
+            print_event(event, path, detail)
+
+    try:
+        watcher = FolderWatcher(args.inputs, args.output_dir, args.mode, args.format, max(1, args.workers),
+                                args.cache, args.debounce, args.poll, args.interval, args.queue_size,
+                                args.recursive, args.initial, on_event=on_event)
+    except ValueError as e:
+        emit('finished', success=False, message=str(e), exit_code=EXIT_FAILED)
+        if not args.json:
+            print(str(e), file=sys.stderr)
+        return EXIT_FAILED
+    if not args.json:
+        print(f"正在监视 {', '.join(args.inputs)}，按Ctrl+C退出", file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return EXIT_OK
+
+
+def make_reporter(as_json):
+    """返回 (进度回调, 文件进度回调, 事件输出函数)"""
+    json_out = None
+    if as_json:
+        # 标准输出只保留JSON事件：转换函数（包括工作进程）的其他打印改走标准错误
+        sys.stdout.flush()
+        json_out = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def emit(event, **fields):
+        if json_out:
+            print(json.dumps({'event': event, **fields}, ensure_ascii=False), file=json_out, flush=True)
+
+    def on_progress(value, message):
+        if as_json:
+            emit('progress', value=value, message=message)
+        else:
+            print(f"[{value:3d}%] {message}", file=sys.stderr, flush=True)
+
+    def on_file_progress(current, total):
+        emit('file', current=current, total=total)
+
+    return on_progress, on_file_progress, emit
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'watch':
+        return run_watch(args)
+    if args.command == 'serve':
+        return run_serve(args)
+    on_progress, on_file_progress, emit = make_reporter(args.json)
+
+    extensions = TO_MD_EXTENSIONS if args.command == 'to-md' else FROM_MD_EXTENSIONS
+    paths = expand_inputs(args.inputs, extensions)
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing or not paths:
+        message = f"找不到输入文件: {', '.join(missing)}" if missing else "没有可转换的输入文件"
+        emit('finished', success=False, message=message, exit_code=EXIT_FAILED)
+        if not args.json:
+            print(message, file=sys.stderr)
+        return EXIT_FAILED
+
+    converter = DocumentConverter(
+        args.output_dir,
+        max(1, args.workers),
+        getattr(args, 'pdf_chunk_size', PDF_CHUNK_SIZE),
+        args.cache,
+        args.force,
+        on_progress=on_progress,
+        on_file_progress=on_file_progress,
+        profiler=BatchProfiler(args.profile, args.profile_memory, args.profile_top) if args.profile else None,
+        incremental=getattr(args, 'incremental', False),
+        timeout=args.timeout,
+        stream_threshold=int(args.stream_threshold * 1024 * 1024) if args.command == 'to-md' else DOCX_STREAM_THRESHOLD,
+        extract_images=getattr(args, 'images', False),
+        docx_engine=getattr(args, 'engine', None),
+        pdf_tables=getattr(args, 'pdf_tables', PDF_TABLES)
+    )
+    if args.command == 'to-md':
+        result = converter.to_markdown(paths, args.mode, args.merge, args.type)
+    else:
+        result = converter.from_markdown(paths, args.format, args.merge)
+
+    if not result.success:
+        exit_code = EXIT_FAILED
+    elif result.errors:
+        exit_code = EXIT_PARTIAL
+    else:
+        exit_code = EXIT_OK
+
+    emit('finished', success=result.success, message=result.message, processed=result.processed,
+         sections=result.sections, cached=result.cached, outputs=result.outputs,
+         errors=[{'path': path, 'error': error} for path, error in result.errors], exit_code=exit_code)
+    if not args.json:
+        print(result.message, file=sys.stderr)
+        for path, error in result.errors:
+            print(f"失败: {path}: {error}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+可取消的批量任务调度
+
+JobScheduler 按优先级把单个文件的转换任务提交到进程池，并支持：
+- 取消：CancellationToken.cancel() 后不再提交新任务，并立即终止进行中的任务
+- 暂停/继续：暂停期间不提交新任务，进行中的任务继续完成
+- 单文件超时：超时的任务记为失败；工作进程无法单独终止，因此终止整个进程池后重建，
+  其余进行中的任务重新排队，一个异常文件不会拖住整个批次
+- 工作进程崩溃：进程池重建后，只有导致崩溃的任务记为失败
+结果按完成顺序产出 (任务序号, 结果, 异常)；进度经由Manager队列从工作进程转发（见 batch.QueueProgress）。
+"""
+import os
+import heapq
+import queue
+import signal
+import threading
+import time
+import subprocess
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import QueueProgress, default_workers
+
+
+class FileTimeoutError(Exception):
+    """单个文件的转换超过了时间限制"""
+
+
+class CancellationToken:
+    """在界面线程与调度器之间共享的取消/暂停标志，可在任意线程中调用"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # 唤醒处于暂停中的调度器
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def pause(self):
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def wait_if_paused(self, timeout=None):
+        """暂停时阻塞直到继续、取消或超时；返回是否处于运行状态"""
+        return self._running.wait(timeout)
+
+
+def _init_worker(initializer=None):
+    """工作进程初始化：在POSIX系统上成为新进程组的组长，终止时可以连同它启动的子进程一起终止"""
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    if initializer is not None:
+        initializer()
+
+
+def _kill_process_tree(process):
+    """
+    终止工作进程及其子进程（常驻pandoc server、PDF页面分片进程等）
+    被强制终止的工作进程不会执行自身的清理逻辑，只终止工作进程会留下孤儿子进程
+    """
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    try:
+        # 尚未完成初始化的工作进程仍属于本进程的进程组，此时它也还没有子进程，只终止它自己
+        if os.getpgid(process.pid) == process.pid:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+    except OSError:
+        pass
+    process.terminate()
+
+
+def _kill_executor(executor):
+    """立即终止进程池中的所有工作进程及其子进程"""
+    # ProcessPoolExecutor 没有公开终止单个任务的接口，只能直接终止其工作进程
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            _kill_process_tree(process)
+    for process in processes:
+        process.join(timeout=5)
+
+
+class WorkerPool:
+    """
+    可重建的进程池
+
+    工作进程各自位于独立的进程组，终止时连同其子进程一起终止；
+    工作进程异常退出（进程池抛出 BrokenProcessPool）或需要强制终止任务时，用 rebuild() 换用新的进程池。
+
+    用法:
+        pool = WorkerPool(4)
+        executor = pool.executor
+        try:
+            executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            pool.rebuild(executor)
+        pool.shutdown()
+    """
+
+    def __init__(self, max_workers, initializer=None, mp_context=None):
+        self.max_workers = max_workers
+        self.initializer = initializer  # 在每个工作进程中额外执行的初始化函数（需可被pickle）
+        self.mp_context = mp_context  # multiprocessing启动方式，None为平台默认
+        self.lock = threading.Lock()
+        self.executor = self._create()
+
+    def _create(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.mp_context,
+                                   initializer=partial(_init_worker, self.initializer))
+
+    def rebuild(self, executor=None):
+        """
+        终止当前进程池（包括进行中的任务）并换用新的进程池
+        :param executor: 发现问题时使用的进程池；已被其他调用方换掉时不再重复重建
+        :return: 是否进行了重建
+        """
+        with self.lock:
+            if executor is not None and executor is not self.executor:
+                return False
+            old, self.executor = self.executor, self._create()
+        _kill_executor(old)
+        return True
+
+    def shutdown(self, kill=False, cancel_futures=False):
+        """关闭进程池；kill为True时立即终止进行中的任务"""
+        if kill:
+            _kill_executor(self.executor)
+        else:
+            self.executor.shutdown(wait=True, cancel_futures=cancel_futures)
+
+
+class JobScheduler:
+    """
+    按优先级调度单文件任务
+
+    用法:
+        token = CancellationToken()
+        scheduler = JobScheduler(max_workers=4, timeout=300, token=token)
+        for idx, result, error in scheduler.run(convert_to_markdown, tasks):
+            ...
+    """
+
+    def __init__(self, max_workers=None, timeout=None, token=None):
+        self.max_workers = max_workers or default_workers()
+        self.timeout = timeout  # 单个文件的超时秒数，None表示不限制
+        self.token = token or CancellationToken()
+        self.lock = threading.Lock()
+        self.priorities = {}
+        self.heap = []
+
+    def set_priority(self, index, priority):
+        """调整尚未开始的任务的优先级（数值越小越先执行），可在其他线程中调用"""
+        with self.lock:
+            self.priorities[index] = priority
+            entries = [(self.priorities[idx], idx) for _, idx in self.heap]
+            if entries:
+                heapq.heapify(entries)
+                self.heap[:] = entries
+
+    def _push(self, index):
+        with self.lock:
+            heapq.heappush(self.heap, (self.priorities.get(index, 0), index))
+
+    def _pop(self):
+        with self.lock:
+            return heapq.heappop(self.heap)[1] if self.heap else None
+
+    def run(self, func, tasks, priorities=None, on_progress=None):
+        """
+        执行任务
+        :param func: 模块级函数（需可被pickle）
+        :param tasks: 参数元组列表
+        :param priorities: 可选，与tasks对应的优先级（数值越小越先执行），默认按输入顺序
+        :param on_progress: 可选回调 on_progress(任务序号, 当前, 总数)；提供时 func 需接受关键字参数 progress
+        :return: 生成器，产出 (任务序号, 结果, 异常)；取消后未完成的任务不再产出
+        """
+        self.priorities = {idx: priorities[idx] if priorities else 0 for idx in range(len(tasks))}
+        self.heap = []
+        for idx in range(len(tasks)):
+            self._push(idx)
+
+        # 只有一个进程时同样在进程池中执行：当前线程中的任务无法中途终止，取消和超时要等整个文件完成
+        max_workers = max(1, min(self.max_workers, len(tasks)))
+        yield from self._run_pool(func, tasks, max_workers, on_progress)
+
+    def _run_pool(self, func, tasks, max_workers, on_progress):
+        # 工作进程无法直接回调，进度经由Manager队列转发
+        manager = multiprocessing.Manager() if on_progress else None
+        progress_queue = manager.Queue() if manager else None
+
+        def drain_progress():
+            while progress_queue is not None:
+                try:
+                    on_progress(*progress_queue.get_nowait())
+                except queue.Empty:
+                    return
+
+        pool = WorkerPool(max_workers)
+        running = {}  # future -> (任务序号, 开始时间)
+        isolated = set()  # 进程池损坏时正在执行的任务，之后逐个单独执行
+        try:
+            while not self.token.cancelled:
+                # 同时提交的任务不超过进程数，保证优先级生效，且超时从真正开始执行时计算
+                while len(running) < max_workers and not self.token.paused:
+                    if any(idx in isolated for idx, _ in running.values()):
+                        break
+                    idx = self._pop()
+                    if idx is None:
+                        break
+                    if idx in isolated and running:
+                        # 等进行中的任务完成后再单独执行
+                        self._push(idx)
+                        break
+                    kwargs = {'progress': QueueProgress(progress_queue, idx)} if progress_queue is not None else {}
+                    running[pool.executor.submit(func, *tasks[idx], **kwargs)] = (idx, time.monotonic())
+
+                if not running:
+                    with self.lock:
+                        if not self.heap:
+                            break
+                    self.token.wait_if_paused(0.2)
+                    continue
+
+                done, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                drain_progress()
+                crashed = []
+                broken_error = None
+                for future in done:
+                    idx, _ = running.pop(future)
+                    try:
+                        yield idx, future.result(), None
+                    except BrokenProcessPool as e:
+                        # 工作进程异常退出（如崩溃），进程池已不可用，所有进行中的任务都会收到这个异常
+                        crashed.append(idx)
+                        broken_error = e
+                    except Exception as e:
+                        yield idx, None, e
+
+                expired = []
+                if self.timeout:
+                    now = time.monotonic()
+                    expired = [future for future, (_, started) in running.items() if now - started > self.timeout]
+                    for future in expired:
+                        idx, _ = running.pop(future)
+                        yield idx, None, FileTimeoutError(f"超过 {self.timeout} 秒未完成，已终止")
+
+                if crashed:
+                    crashed.extend(idx for idx, _ in running.values())
+                    running.clear()
+                    if len(crashed) == 1:
+                        yield crashed[0], None, broken_error
+                    else:
+                        # 无法得知是哪个任务导致工作进程退出：全部重新排队并逐个单独执行，
+                        # 单独执行时再次使进程池损坏的任务记为失败
+                        isolated.update(crashed)
+                        for idx in crashed:
+                            self._push(idx)
+
+                if (crashed or expired) and not self.token.cancelled:
+                    # 终止并重建进程池，其余进行中的任务重新排队
+                    for idx, _ in running.values():
+                        self._push(idx)
+                    running.clear()
+                    pool.rebuild()
+        finally:
+            pool.shutdown(kill=self.token.cancelled or bool(running))
+            if manager:
+                manager.shutdown()
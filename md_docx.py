@@ -0,0 +1,718 @@
+"""
+原生Markdown转Word（docx）引擎
+
+Markdown先整体解析为块级语法树，再一次性拼接出正文XML，与模板中不变的部件一起写入docx包：
+不逐段调用python-docx，也不启动pandoc进程。
+模板使用python-docx自带的默认模板（含标题、列表、引用、表格样式），每个进程只读取一次；
+样式表等较大的部件预先压缩为基础包，每个文档只需复制基础包并追加正文、编号、关系等少量部件。
+
+支持：ATX/Setext标题、段落（行尾两个空格或反斜杠为换行）、粗体/斜体/删除线/下划线（<u>）、
+行内代码、链接、图片（本地文件）、有序/无序列表（含嵌套）、代码块（围栏和缩进）、引用、
+表格（含列对齐）、分隔线。
+"""
+import io
+import os
+import re
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+# 块级语法树节点
+Heading = namedtuple('Heading', ['level', 'text'])
+Paragraph = namedtuple('Paragraph', ['text'])
+CodeBlock = namedtuple('CodeBlock', ['language', 'text'])
+Quote = namedtuple('Quote', ['blocks'])
+ListBlock = namedtuple('ListBlock', ['ordered', 'start', 'items'])  # items: 每个列表项的块列表
+Table = namedtuple('Table', ['header', 'aligns', 'rows'])  # aligns: 'left'/'center'/'right'/None
+Rule = namedtuple('Rule', [])
+
+# 行内片段：text为文字；code/bold/italic/strike/underline为格式；link为链接地址；image为图片地址
+Span = namedtuple('Span', ['text', 'bold', 'italic', 'strike', 'underline', 'code', 'link', 'image'],
+                  defaults=[False, False, False, False, False, None, None])
+
+_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})\s*([^`\s]*)[^`]*$')
+_ATX = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+_SETEXT = re.compile(r'^ {0,3}(=+|-+)[ \t]*$')
+_RULE = re.compile(r'^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+_LIST_ITEM = re.compile(r'^( *)([-*+]|\d{1,9}[.)])(?:([ \t]+)(.*)|[ \t]*)$')
+_QUOTE = re.compile(r'^ {0,3}> ?(.*)$')
+_TABLE_DELIMITER = re.compile(r'^ *\|? *:?-+:? *(?:\| *:?-+:? *)*\|? *$')
+_INVALID_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip(' '))
+
+
+def _expand_tabs(line):
+    return line.expandtabs(4) if '\t' in line else line
+
+
+def _is_block_start(line):
+    """该行是否会打断段落（开始一个新的块）"""
+    return bool(_ATX.match(line) or _FENCE.match(line) or _RULE.match(line)
+                or _QUOTE.match(line) or _LIST_ITEM.match(line))
+
+
+def split_table_row(line):
+    """按未转义的 | 拆分表格行"""
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in re.split(r'(?<!\\)\|', line)]
+
+
+def _table_aligns(delimiter):
+    aligns = []
+    for cell in split_table_row(delimiter):
+        left, right = cell.startswith(':'), cell.endswith(':')
+        aligns.append('center' if left and right else 'right' if right else 'left' if left else None)
+    return aligns
+
+
+def parse_markdown(text):
+    """把Markdown文本解析为块列表"""
+    return parse_blocks([_expand_tabs(line) for line in text.splitlines()])
+
+
+def iter_markdown_blocks(lines):
+    """
+    从行迭代器（如打开的文件）逐块解析Markdown，不需要先读入全部文本，结果与 parse_markdown 相同
+
+    空行之后顶格、且不是列表项的行之前的块都已结束（围栏代码块内除外），在此处切分，
+    缓冲的行交给 parse_blocks 解析后即可产出，缓冲区只保留当前这一段
+    """
+    chunk = []
+    fence = None  # 未结束的顶层围栏代码块的围栏标记
+    after_blank = False
+    for raw in lines:
+        # 与 str.splitlines 的分行规则一致
+        for line in raw.splitlines() or ['']:
+            line = _expand_tabs(line)
+            stripped = line.strip()
+            if fence is None:
+                if stripped and after_blank and chunk and not _indent(line) and not _LIST_ITEM.match(line):
+                    yield from parse_blocks(chunk)
+                    chunk = []
+                if match := _FENCE.match(line):
+                    fence = match.group(1)
+            elif stripped.startswith(fence[0] * len(fence)) and not stripped.strip(fence[0]):
+                fence = None
+            chunk.append(line)
+            after_blank = not stripped
+    if chunk:
+        yield from parse_blocks(chunk)
+
+
+def parse_blocks(lines):
+    blocks = []
+    i = 0
+    n = len(lines)
+    while i < n:
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+
+        # 围栏代码块
+        if fence := _FENCE.match(line):
+            marker, language = fence.group(1), fence.group(2)
+            indent = _indent(line)
+            code = []
+            i += 1
+            while i < n:
+                stripped = lines[i].strip()
+                if stripped.startswith(marker[0] * len(marker)) and not stripped.strip(marker[0]):
+                    i += 1
+                    break
+                # 去掉与开始围栏相同的缩进
+                code.append(lines[i][min(indent, _indent(lines[i])):])
+                i += 1
+            blocks.append(CodeBlock(language, "\n".join(code)))
+            continue
+
+        # 缩进代码块
+        if _indent(line) >= 4:
+            code = []
+            while i < n and (_indent(lines[i]) >= 4 or not lines[i].strip()):
+                code.append(lines[i][4:])
+                i += 1
+            while code and not code[-1].strip():
+                code.pop()
+            blocks.append(CodeBlock('', "\n".join(code)))
+            continue
+
+        if heading := _ATX.match(line):
+            blocks.append(Heading(len(heading.group(1)), (heading.group(2) or '').strip()))
+            i += 1
+            continue
+
+        if _RULE.match(line):
+            blocks.append(Rule())
+            i += 1
+            continue
+
+        if _QUOTE.match(line):
+            quoted = []
+            while i < n and lines[i].strip():
+                match = _QUOTE.match(lines[i])
+                # 没有 > 的行视为上一段的延续
+                quoted.append(match.group(1) if match else lines[i])
+                i += 1
+            blocks.append(Quote(parse_blocks(quoted)))
+            continue
+
+        if _LIST_ITEM.match(line):
+            block, i = _parse_list(lines, i)
+            blocks.append(block)
+            continue
+
+        # 表格：表头行之后紧跟分隔行
+        if '|' in line and i + 1 < n and _TABLE_DELIMITER.match(lines[i + 1]) and '-' in lines[i + 1]:
+            header = split_table_row(line)
+            aligns = _table_aligns(lines[i + 1])
+            rows = []
+            i += 2
+            while i < n and lines[i].strip() and '|' in lines[i]:
+                rows.append(split_table_row(lines[i]))
+                i += 1
+            blocks.append(Table(header, aligns, rows))
+            continue
+
+        # 段落：直到空行或其他块开始；下一行为 === 或 --- 时是Setext标题
+        paragraph = [line.lstrip(' ')]
+        i += 1
+        while i < n and lines[i].strip():
+            if setext := _SETEXT.match(lines[i]):
+                blocks.append(Heading(1 if setext.group(1)[0] == '=' else 2, " ".join(s.strip() for s in paragraph)))
+                paragraph = None
+                i += 1
+                break
+            if _is_block_start(lines[i]) or ('|' in lines[i] and i + 1 < n and _TABLE_DELIMITER.match(lines[i + 1])
+                                             and '-' in lines[i + 1]):
+                break
+            paragraph.append(lines[i].lstrip(' '))
+            i += 1
+        if paragraph:
+            # 行尾的两个空格表示换行，只在段落内部有意义
+            blocks.append(Paragraph("\n".join(paragraph).rstrip()))
+    return blocks
+
+
+def _parse_list(lines, i):
+    """解析从第i行开始的列表，返回 (ListBlock, 下一行序号)"""
+    n = len(lines)
+    first = _LIST_ITEM.match(lines[i])
+    ordered = first.group(2)[-1] in '.)'
+    marker_char = first.group(2)[-1]
+    start = int(first.group(2)[:-1]) if ordered else 1
+    base_indent = len(first.group(1))
+    items = []
+
+    while i < n:
+        match = _LIST_ITEM.match(lines[i])
+        if (not match or len(match.group(1)) > base_indent + 3
+                or (match.group(2)[-1] in '.)') != ordered or match.group(2)[-1] != marker_char):
+            break
+        item_indent = len(match.group(1))
+        spacing = len(match.group(3) or ' ')
+        if spacing > 4:
+            spacing = 1  # 内容本身是缩进代码块时，标记后只算一个空格
+        content_indent = item_indent + len(match.group(2)) + spacing
+        body = [(match.group(3) or '')[spacing:] + (match.group(4) or '')]
+        i += 1
+        while i < n:
+            line = lines[i]
+            indent = _indent(line)
+            if not line.strip():
+                # 空行之后仍有缩进内容时属于当前项，否则列表（或当前项）结束
+                j = i + 1
+                while j < n and not lines[j].strip():
+                    j += 1
+                if j < n and _indent(lines[j]) >= content_indent:
+                    body.extend([""] * (j - i))
+                    i = j
+                    continue
+                break
+            if indent >= content_indent:
+                body.append(line[content_indent:])
+            elif _LIST_ITEM.match(line) and indent > item_indent:
+                body.append(line[min(indent, content_indent):])  # 缩进不足的子列表
+            elif not _is_block_start(line) and body[-1].strip():
+                body.append(line.strip(' '))  # 段落的懒惰延续行
+            else:
+                break
+            i += 1
+        items.append(parse_blocks(body))
+
+        # 列表项之间的空行
+        j = i
+        while j < n and not lines[j].strip():
+            j += 1
+        if j < n and j > i and _LIST_ITEM.match(lines[j]) and _indent(lines[j]) <= base_indent + 3:
+            i = j
+    return ListBlock(ordered, start, items), i
+
+
+# 行内标记
+_INLINE = re.compile(r'''
+    (?P<escape>\\[\\`*_{}\[\]()#+\-.!|~<>])
+  | (?P<code>`+)
+  | (?P<image>!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+"[^"]*")?\))
+  | (?P<link>\[(?P<label>(?:[^\[\]\\]|\\.|\[[^\]]*\])*)\]\((?P<href>[^)\s]*)(?:\s+"[^"]*")?\))
+  | (?P<autolink><(?P<url>(?:https?|ftp|mailto):[^>\s]+)>)
+  | (?P<underline><u>(?P<utext>.*?)</u>)
+  | (?P<br><br\s*/?>|\\\n|\ {2,}\n)
+  | (?P<delim>\*+|_+|~~)
+''', re.X | re.S)
+
+
+def _find_closer(text, pos, delim):
+    """查找与起始分隔符长度相同的结束分隔符（前一个字符不能是空白）"""
+    char = delim[0]
+    pattern = re.compile(r'(?<![\\%s])%s(?!%s)' % (re.escape(char), re.escape(delim), re.escape(char)))
+    for match in pattern.finditer(text, pos):
+        start = match.start()
+        if start > pos and not text[start - 1].isspace():
+            # _ 不能出现在单词内部（如 snake_case）
+            if char == '_' and match.end() < len(text) and text[match.end()].isalnum():
+                continue
+            return start
+    return -1
+
+
+def parse_inline(text, style=None):
+    """
+    把行内Markdown解析为Span列表
+    :param style: 继承的格式（Span，text字段忽略）
+    """
+    style = style or Span('')
+    spans = []
+    buffer = []
+
+    def flush():
+        if buffer:
+            spans.append(style._replace(text="".join(buffer)))
+            buffer.clear()
+
+    pos = 0
+    while pos < len(text):
+        match = _INLINE.search(text, pos)
+        if not match:
+            break
+        buffer.append(text[pos:match.start()].replace("\n", " "))
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == 'escape':
+            buffer.append(match.group()[1])
+        elif kind == 'code':
+            ticks = match.group()
+            end = text.find(ticks, pos)
+            while end != -1 and text[end + len(ticks):end + len(ticks) + 1] == '`':
+                end = text.find(ticks, end + len(ticks) + 1)
+            if end == -1:
+                buffer.append(ticks)
+                continue
+            code = text[pos:end].replace("\n", " ")
+            if len(code) > 2 and code[0] == ' ' and code[-1] == ' ':
+                code = code[1:-1]
+            flush()
+            spans.append(style._replace(text=code, code=True))
+            pos = end + len(ticks)
+        elif kind == 'image':
+            flush()
+            spans.append(style._replace(text=match.group('alt'), image=match.group('src')))
+        elif kind == 'link':
+            flush()
+            href = match.group('href')
+            spans.extend(parse_inline(match.group('label'), style._replace(link=href) if href else style))
+        elif kind == 'autolink':
+            flush()
+            url = match.group('url')
+            spans.append(style._replace(text=url, link=url))
+        elif kind == 'underline':
+            flush()
+            spans.extend(parse_inline(match.group('utext'), style._replace(underline=True)))
+        elif kind == 'br':
+            flush()
+            spans.append(style._replace(text="\n"))
+        else:
+            delim = match.group()
+            if delim not in ('~~',) and len(delim) > 3:
+                buffer.append(delim)
+                continue
+            close = -1
+            # 起始分隔符后不能是空白；_ 不能位于单词内部
+            if pos < len(text) and not text[pos].isspace() and not (
+                    delim[0] == '_' and match.start() > 0 and text[match.start() - 1].isalnum()):
+                close = _find_closer(text, pos, delim)
+            if close == -1:
+                buffer.append(delim)
+                continue
+            flush()
+            if delim == '~~':
+                inner = style._replace(strike=True)
+            else:
+                inner = style._replace(bold=style.bold or len(delim) >= 2,
+                                       italic=style.italic or len(delim) in (1, 3))
+            spans.extend(parse_inline(text[pos:close], inner))
+            pos = close + len(delim)
+    buffer.append(text[pos:].replace("\n", " "))
+    flush()
+    return spans
+
+
+# ---------------------------------------------------------------------------
+# docx写出
+
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_RT_HYPERLINK = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink'
+_RT_IMAGE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+_RT_THUMBNAIL = 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail'
+
+# 每个文档都会重新生成的部件，不放入基础包
+_DYNAMIC_PARTS = ('[Content_Types].xml', '_rels/.rels', 'word/document.xml', 'word/_rels/document.xml.rels',
+                  'word/numbering.xml', 'docProps/thumbnail.jpeg')
+
+EMU_PER_TWIP = 635
+CODE_FONT = 'Consolas'
+LINK_COLOR = '0563C1'
+
+
+class _Template:
+    """从python-docx默认模板中读取的不变部分，每个进程只构建一次"""
+
+    def __init__(self, path):
+        with zipfile.ZipFile(path) as zf:
+            parts = {name: zf.read(name) for name in zf.namelist()}
+
+        # 样式表等不变的部件预先压缩为基础包，写文档时整体复制
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as base:
+            for name, data in parts.items():
+                if name not in _DYNAMIC_PARTS:
+                    base.writestr(name, data)
+        self.base = buffer.getvalue()
+
+        document = parts['word/document.xml'].decode('utf-8')
+        body_start = document.index('<w:body>') + len('<w:body>')
+        sect_start = document.index('<w:sectPr')
+        self.document_head = document[:body_start]
+        self.document_tail = document[sect_start:]
+
+        # 模板的缩略图是空白文档的预览，不保留
+        self.package_rels = re.sub(r'\s*<Relationship [^>]*%s[^>]*/>' % re.escape(_RT_THUMBNAIL), '',
+                                   parts['_rels/.rels'].decode('utf-8'))
+        self.content_types = parts['[Content_Types].xml'].decode('utf-8')
+        self.document_rels = parts['word/_rels/document.xml.rels'].decode('utf-8')
+        self.numbering = parts['word/numbering.xml'].decode('utf-8')
+        self.next_rel_id = max(int(rid) for rid in re.findall(r'Id="rId(\d+)"', self.document_rels)) + 1
+        self.next_num_id = max(int(nid) for nid in re.findall(r'w:numId="(\d+)"', self.numbering)) + 1
+
+        # 有序列表样式对应的抽象编号，用于让每个列表重新从头编号
+        styles = parts['word/styles.xml'].decode('utf-8')
+        abstract = dict(re.findall(r'<w:num w:numId="(\d+)">\s*<w:abstractNumId w:val="(\d+)"/>', self.numbering))
+        self.list_abstract = {}
+        for style_id in ('ListNumber', 'ListNumber2', 'ListNumber3'):
+            match = re.search(r'w:styleId="%s".*?<w:numId w:val="(\d+)"/>' % style_id, styles, re.S)
+            if match and match.group(1) in abstract:
+                self.list_abstract[style_id] = abstract[match.group(1)]
+
+        # 正文宽度（缇），用于表格列宽和图片缩放
+        size = re.search(r'<w:pgSz w:w="(\d+)"', document)
+        margins = re.search(r'<w:pgMar w:top="\d+" w:right="(\d+)" w:bottom="\d+" w:left="(\d+)"', document)
+        self.text_width = int(size.group(1)) - int(margins.group(1)) - int(margins.group(2)) \
+            if size and margins else 8640
+
+
+_template = None
+
+
+def get_template():
+    global _template
+    if _template is None:
+        import docx  # 只用到其自带的默认模板
+
+        _template = _Template(os.path.join(os.path.dirname(docx.__file__), 'templates', 'default.docx'))
+    return _template
+
+
+def _text(value):
+    return escape(_INVALID_XML.sub('', value))
+
+
+class DocxWriter:
+    """把块列表写为一个docx文件"""
+
+    def __init__(self, base_dir=None):
+        self.template = get_template()
+        self.base_dir = base_dir or os.getcwd()  # 图片相对路径的基准目录
+        self.parts = []  # 正文XML片段
+        self.relationships = []  # 新增的关系XML
+        self.numbering = []  # 新增的编号实例XML
+        self.media = {}  # 图片文件路径 -> (关系ID, 部件名, 数据) 或 None（无法读取）
+        self.extensions = {}  # 新增的图片扩展名 -> 内容类型
+        self.rel_id = self.template.next_rel_id
+        self.num_id = self.template.next_num_id
+        self.links = {}  # 链接地址 -> 关系ID
+        self.drawing_id = 0
+
+    # -- 关系与编号 --
+
+    def _relate(self, rel_type, target, external=False):
+        rel_id = f"rId{self.rel_id}"
+        self.rel_id += 1
+        mode = ' TargetMode="External"' if external else ''
+        self.relationships.append(f'<Relationship Id="{rel_id}" Type="{rel_type}" Target={quoteattr(target)}{mode}/>')
+        return rel_id
+
+    def _link_id(self, url):
+        if url not in self.links:
+            self.links[url] = self._relate(_RT_HYPERLINK, url, external=True)
+        return self.links[url]
+
+    def _new_numbering(self, style_id, start):
+        """为有序列表新建编号实例，使每个列表从自己的起始序号开始"""
+        abstract = self.template.list_abstract.get(style_id)
+        if abstract is None:
+            return None
+        num_id = self.num_id
+        self.num_id += 1
+        self.numbering.append(f'<w:num w:numId="{num_id}"><w:abstractNumId w:val="{abstract}"/>'
+                              f'<w:lvlOverride w:ilvl="0"><w:startOverride w:val="{start}"/></w:lvlOverride>'
+                              f'</w:num>')
+        return num_id
+
+    def _image(self, src):
+        """登记图片，返回 (关系ID, 宽EMU, 高EMU)；非本地文件或无法识别时返回None"""
+        if re.match(r'^[a-z][a-z0-9+.-]*://', src, re.I):
+            return None
+        path = os.path.normpath(os.path.join(self.base_dir, src.split('#')[0].split('?')[0]))
+        if path not in self.media:
+            self.media[path] = None
+            try:
+                from docx.image.image import Image
+
+                image = Image.from_file(path)
+            except Exception:
+                return None
+            ext = image.ext.lower()
+            part_name = f"media/image{len(self.media)}.{ext}"
+            if ext != 'jpeg':
+                self.extensions[ext] = image.content_type
+            with open(path, 'rb') as f:
+                data = f.read()
+            rel_id = self._relate(_RT_IMAGE, part_name)
+            # 按图片自身的DPI换算尺寸，超过正文宽度时等比缩小
+            width = int(image.px_width * 914400 / (image.horz_dpi or 72))
+            height = int(image.px_height * 914400 / (image.vert_dpi or 72))
+            max_width = self.template.text_width * EMU_PER_TWIP
+            if width > max_width:
+                height = int(height * max_width / width)
+                width = max_width
+            self.media[path] = (rel_id, part_name, data, width, height)
+        entry = self.media[path]
+        return (entry[0], entry[3], entry[4]) if entry else None
+
+    # -- 行内 --
+
+    def _run(self, span, size=None):
+        props = []
+        if span.code:
+            props.append(f'<w:rFonts w:ascii="{CODE_FONT}" w:hAnsi="{CODE_FONT}" w:cs="{CODE_FONT}"/>')
+        if span.bold:
+            props.append('<w:b/>')
+        if span.italic:
+            props.append('<w:i/>')
+        if span.strike:
+            props.append('<w:strike/>')
+        if span.link:
+            props.append(f'<w:color w:val="{LINK_COLOR}"/>')
+        if size:
+            props.append(f'<w:sz w:val="{size}"/>')
+        if span.underline or span.link:
+            props.append('<w:u w:val="single"/>')
+        if span.code:
+            props.append('<w:shd w:val="clear" w:color="auto" w:fill="F2F2F2"/>')
+        rpr = "".join(props)
+        rpr = f"<w:rPr>{rpr}</w:rPr>" if rpr else ""
+
+        content = []
+        for i, line in enumerate(span.text.split("\n")):
+            if i:
+                content.append('<w:br/>')
+            for j, piece in enumerate(line.split("\t")):
+                if j:
+                    content.append('<w:tab/>')
+                if piece:
+                    content.append(f'<w:t xml:space="preserve">{_text(piece)}</w:t>')
+        return f"<w:r>{rpr}{''.join(content)}</w:r>"
+
+    def _drawing(self, rel_id, width, height, name):
+        self.drawing_id += 1
+        pid = self.drawing_id
+        return ('<w:r><w:drawing><wp:inline distT="0" distB="0" distL="0" distR="0">'
+                f'<wp:extent cx="{width}" cy="{height}"/><wp:docPr id="{pid}" name="Picture {pid}"/>'
+                '<wp:cNvGraphicFramePr><a:graphicFrameLocks xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+                '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+                '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+                '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+                f'<pic:nvPicPr><pic:cNvPr id="0" name={quoteattr(_INVALID_XML.sub("", name))}/><pic:cNvPicPr/></pic:nvPicPr>'
+                f'<pic:blipFill><a:blip r:embed="{rel_id}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+                f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{width}" cy="{height}"/></a:xfrm>'
+                '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr></pic:pic>'
+                '</a:graphicData></a:graphic></wp:inline></w:drawing></w:r>')
+
+    def _inline(self, text, style=None):
+        """行内Markdown转为运行XML；连续指向同一地址的片段放在同一个超链接中"""
+        out = []
+        link = None
+        for span in parse_inline(text, style):
+            if span.link and span.link.startswith('#'):
+                span = span._replace(link=None)  # 文档内锚点不生成链接
+            if span.link != link:
+                if link is not None:
+                    out.append('</w:hyperlink>')
+                link = span.link
+                if link is not None:
+                    out.append(f'<w:hyperlink r:id="{self._link_id(link)}" w:history="1">')
+            if span.image is not None:
+                image = self._image(span.image)
+                if image:
+                    out.append(self._drawing(*image, span.text or os.path.basename(span.image)))
+                    continue
+                span = span._replace(text=span.text or span.image)
+            if span.text:
+                out.append(self._run(span))
+        if link is not None:
+            out.append('</w:hyperlink>')
+        return "".join(out)
+
+    # -- 块 --
+
+    def _paragraph(self, inner, style=None, props=""):
+        ppr = (f'<w:pStyle w:val="{style}"/>' if style else '') + props
+        self.parts.append(f"<w:p>{f'<w:pPr>{ppr}</w:pPr>' if ppr else ''}{inner}</w:p>")
+
+    def _code(self, block):
+        runs = self._run(Span(block.text, code=True), size=20) if block.text else ""
+        self._paragraph(runs, props='<w:shd w:val="clear" w:color="auto" w:fill="F2F2F2"/>'
+                                    '<w:spacing w:after="120" w:line="240" w:lineRule="auto"/>')
+
+    def _table(self, block):
+        if self.parts and self.parts[-1].startswith('<w:tbl>'):
+            # 相邻的两个表格之间需要段落分隔，否则Word会把它们合并为一个表格
+            self._paragraph("")
+        columns = max(1, len(block.header))
+        width = self.template.text_width // columns
+        xml = ['<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/>'
+               '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" w:lastColumn="0" '
+               'w:noHBand="0" w:noVBand="1"/></w:tblPr><w:tblGrid>']
+        xml.append(f'<w:gridCol w:w="{width}"/>' * columns)
+        xml.append('</w:tblGrid>')
+        for row_index, row in enumerate([block.header] + block.rows):
+            # 单元格数与表头对齐：多余的忽略，不足的补空
+            cells = (row + [""] * columns)[:columns]
+            xml.append('<w:tr><w:trPr><w:tblHeader/></w:trPr>' if row_index == 0 else '<w:tr>')
+            for col, cell in enumerate(cells):
+                align = block.aligns[col] if col < len(block.aligns) else None
+                jc = f'<w:pPr><w:jc w:val="{align}"/></w:pPr>' if align else ''
+                runs = self._inline(cell, Span('', bold=True) if row_index == 0 else None)
+                xml.append(f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr><w:p>{jc}{runs}</w:p></w:tc>')
+            xml.append('</w:tr>')
+        xml.append('</w:tbl>')
+        self.parts.append("".join(xml))
+
+    def _list(self, block, depth, quote):
+        level = min(depth, 2)
+        suffix = str(level + 1) if level else ''
+        style = ('ListNumber' if block.ordered else 'ListBullet') + suffix
+        props = ""
+        if block.ordered:
+            num_id = self._new_numbering(style, block.start)
+            if num_id is not None:
+                props = f'<w:numPr><w:ilvl w:val="0"/><w:numId w:val="{num_id}"/></w:numPr>'
+        for item in block.items:
+            first = True
+            for child in item:
+                if first and isinstance(child, Paragraph):
+                    self._paragraph(self._inline(child.text), style, props)
+                elif isinstance(child, Paragraph):
+                    # 列表项中的后续段落与列表文字对齐
+                    self._paragraph(self._inline(child.text), 'ListContinue' + suffix)
+                else:
+                    if first:
+                        self._paragraph("", style, props)  # 以其他块开始的列表项也要显示项目符号
+                    self._block(child, depth + 1, quote)
+                first = False
+            if not item:
+                self._paragraph("", style, props)
+
+    def _block(self, block, depth=0, quote=False):
+        if isinstance(block, Heading):
+            self._paragraph(self._inline(block.text), f"Heading{block.level}")
+        elif isinstance(block, Paragraph):
+            self._paragraph(self._inline(block.text), 'Quote' if quote else None)
+        elif isinstance(block, CodeBlock):
+            self._code(block)
+        elif isinstance(block, ListBlock):
+            self._list(block, depth, quote)
+        elif isinstance(block, Table):
+            self._table(block)
+        elif isinstance(block, Quote):
+            for child in block.blocks:
+                self._block(child, depth, True)
+        elif isinstance(block, Rule):
+            self._paragraph("", props='<w:pBdr><w:bottom w:val="single" w:sz="6" w:space="1" w:color="auto"/></w:pBdr>')
+
+    def add_blocks(self, blocks):
+        for block in blocks:
+            self._block(block)
+
+    # -- 写出 --
+
+    def save(self, output_path):
+        template = self.template
+        document = template.document_head + "".join(self.parts) + template.document_tail
+        rels = template.document_rels.replace('</Relationships>', "".join(self.relationships) + '</Relationships>')
+        numbering = template.numbering.replace('</w:numbering>', "".join(self.numbering) + '</w:numbering>')
+        content_types = template.content_types.replace('</Types>', "".join(
+            f'<Default Extension="{ext}" ContentType="{content_type}"/>'
+            for ext, content_type in self.extensions.items()) + '</Types>')
+
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(template.base)
+        try:
+            with zipfile.ZipFile(tmp_path, 'a', zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr('[Content_Types].xml', content_types)
+                zf.writestr('_rels/.rels', template.package_rels)
+                zf.writestr('word/document.xml', document)
+                zf.writestr('word/_rels/document.xml.rels', rels)
+                zf.writestr('word/numbering.xml', numbering)
+                for entry in self.media.values():
+                    if entry:
+                        # 图片本身已压缩，原样存储
+                        zf.writestr('word/' + entry[1], entry[2], zipfile.ZIP_STORED)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def write_docx(blocks, output_path, base_dir=None):
+    """把块列表写为docx文件；base_dir为图片相对路径的基准目录"""
+    writer = DocxWriter(base_dir)
+    writer.add_blocks(blocks)
+    writer.save(output_path)
+
+
+def convert_markdown_file(md_path, output_path, base_dir=None):
+    """将Markdown文件转换为docx文件；base_dir为图片相对路径的基准目录，默认为Markdown文件所在目录"""
+    with open(md_path, 'r', encoding='utf-8-sig') as f:
+        blocks = parse_markdown(f.read())
+    write_docx(blocks, output_path, base_dir or os.path.dirname(os.path.abspath(md_path)))
@@ -0,0 +1,289 @@
+"""
+原生Markdown转PDF引擎（reportlab）
+
+与 md_docx 共用Markdown解析器，把块级语法树逐块转换为reportlab的flowable：
+标题、段落、行内格式与链接、图片（本地文件）、有序/无序列表（含嵌套）、代码块、引用、表格、分隔线。
+Markdown文件按行逐块解析，flowable由生成器按需产生，排版器每排完一个才取下一个，
+大文档不会同时持有全部语法树或flowable。
+样式表每个进程只创建一次，批量转换时各文件共用。
+中日韩文字使用reportlab内置的CID字体（STSong-Light），不需要额外的字体文件。
+"""
+import os
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+from md_docx import (iter_markdown_blocks, parse_inline, Span, Heading, Paragraph, CodeBlock, Quote,
+                     ListBlock, Table, Rule)
+
+CJK_FONT = 'STSong-Light'
+CODE_FONT = 'Courier'
+LINK_COLOR = '#0563C1'
+QUOTE_INDENT = 18
+LIST_INDENT = 18
+LOOKAHEAD = 16  # 排版器检查“与下一段同页”时可见的后续flowable数
+
+# 需要换用CID字体显示的字符：CJK符号与标点、假名、汉字、谚文、全角字符
+_CJK = re.compile('[\u2e80-\u9fff\ua960-\ua97f\uac00-\ud7ff\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef]+')
+_INVALID_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Styles:
+    """一个进程内共用的段落与表格样式"""
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+
+        self.body = ParagraphStyle('Body', fontName='Helvetica', fontSize=10.5, leading=15, spaceAfter=6)
+        self.headings = [ParagraphStyle(f'Heading{level}', parent=self.body, fontName='Helvetica-Bold',
+                                        fontSize=size, leading=size * 1.25, spaceBefore=size * 0.6,
+                                        spaceAfter=size * 0.3, keepWithNext=1)
+                         for level, size in enumerate((20, 16, 14, 12, 11, 10.5), 1)]
+        self.quote = ParagraphStyle('Quote', parent=self.body, textColor=colors.HexColor('#555555'))
+        self.code = ParagraphStyle('Code', parent=self.body, fontName=CODE_FONT, fontSize=9, leading=11.5,
+                                   backColor=colors.HexColor('#F2F2F2'), borderPadding=4,
+                                   spaceBefore=4, spaceAfter=10)
+        self.list_item = ParagraphStyle('ListItem', parent=self.body, spaceAfter=2)
+        cell = ParagraphStyle('Cell', parent=self.body, fontSize=9.5, leading=12.5, spaceAfter=0)
+        self.cells = {align: ParagraphStyle(f'Cell-{align}', parent=cell, alignment=value)
+                      for align, value in (('left', TA_LEFT), ('center', TA_CENTER), ('right', TA_RIGHT))}
+        self.cells[None] = self.cells['left']
+        self.table = [
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#999999')),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8E8E8')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]
+        self.rule_color = colors.HexColor('#999999')
+
+
+_styles = None
+
+
+def get_styles():
+    global _styles
+    if _styles is None:
+        _styles = _Styles()
+    return _styles
+
+
+class LazyFlowables:
+    """
+    以列表接口包装flowable生成器，供 DocTemplate.build 使用
+
+    build 只从列表头部取出、放回flowable，并通过 len() 判断是否结束；
+    这里只缓冲头部的少量flowable，其余在需要时才由生成器产生。
+    """
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.buffer = []
+        self.exhausted = False
+
+    def _fill(self, count):
+        while len(self.buffer) < count and not self.exhausted:
+            try:
+                self.buffer.append(next(self.iterator))
+            except StopIteration:
+                self.exhausted = True
+
+    def __len__(self):
+        # 预读若干个，使 keepWithNext 能看到紧随其后的flowable
+        self._fill(LOOKAHEAD)
+        return len(self.buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None and index.stop >= 0 else float('inf'))
+        else:
+            self._fill(index + 1 if index >= 0 else float('inf'))
+        return self.buffer[index]
+
+    def __setitem__(self, index, value):
+        self.buffer[index] = value
+
+    def __delitem__(self, index):
+        self._fill(index.stop if isinstance(index, slice) and index.stop else 1)
+        del self.buffer[index]
+
+    def insert(self, index, value):
+        self.buffer.insert(index, value)
+
+
+class FlowableWriter:
+    """把块列表转换为flowable"""
+
+    def __init__(self, base_dir=None, width=None):
+        self.styles = get_styles()
+        self.base_dir = base_dir or os.getcwd()  # 图片相对路径的基准目录
+        self.width = width  # 正文宽度（磅），用于缩放图片和分配表格列宽
+        self.images = {}  # 图片文件路径 -> (宽, 高)，无法读取时为None
+
+    # -- 行内 --
+
+    def _image(self, src, max_width):
+        """返回图片的 <img/> 标记；非本地文件或无法读取时返回None"""
+        if re.match(r'^[a-z][a-z0-9+.-]*://', src, re.I):
+            return None
+        path = os.path.normpath(os.path.join(self.base_dir, src.split('#')[0].split('?')[0]))
+        if path not in self.images:
+            self.images[path] = None
+            try:
+                from reportlab.lib.utils import ImageReader
+
+                self.images[path] = ImageReader(path).getSize()
+            except Exception:
+                return None
+        size = self.images[path]
+        if not size:
+            return None
+        width, height = size  # 按72 DPI换算为磅，超过可用宽度时等比缩小
+        if width > max_width:
+            height = height * max_width / width
+            width = max_width
+        return f'<img src={quoteattr(path)} width="{width:.1f}" height="{height:.1f}" valign="bottom"/>'
+
+    @staticmethod
+    def _text(value):
+        value = escape(_INVALID_CHARS.sub('', value))
+        return _CJK.sub(lambda m: f'<font face="{CJK_FONT}">{m.group()}</font>', value)
+
+    def _span(self, span):
+        if span.text == "\n":
+            return '<br/>'
+        text = self._text(span.text)
+        if span.code:
+            text = f'<font face="{CODE_FONT}">{text}</font>'
+        for flag, tag in ((span.bold, 'b'), (span.italic, 'i'), (span.strike, 'strike'), (span.underline, 'u')):
+            if flag:
+                text = f'<{tag}>{text}</{tag}>'
+        return text
+
+    def _inline(self, text, style=None, max_width=None):
+        """行内Markdown转为reportlab段落标记；连续指向同一地址的片段放在同一个链接中"""
+        out = []
+        link = None
+        for span in parse_inline(text, style):
+            if span.link and span.link.startswith('#'):
+                span = span._replace(link=None)  # 文档内锚点不生成链接
+            if span.link != link:
+                if link is not None:
+                    out.append('</a>')
+                link = span.link
+                if link is not None:
+                    out.append(f'<a href={quoteattr(link)} color="{LINK_COLOR}">')
+            if span.image is not None:
+                image = self._image(span.image, max_width or self.width or 400)
+                if image:
+                    out.append(image)
+                    continue
+                span = span._replace(text=span.text or span.image)
+            if span.text:
+                out.append(self._span(span))
+        if link is not None:
+            out.append('</a>')
+        return "".join(out)
+
+    def _paragraph(self, text, style, inline_style=None, max_width=None):
+        from reportlab.platypus import Paragraph as PdfParagraph
+
+        return PdfParagraph(self._inline(text, inline_style, max_width), style)
+
+    # -- 块 --
+
+    def _code(self, block):
+        from reportlab.platypus import Preformatted
+
+        style = self.styles.code
+        # 按等宽字体的字符宽度折行，避免长行超出页面
+        max_chars = int((self.width or 450) / (style.fontSize * 0.6)) - 1
+        return Preformatted(_INVALID_CHARS.sub('', block.text) or " ", style, maxLineLength=max_chars,
+                            newLineChars='')
+
+    def _table(self, block):
+        from reportlab.platypus import Table as PdfTable, TableStyle
+
+        columns = max(1, len(block.header))
+        col_width = (self.width or 450) / columns
+        data = []
+        for row_index, row in enumerate([block.header] + block.rows):
+            # 单元格数与表头对齐：多余的忽略，不足的补空
+            cells = (row + [""] * columns)[:columns]
+            data.append([self._paragraph(cell, self.styles.cells[block.aligns[col] if col < len(block.aligns) else None],
+                                         Span('', bold=True) if row_index == 0 else None, col_width - 12)
+                         for col, cell in enumerate(cells)])
+        table = PdfTable(data, colWidths=[col_width] * columns, repeatRows=1, hAlign='LEFT')
+        table.setStyle(TableStyle(self.styles.table))
+        return table
+
+    def _list(self, block, depth):
+        from reportlab.platypus import ListFlowable, ListItem
+
+        items = []
+        for item in block.items:
+            content = []
+            for child in item:
+                if isinstance(child, Paragraph):
+                    content.append(self._paragraph(child.text, self.styles.list_item))
+                else:
+                    content.extend(self._flowables(child, depth + 1))
+            items.append(ListItem(content or [self._paragraph("", self.styles.list_item)]))
+        if block.ordered:
+            return ListFlowable(items, bulletType='1', start=block.start, leftIndent=LIST_INDENT,
+                                bulletFontName='Helvetica', bulletFontSize=self.styles.body.fontSize)
+        return ListFlowable(items, bulletType='bullet', start='•' if depth % 2 == 0 else '–',
+                            leftIndent=LIST_INDENT, bulletFontName='Helvetica',
+                            bulletFontSize=self.styles.body.fontSize)
+
+    def _flowables(self, block, depth=0, quote=False):
+        """生成一个块对应的flowable"""
+        from reportlab.platypus import Spacer
+        from reportlab.platypus.flowables import HRFlowable
+        from reportlab.platypus.doctemplate import Indenter
+
+        if isinstance(block, Heading):
+            yield self._paragraph(block.text, self.styles.headings[block.level - 1])
+        elif isinstance(block, Paragraph):
+            yield self._paragraph(block.text, self.styles.quote if quote else self.styles.body)
+        elif isinstance(block, CodeBlock):
+            yield self._code(block)
+        elif isinstance(block, ListBlock):
+            yield self._list(block, depth)
+        elif isinstance(block, Table):
+            yield self._table(block)
+            yield Spacer(1, 8)
+        elif isinstance(block, Quote):
+            yield Indenter(left=QUOTE_INDENT)
+            for child in block.blocks:
+                yield from self._flowables(child, depth, True)
+            yield Indenter(left=-QUOTE_INDENT)
+        elif isinstance(block, Rule):
+            yield HRFlowable(width='100%', thickness=0.5, color=self.styles.rule_color, spaceBefore=6, spaceAfter=6)
+
+    def iter_flowables(self, blocks):
+        for block in blocks:
+            yield from self._flowables(block)
+
+
+def write_pdf(blocks, output_path, base_dir=None):
+    """把块列表（或块的迭代器）写为PDF文件；base_dir为图片相对路径的基准目录"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Spacer
+
+    doc = SimpleDocTemplate(output_path, pagesize=A4, leftMargin=54, rightMargin=54, topMargin=54, bottomMargin=54)
+    writer = FlowableWriter(base_dir, doc.width)
+    flowables = LazyFlowables(writer.iter_flowables(blocks))
+    if not len(flowables):
+        flowables.insert(0, Spacer(1, 1))  # 空文档也输出一页
+    doc.build(flowables)
+
+
+def convert_markdown_file(md_path, output_path, base_dir=None):
+    """将Markdown文件转换为PDF文件；base_dir为图片相对路径的基准目录，默认为Markdown文件所在目录"""
+    # 边读文件边解析：排版器取用flowable时才读取后续内容
+    with open(md_path, 'r', encoding='utf-8-sig') as f:
+        write_pdf(iter_markdown_blocks(f), output_path, base_dir or os.path.dirname(os.path.abspath(md_path)))
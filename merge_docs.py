@@ -0,0 +1,645 @@
+"""
+拼接多个docx/pdf文件为一个文档
+
+合并导出时各Markdown文件先并行转换为独立的中间文档，再由这里按顺序拼接，
+不必把所有输入合并成一个巨大的Markdown再串行转换。
+
+- docx：样式、页面设置、页眉页脚等取自第一个文件，其余文件只取正文。
+  正文中引用的图片和超链接关系、列表编号、脚注/尾注、书签和绘图对象的编号都会重新分配，
+  内容相同的图片只保存一份，内容相同的列表定义合并为一个。
+  正文先逐个文件写入临时文件，内存占用不随文件数增长。
+  图表等自身带有下级关系的部件只复制部件本身。
+- pdf：按页拼接，需要安装 pypdf（未安装时 pdf_concat_available() 返回False）；
+  每个文件在书签中对应一项。
+"""
+import os
+import hashlib
+import tempfile
+import posixpath
+import zipfile
+
+from utils import W_NS, W_BODY, W_VAL, W_P, W_PPR, R_NS, REL_NS, REL_RELATIONSHIP, docx_main_part
+
+CT_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+CT_DEFAULT = f'{{{CT_NS}}}Default'
+CT_OVERRIDE = f'{{{CT_NS}}}Override'
+RT_NUMBERING = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering'
+RT_FOOTNOTES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/footnotes'
+RT_ENDNOTES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/endnotes'
+CT_NUMBERING = 'application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml'
+CT_FOOTNOTES = 'application/vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml'
+CT_ENDNOTES = 'application/vnd.openxmlformats-officedocument.wordprocessingml.endnotes+xml'
+CT_RELATIONSHIPS = 'application/vnd.openxmlformats-package.relationships+xml'
+
+W_SECT_PR = f'{{{W_NS}}}sectPr'
+W_ID = f'{{{W_NS}}}id'
+W_TYPE = f'{{{W_NS}}}type'
+W_NUM = f'{{{W_NS}}}num'
+W_NUM_ID = f'{{{W_NS}}}numId'
+W_ABSTRACT_NUM = f'{{{W_NS}}}abstractNum'
+W_ABSTRACT_NUM_ID = f'{{{W_NS}}}abstractNumId'
+W_NSID = f'{{{W_NS}}}nsid'
+W_TMPL = f'{{{W_NS}}}tmpl'
+W_BOOKMARK_START = f'{{{W_NS}}}bookmarkStart'
+W_BOOKMARK_END = f'{{{W_NS}}}bookmarkEnd'
+WP_DOC_PR = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr'
+R_PREFIX = f'{{{R_NS}}}'
+
+# 脚注和尾注：(关系类型, 内容类型, 引用元素, 注释元素, 根元素)
+_NOTES = {
+    'footnotes': (RT_FOOTNOTES, CT_FOOTNOTES, f'{{{W_NS}}}footnoteReference', f'{{{W_NS}}}footnote',
+                  f'{{{W_NS}}}footnotes'),
+    'endnotes': (RT_ENDNOTES, CT_ENDNOTES, f'{{{W_NS}}}endnoteReference', f'{{{W_NS}}}endnote',
+                 f'{{{W_NS}}}endnotes'),
+}
+_NOTE_REFERENCES = {spec[2]: kind for kind, spec in _NOTES.items()}
+_BODY_MARKER = '__merge_docs_body__'
+COPY_CHUNK = 1024 * 1024
+
+
+def _rels_name(part):
+    source_dir, name = posixpath.split(part)
+    return posixpath.join(source_dir, '_rels', name + '.rels')
+
+
+def _read_xml(zf, name):
+    from lxml import etree
+
+    try:
+        return etree.fromstring(zf.read(name))
+    except KeyError:
+        return None
+
+
+def _part_by_type(zf, part, rel_type):
+    """部件的某类关系指向的部件在zip中的路径，没有时返回None"""
+    rels = _read_xml(zf, _rels_name(part))
+    if rels is None:
+        return None
+    for rel in rels.iter(REL_RELATIONSHIP):
+        if rel.get('Type') == rel_type and rel.get('TargetMode') != 'External':
+            return _resolve(part, rel.get('Target'))
+    return None
+
+
+def _resolve(part, target):
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+
+_relationship_xpath = None
+
+
+def _with_relationships(element):
+    """元素及其后代中带有关系ID属性（r:id、r:embed等）的元素"""
+    global _relationship_xpath
+    if _relationship_xpath is None:
+        from lxml import etree
+
+        _relationship_xpath = etree.XPath('descendant-or-self::*[@r:*]', namespaces={'r': R_NS})
+    return _relationship_xpath(element)
+
+
+def _max_int(values, default=0):
+    result = default
+    for value in values:
+        try:
+            result = max(result, int(value))
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+class _Relationships:
+    """输出文件中某个部件的关系表，新增关系使用不会与原有关系冲突的ID"""
+
+    def __init__(self, part, root):
+        from lxml import etree
+
+        self.part = part
+        self.root = root if root is not None else etree.Element(f'{{{REL_NS}}}Relationships', nsmap={None: REL_NS})
+        self.ids = {rel.get('Id') for rel in self.root.iter(REL_RELATIONSHIP)}
+        self.external = {}  # (关系类型, 地址) -> 关系ID
+        self.internal = {}  # (关系类型, 部件路径) -> 关系ID
+        self.counter = 0
+
+    def add(self, rel_type, target, external=False):
+        from lxml import etree
+
+        cache = self.external if external else self.internal
+        key = (rel_type, target)
+        if key in cache:
+            return cache[key]
+        while True:
+            self.counter += 1
+            rel_id = f"rIdMerged{self.counter}"
+            if rel_id not in self.ids:
+                break
+        self.ids.add(rel_id)
+        rel = etree.SubElement(self.root, REL_RELATIONSHIP, Id=rel_id, Type=rel_type,
+                               Target=target if external else posixpath.relpath(target, posixpath.dirname(self.part)))
+        if external:
+            rel.set('TargetMode', 'External')
+        cache[key] = rel_id
+        return rel_id
+
+
+class _Source:
+    """正在追加的一个docx文件"""
+
+    def __init__(self, merger, zf):
+        self.merger = merger
+        self.zf = zf
+        self.main = docx_main_part(zf)
+        self.rel_maps = {}  # 源部件 -> {原关系ID: 新关系ID}
+        self.rels = {}  # 源部件 -> {关系ID: 关系元素}
+        self.content_types = None
+        self.numbering = None
+        self.num_map = {}
+        self.abstract_map = {}
+        self.bookmark_map = {}
+        self.notes = {}  # 'footnotes'/'endnotes' -> (部件路径, {注释ID: 注释元素})
+        self.note_map = {}
+
+    def _relationships(self, part):
+        if part not in self.rels:
+            root = _read_xml(self.zf, _rels_name(part))
+            self.rels[part] = {rel.get('Id'): rel for rel in root.iter(REL_RELATIONSHIP)} if root is not None else {}
+        return self.rels[part]
+
+    def content_type(self, name):
+        if self.content_types is None:
+            root = _read_xml(self.zf, '[Content_Types].xml')
+            self.content_types = ({el.get('PartName'): el.get('ContentType') for el in root.iter(CT_OVERRIDE)},
+                                  {el.get('Extension').lower(): el.get('ContentType') for el in root.iter(CT_DEFAULT)})
+        overrides, defaults = self.content_types
+        return overrides.get('/' + name) or defaults.get(posixpath.splitext(name)[1][1:].lower())
+
+    def rel_id(self, part, target_part, rel_id):
+        """源部件 part 中的关系ID对应到输出文件部件 target_part 中的关系ID；无法对应时返回None"""
+        mapping = self.rel_maps.setdefault(part, {})
+        if rel_id not in mapping:
+            rel = self._relationships(part).get(rel_id)
+            new_id = None
+            if rel is not None:
+                rels = self.merger.relationships(target_part)
+                if rel.get('TargetMode') == 'External':
+                    new_id = rels.add(rel.get('Type'), rel.get('Target'), external=True)
+                else:
+                    copied = self.merger.copy_part(self, _resolve(part, rel.get('Target')))
+                    if copied:
+                        new_id = rels.add(rel.get('Type'), copied)
+            mapping[rel_id] = new_id
+        return mapping[rel_id]
+
+    def num_id(self, num_id):
+        if num_id not in self.num_map:
+            if self.numbering is None:
+                part = _part_by_type(self.zf, self.main, RT_NUMBERING)
+                root = _read_xml(self.zf, part) if part else None
+                self.numbering = ({el.get(W_NUM_ID): el for el in root.iter(W_NUM)},
+                                  {el.get(W_ABSTRACT_NUM_ID): el for el in root.iter(W_ABSTRACT_NUM)}
+                                  ) if root is not None else ({}, {})
+            nums, abstracts = self.numbering
+            num = nums.get(num_id)
+            if num is None:
+                self.num_map[num_id] = num_id
+            else:
+                ref = num.find(W_ABSTRACT_NUM_ID)
+                abstract_id = ref.get(W_VAL) if ref is not None else None
+                if abstract_id not in self.abstract_map:
+                    abstract = abstracts.get(abstract_id)
+                    self.abstract_map[abstract_id] = self.merger.add_abstract(abstract) if abstract is not None else None
+                self.num_map[num_id] = self.merger.add_num(num, self.abstract_map[abstract_id])
+        return self.num_map[num_id]
+
+    def note_id(self, kind, note_id):
+        key = (kind, note_id)
+        if key not in self.note_map:
+            if kind not in self.notes:
+                part = _part_by_type(self.zf, self.main, _NOTES[kind][0])
+                root = _read_xml(self.zf, part) if part else None
+                self.notes[kind] = (part, {el.get(W_ID): el for el in root.iter(_NOTES[kind][3])}
+                                    if root is not None else {})
+            part, notes = self.notes[kind]
+            note = notes.get(note_id)
+            self.note_map[key] = self.merger.add_note(self, kind, part, note) if note is not None else note_id
+        return self.note_map[key]
+
+    def bookmark_id(self, bookmark_id):
+        if bookmark_id not in self.bookmark_map:
+            self.bookmark_map[bookmark_id] = str(self.merger.next_id('bookmark'))
+        return self.bookmark_map[bookmark_id]
+
+    def remap(self, element, part, target_part):
+        """重新分配元素内引用的关系、编号、脚注、书签和绘图对象ID"""
+        for el in _with_relationships(element):
+            for name, value in el.attrib.items():
+                if name.startswith(R_PREFIX):
+                    new_id = self.rel_id(part, target_part, value)
+                    if new_id:
+                        el.set(name, new_id)
+                    else:
+                        del el.attrib[name]  # 指向的部件不存在
+        for el in element.iter(W_NUM_ID, W_BOOKMARK_START, W_BOOKMARK_END, WP_DOC_PR, *_NOTE_REFERENCES):
+            tag = el.tag
+            if tag == W_NUM_ID:
+                if el.get(W_VAL) not in (None, '0'):
+                    el.set(W_VAL, self.num_id(el.get(W_VAL)))
+            elif tag == WP_DOC_PR:
+                el.set('id', str(self.merger.next_id('drawing')))
+            elif el.get(W_ID) is None:
+                continue
+            elif tag in _NOTE_REFERENCES:
+                el.set(W_ID, self.note_id(_NOTE_REFERENCES[tag], el.get(W_ID)))
+            else:
+                el.set(W_ID, self.bookmark_id(el.get(W_ID)))
+
+
+class DocxConcatenator:
+    """
+    按顺序拼接docx文件
+
+    用法:
+        with DocxConcatenator('合并文档.docx', separator=True) as merger:
+            for path in paths:
+                merger.append(path)
+    """
+
+    def __init__(self, output_path, separator=False):
+        self.output_path = output_path
+        self.separator = separator  # 是否在相邻两个文件之间插入分隔线
+        self.tmp_path = output_path + '.tmp'
+        self.out = None
+        self.body = None  # 正文片段临时文件
+        self.count = 0
+        self.counters = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # -- 第一个文件 --
+
+    def _start(self, zf):
+        from lxml import etree
+
+        self.main = docx_main_part(zf)
+        root = etree.fromstring(zf.read(self.main))
+        body = root.find(W_BODY)
+        children = list(body)
+        self.sect_pr = children.pop() if children and children[-1].tag == W_SECT_PR else None
+        self.counters = {
+            'bookmark': _max_int(el.get(W_ID) for el in root.iter(W_BOOKMARK_START)) + 1,
+            'drawing': _max_int(el.get('id') for el in root.iter(WP_DOC_PR)) + 1,
+        }
+        for child in list(body):
+            body.remove(child)
+        body.text = _BODY_MARKER
+        self.head, self.tail = etree.tostring(root, encoding='unicode').split(_BODY_MARKER)
+        self.head = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' + self.head
+        # 与根元素声明相同的命名空间不必在每个正文片段上重复声明
+        self.namespace_decls = [f' xmlns:{prefix}="{uri}"' if prefix else f' xmlns="{uri}"'
+                                for prefix, uri in root.nsmap.items()]
+
+        self.content_types = _read_xml(zf, '[Content_Types].xml')
+        self.defaults = {el.get('Extension').lower() for el in self.content_types.iter(CT_DEFAULT)}
+        self.overrides = {el.get('PartName') for el in self.content_types.iter(CT_OVERRIDE)}
+        self.names = set(zf.namelist())
+        self.rels = {}
+        self.rels_roots = {}  # 从第一个文件读取的关系表
+        self.media = {}  # (内容SHA-256, 扩展名) -> 输出文件中的部件路径
+
+        numbering_part = _part_by_type(zf, self.main, RT_NUMBERING)
+        self.numbering_part = numbering_part
+        self.numbering = _read_xml(zf, numbering_part) if numbering_part else None
+        self.new_abstracts = []
+        self.new_nums = []
+        self.abstract_keys = {}  # 列表定义的规范化XML -> abstractNumId
+        self.next_num = self.next_abstract = 1
+        if self.numbering is not None:
+            self.next_num = _max_int(el.get(W_NUM_ID) for el in self.numbering.iter(W_NUM)) + 1
+            self.next_abstract = _max_int(el.get(W_ABSTRACT_NUM_ID)
+                                          for el in self.numbering.iter(W_ABSTRACT_NUM)) + 1
+            for abstract in self.numbering.iter(W_ABSTRACT_NUM):
+                self.abstract_keys.setdefault(self._abstract_key(abstract), abstract.get(W_ABSTRACT_NUM_ID))
+
+        self.notes = {}  # 'footnotes'/'endnotes' -> [部件路径, 根元素, 下一个ID]
+        for kind, (rel_type, *_rest) in _NOTES.items():
+            part = _part_by_type(zf, self.main, rel_type)
+            root = _read_xml(zf, part) if part else None
+            if root is not None:
+                self.notes[kind] = [part, root, _max_int(el.get(W_ID) for el in root.iter(_NOTES[kind][3])) + 1]
+
+        # 正文、关系、编号、脚注等部件在最后写出，其余部件原样复制
+        rewritten = {'[Content_Types].xml', self.main, _rels_name(self.main), numbering_part}
+        for kind, (part, _root, _next) in self.notes.items():
+            rewritten.update((part, _rels_name(part)))
+        self.out = zipfile.ZipFile(self.tmp_path, 'w', zipfile.ZIP_DEFLATED)
+        for info in zf.infolist():
+            if info.filename not in rewritten:
+                # 记录第一个文件中图片的哈希，后续文件中相同的图片直接引用
+                digest = hashlib.sha256() if '/media/' in info.filename else None
+                with zf.open(info) as src, self.out.open(info.filename, 'w') as dst:
+                    while chunk := src.read(COPY_CHUNK):
+                        dst.write(chunk)
+                        if digest:
+                            digest.update(chunk)
+                if digest:
+                    self.media.setdefault((digest.hexdigest(), posixpath.splitext(info.filename)[1].lower()),
+                                          info.filename)
+        for name in rewritten:
+            if name and name.endswith('.rels') and name in self.names:
+                self.rels_roots[name] = _read_xml(zf, name)
+
+        self.body = tempfile.TemporaryFile('w+', encoding='utf-8')
+        for child in children:
+            self._write(child)
+
+    @staticmethod
+    def _abstract_key(abstract):
+        """去掉编号和随机标识后的列表定义，用于识别内容相同的定义"""
+        import copy
+        from lxml import etree
+
+        abstract = copy.deepcopy(abstract)
+        abstract.attrib.pop(W_ABSTRACT_NUM_ID, None)
+        for child in list(abstract):
+            if child.tag in (W_NSID, W_TMPL):
+                abstract.remove(child)
+        return etree.tostring(abstract)
+
+    def _write_body(self, body):
+        """写出正文的全部子元素"""
+        from lxml import etree
+
+        text = etree.tostring(body, encoding='unicode')
+        end = text.find('>')
+        start_tag = text[:end]
+        if start_tag.endswith('/'):
+            return  # 空正文
+        for decl in self.namespace_decls:
+            start_tag = start_tag.replace(decl, '')
+        bare_tag = f'<{body.prefix}:body' if body.prefix else '<body'
+        if start_tag.strip() == bare_tag:
+            # 用到的命名空间都已在根元素声明，整段写出
+            self.body.write(text[end + 1:text.rindex('<')])
+        else:
+            for child in body:
+                self._write(child)
+
+    def _write(self, element):
+        from lxml import etree
+
+        text = etree.tostring(element, encoding='unicode')
+        end = text.index('>')
+        start_tag = text[:end]
+        for decl in self.namespace_decls:
+            start_tag = start_tag.replace(decl, '')
+        self.body.write(start_tag + text[end:])
+
+    # -- 供 _Source 使用 --
+
+    def next_id(self, kind):
+        value = self.counters[kind]
+        self.counters[kind] += 1
+        return value
+
+    def relationships(self, part):
+        if part not in self.rels:
+            self.rels[part] = _Relationships(part, self.rels_roots.get(_rels_name(part)))
+        return self.rels[part]
+
+    def copy_part(self, source, name):
+        """复制被引用的部件（如图片），内容相同的只保存一份；返回输出文件中的部件路径"""
+        try:
+            data = source.zf.read(name)
+        except KeyError:
+            return None
+        ext = posixpath.splitext(name)[1].lower()
+        key = (hashlib.sha256(data).hexdigest(), ext)
+        if key in self.media:
+            return self.media[key]
+        stem = posixpath.join(posixpath.dirname(name), 'merged')
+        index = len(self.media) + 1
+        while f"{stem}{index}{ext}" in self.names:
+            index += 1
+        target = f"{stem}{index}{ext}"
+        self.names.add(target)
+
+        content_type = source.content_type(name)
+        if ext[1:] not in self.defaults and content_type:
+            self._add_override(target, content_type)
+        # 图片本身已压缩，原样存储
+        compress = zipfile.ZIP_STORED if content_type and content_type.startswith('image/') else zipfile.ZIP_DEFLATED
+        self.out.writestr(target, data, compress)
+        self.media[key] = target
+        return target
+
+    def _add_override(self, part, content_type):
+        from lxml import etree
+
+        etree.SubElement(self.content_types, CT_OVERRIDE, PartName='/' + part, ContentType=content_type)
+        self.overrides.add('/' + part)
+
+    def _ensure_part(self, part, rel_type, content_type, root_tag):
+        """第一个文件没有编号、脚注等部件时新建"""
+        from lxml import etree
+
+        self.relationships(self.main).add(rel_type, part)
+        self._add_override(part, content_type)
+        self.names.add(part)
+        return etree.Element(root_tag, nsmap={'w': W_NS, 'r': R_NS})
+
+    def _ensure_numbering(self):
+        if self.numbering is None:
+            self.numbering_part = posixpath.join(posixpath.dirname(self.main), 'numbering.xml')
+            self.numbering = self._ensure_part(self.numbering_part, RT_NUMBERING, CT_NUMBERING,
+                                               f'{{{W_NS}}}numbering')
+
+    def add_abstract(self, abstract):
+        """登记列表定义，与已有定义内容相同时直接使用已有的；返回输出文件中的abstractNumId"""
+        import copy
+
+        self._ensure_numbering()
+        key = self._abstract_key(abstract)
+        if key not in self.abstract_keys:
+            abstract = copy.deepcopy(abstract)
+            abstract.set(W_ABSTRACT_NUM_ID, str(self.next_abstract))
+            self.abstract_keys[key] = str(self.next_abstract)
+            self.next_abstract += 1
+            self.new_abstracts.append(abstract)
+        return self.abstract_keys[key]
+
+    def add_num(self, num, abstract_id):
+        """登记列表实例，返回输出文件中的numId"""
+        import copy
+
+        self._ensure_numbering()
+        num = copy.deepcopy(num)
+        if abstract_id is not None:
+            num.find(W_ABSTRACT_NUM_ID).set(W_VAL, abstract_id)
+        # 每个列表实例单独编号，保持原文档中各列表的起始序号
+        num.set(W_NUM_ID, str(self.next_num))
+        self.next_num += 1
+        self.new_nums.append(num)
+        return num.get(W_NUM_ID)
+
+    def add_note(self, source, kind, source_part, note):
+        import copy
+
+        rel_type, content_type, _ref, _tag, root_tag = _NOTES[kind]
+        if kind not in self.notes:
+            part = posixpath.join(posixpath.dirname(self.main), f'{kind}.xml')
+            root = self._ensure_part(part, rel_type, content_type, root_tag)
+            # 分隔线注释从来源文件复制
+            for separator in note.getparent():
+                if separator.get(W_TYPE) in ('separator', 'continuationSeparator'):
+                    root.append(copy.deepcopy(separator))
+            self.notes[kind] = [part, root, _max_int(el.get(W_ID) for el in root) + 1]
+        entry = self.notes[kind]
+        note = copy.deepcopy(note)
+        new_id = str(entry[2])
+        entry[2] += 1
+        note.set(W_ID, new_id)
+        source.remap(note, source_part, entry[0])
+        entry[1].append(note)
+        return new_id
+
+    # -- 追加与写出 --
+
+    def append(self, path):
+        """追加一个docx文件"""
+        from lxml import etree
+
+        with zipfile.ZipFile(path) as zf:
+            if self.out is None:
+                self._start(zf)
+            else:
+                source = _Source(self, zf)
+                body = etree.fromstring(zf.read(source.main)).find(W_BODY)
+                if len(body) and body[-1].tag == W_SECT_PR:
+                    body.remove(body[-1])
+                source.remap(body, source.main, self.main)
+                if self.separator:
+                    self._write(self._rule())
+                self._write_body(body)
+        self.count += 1
+
+    @staticmethod
+    def _rule():
+        """分隔线：带下边框的空段落，与内置引擎转换Markdown中 --- 的结果相同"""
+        from lxml import etree
+
+        p = etree.Element(W_P, nsmap={'w': W_NS})
+        border = etree.SubElement(etree.SubElement(etree.SubElement(p, W_PPR), f'{{{W_NS}}}pBdr'),
+                                  f'{{{W_NS}}}bottom')
+        for name, value in (('val', 'single'), ('sz', '6'), ('space', '1'), ('color', 'auto')):
+            border.set(f'{{{W_NS}}}{name}', value)
+        return p
+
+    def close(self):
+        """写出拼接后的文档；没有追加任何文件时不创建文件"""
+        from lxml import etree
+
+        if self.out is None:
+            return
+        try:
+            if self.sect_pr is not None:
+                self._write(self.sect_pr)
+            with self.out.open(self.main, 'w') as dst:
+                dst.write(self.head.encode('utf-8'))
+                self.body.seek(0)
+                while chunk := self.body.read(COPY_CHUNK):
+                    dst.write(chunk.encode('utf-8'))
+                dst.write(self.tail.encode('utf-8'))
+
+            if self.numbering is not None:
+                nums = self.numbering.findall(W_NUM)
+                for abstract in self.new_abstracts:
+                    # 所有列表定义须位于列表实例之前
+                    if nums:
+                        nums[0].addprevious(abstract)
+                    else:
+                        self.numbering.append(abstract)
+                for num in self.new_nums:
+                    self.numbering.append(num)
+                self.out.writestr(self.numbering_part, etree.tostring(self.numbering, xml_declaration=True,
+                                                                      encoding='UTF-8', standalone=True))
+            for part, root, _next in self.notes.values():
+                self.out.writestr(part, etree.tostring(root, xml_declaration=True, encoding='UTF-8',
+                                                       standalone=True))
+            for name, root in self.rels_roots.items():
+                if root is not None and all(_rels_name(part) != name for part in self.rels):
+                    self.out.writestr(name, etree.tostring(root, xml_declaration=True, encoding='UTF-8',
+                                                           standalone=True))
+            for part, rels in self.rels.items():
+                self.out.writestr(_rels_name(part), etree.tostring(rels.root, xml_declaration=True,
+                                                                   encoding='UTF-8', standalone=True))
+            if 'rels' not in self.defaults:
+                etree.SubElement(self.content_types, CT_DEFAULT, Extension='rels', ContentType=CT_RELATIONSHIPS)
+            self.out.writestr('[Content_Types].xml', etree.tostring(self.content_types, xml_declaration=True,
+                                                                    encoding='UTF-8', standalone=True))
+            self.out.close()
+            self.out = None
+            os.replace(self.tmp_path, self.output_path)
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self.body.close()
+
+    def abort(self):
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+        if self.body is not None:
+            self.body.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+def concat_docx(paths, output_path, separator=False):
+    """按顺序拼接docx文件，separator为True时在相邻文件之间插入分隔线；返回拼接的文件数"""
+    with DocxConcatenator(output_path, separator) as merger:
+        for path in paths:
+            merger.append(path)
+    return merger.count
+
+
+def pdf_concat_available():
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def concat_pdf(paths, output_path, titles=None):
+    """
+    按顺序拼接PDF文件，返回拼接的文件数
+    :param titles: 可选，与paths对应的书签标题
+    """
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    tmp_path = output_path + '.tmp'
+    try:
+        for idx, path in enumerate(paths):
+            writer.append(path, outline_item=titles[idx] if titles else None)
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    finally:
+        writer.close()
+    return len(paths)
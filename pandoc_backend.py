@@ -0,0 +1,154 @@
+"""
+常驻pandoc后端
+
+pypandoc.convert_file 每转换一个文件就启动一次pandoc进程，大量小文件时进程启动开销占主导。
+pandoc 3.0起提供 `pandoc server` 子命令，以HTTP接口常驻运行；这里在每个进程内按需启动一个
+pandoc server，之后的转换都通过它完成。进程池中的每个工作进程各自持有一个，相当于pandoc工作进程池。
+不支持server模式（pandoc版本过旧或未安装）时返回None，由调用方退回到逐文件调用。
+"""
+import json
+import time
+import base64
+import shutil
+import socket
+import subprocess
+import urllib.request
+import urllib.error
+from multiprocessing import util
+
+_server = None
+_server_unavailable = False
+
+
+def find_pandoc():
+    """查找pandoc可执行文件，优先使用pypandoc的配置"""
+    try:
+        import pypandoc
+        return pypandoc.get_pandoc_path()
+    except Exception:
+        return shutil.which('pandoc')
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class PandocServer:
+    """一个常驻的 `pandoc server` 进程，只监听本机地址"""
+
+    def __init__(self, pandoc_path, timeout=120):
+        self.pandoc_path = pandoc_path
+        self.timeout = timeout  # 单次转换的超时（秒）
+        self.port = None
+        self.process = None
+
+    def start(self, startup_timeout=10):
+        """启动server并等待端口可用，失败时抛出RuntimeError"""
+        self.port = _free_port()
+        self.process = subprocess.Popen(
+            [self.pandoc_path, 'server', '--port', str(self.port), '--timeout', str(self.timeout)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("当前pandoc不支持server模式（需要pandoc 3.0以上）")
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError("pandoc server启动超时")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}{path}",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout + 5) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"pandoc server转换失败: {e.read().decode('utf-8', 'replace')}") from e
+
+    @staticmethod
+    def _decode(result):
+        if 'error' in result:
+            raise RuntimeError(f"pandoc server转换失败: {result['error']}")
+        output = result['output']
+        return base64.b64decode(output) if result.get('base64') else output.encode('utf-8')
+
+    def convert_text(self, text, to, from_format='markdown'):
+        """转换一段文本，返回输出内容（bytes）"""
+        return self._decode(self._post('/', {'text': text, 'from': from_format, 'to': to, 'standalone': True}))
+
+
+def get_pandoc_server():
+    """
+    获取当前进程的常驻pandoc server，首次调用时启动
+    :return: PandocServer，不可用时返回None（结果会被记住，不再重复尝试）
+    """
+    global _server, _server_unavailable
+    if _server is not None:
+        if _server.process and _server.process.poll() is None:
+            return _server
+        _server = None  # server意外退出，重新启动
+    if _server_unavailable:
+        return None
+
+    pandoc_path = find_pandoc()
+    if not pandoc_path:
+        _server_unavailable = True
+        return None
+    try:
+        _server = PandocServer(pandoc_path).start()
+    except (OSError, RuntimeError):
+        _server_unavailable = True
+        return None
+
+    # 进程退出时关闭server；multiprocessing的Finalize在主进程和进程池工作进程中都会执行
+    util.Finalize(_server, _server.stop, exitpriority=10)
+    return _server
+
+
+def convert_with_server(md_path, output_path, to):
+    """
+    使用常驻pandoc server转换单个文件
+    :return: 是否完成转换；server不可用时返回False，由调用方退回到逐文件调用
+    """
+    with open(md_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    # pandoc server运行在沙箱中无法读取本地文件，引用图片的文档交给命令行pandoc处理
+    if '![' in text:
+        return False
+
+    server = get_pandoc_server()
+    if server is None:
+        return False
+    try:
+        data = server.convert_text(text, to)
+    except (OSError, RuntimeError) as e:
+        print(f"pandoc server转换失败，改用命令行pandoc: {str(e)}")
+        if isinstance(e, OSError):
+            # 连接层面的失败说明server本身不可用（例如pandoc未以多线程运行时构建，收到请求即崩溃），
+            # 关闭它并不再尝试，避免每个文件都重启一次
+            global _server_unavailable
+            _server_unavailable = True
+            server.stop()
+        return False
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return True
@@ -0,0 +1,198 @@
+"""
+分阶段计时与性能剖析
+
+转换函数中用 stage('名称') 包住各个阶段（加载文档、提取内容、写文件等）。只有在 profile_call
+激活记录时才计时，否则 stage 几乎没有开销。每个文件的记录随结果一起从工作进程返回，
+由父进程中的 BatchProfiler 汇总，批次结束后写出JSON/CSV报告，并可保留最慢N个文件的cProfile数据。
+"""
+import os
+import csv
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_MB = 1024 * 1024
+
+# 当前进程中正在记录的文件，None表示未启用
+_active = None
+
+
+class _Recorder:
+    """单个文件的阶段记录；同名阶段多次进入时累加耗时"""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = {}
+        # 内存统计的嵌套栈: [进入时的已分配内存, 子阶段中观察到的最高峰值]
+        self.frames = [[0, 0]]
+
+    def enter(self):
+        if not self.memory:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.frames[-1][1] = max(self.frames[-1][1], peak)
+        tracemalloc.reset_peak()
+        self.frames.append([current, 0])
+
+    def leave(self, name, seconds):
+        item = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        item['seconds'] += seconds
+        item['calls'] += 1
+        if not self.memory:
+            return
+        start, child_peak = self.frames.pop()
+        peak = max(child_peak, tracemalloc.get_traced_memory()[1])
+        self.frames[-1][1] = max(self.frames[-1][1], peak)
+        item['peak_mb'] = max(item.get('peak_mb', 0.0), (peak - start) / _MB)
+
+
+@contextmanager
+def stage(name):
+    """记录一个阶段的耗时（启用内存统计时还记录该阶段新增的峰值内存）"""
+    recorder = _active
+    if recorder is None:
+        yield
+        return
+    recorder.enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.leave(name, time.perf_counter() - start)
+
+
+def profile_call(func, memory, profile_path, *args, **kwargs):
+    """
+    在启用阶段记录的情况下调用 func（工作进程入口）
+    :param memory: 是否用tracemalloc统计内存（会明显拖慢转换）
+    :param profile_path: 不为None时用cProfile剖析并写到该文件
+    :return: (func的返回值, 文件记录)；出错时记录附在异常的 profile_record 属性上
+    """
+    global _active
+    recorder = _active = _Recorder(memory)
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if memory:
+        tracemalloc.start()
+
+    record = {'seconds': 0.0, 'stages': recorder.stages, 'profile': profile_path}
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+    except Exception as e:
+        record['error'] = str(e)
+        e.profile_record = record
+        raise
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        if memory:
+            record['peak_mb'] = tracemalloc.get_traced_memory()[1] / _MB
+            tracemalloc.stop()
+        if profiler:
+            profiler.dump_stats(profile_path)
+        _active = None
+    return result, record
+
+
+class BatchProfiler:
+    """
+    父进程中的批次性能记录
+
+    用法: DocumentConverter(..., profiler=BatchProfiler('report.json', top=5))
+    报告格式由扩展名决定（.csv 每行一个文件的一个阶段，其他为JSON）。
+    """
+
+    def __init__(self, report_path, memory=False, top=0, profile_dir=None):
+        self.report_path = report_path
+        self.memory = memory  # 是否统计内存
+        self.top = top  # 保留最慢的N个文件的cProfile数据，0表示不剖析
+        self.profile_dir = profile_dir or os.path.splitext(report_path)[0] + "_profiles"
+        self.records = []
+
+    def wrap(self, func, tasks, paths, kind):
+        """把任务改为经由 profile_call 执行，返回 (函数, 任务列表)"""
+        if self.top:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        wrapped = []
+        for idx, args in enumerate(tasks):
+            profile_path = None
+            if self.top:
+                name = os.path.splitext(os.path.basename(paths[idx]))[0]
+                profile_path = os.path.join(self.profile_dir, f"{kind}_{idx:04d}_{name}.prof")
+            wrapped.append((func, self.memory, profile_path) + tuple(args))
+        return profile_call, wrapped
+
+    def add(self, path, kind, record):
+        """登记一个文件的记录（record可为None，例如工作进程崩溃时）"""
+        record = dict(record or {'seconds': None, 'stages': {}, 'profile': None})
+        record.update(file=path, kind=kind)
+        self.records.append(record)
+
+    def unwrap(self, path, kind, result, error):
+        """拆开 profile_call 的返回值并登记记录，返回原函数的结果"""
+        if error is not None:
+            self.add(path, kind, getattr(error, 'profile_record', None))
+            return None
+        result, record = result
+        self.add(path, kind, record)
+        return result
+
+    def slowest(self, count=None):
+        timed = [record for record in self.records if record.get('seconds') is not None]
+        timed.sort(key=lambda record: record['seconds'], reverse=True)
+        return timed[:count] if count else timed
+
+    def finish(self):
+        """写出报告，只保留最慢N个文件的cProfile数据；返回报告路径"""
+        if self.top:
+            keep = {record['profile'] for record in self.slowest(self.top)}
+            for record in self.records:
+                if record.get('profile') and record['profile'] not in keep:
+                    if os.path.exists(record['profile']):
+                        os.remove(record['profile'])
+                    record['profile'] = None
+
+        report_dir = os.path.dirname(self.report_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+        if self.report_path.lower().endswith('.csv'):
+            self._write_csv()
+        else:
+            with open(self.report_path, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.records}, f, ensure_ascii=False, indent=2)
+        return self.report_path
+
+    def _write_csv(self):
+        fields = ['file', 'kind', 'stage', 'seconds', 'calls', 'peak_mb', 'error', 'profile']
+        with open(self.report_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for record in self.records:
+                base = {'file': record['file'], 'kind': record['kind'],
+                        'error': record.get('error', ''), 'profile': record.get('profile') or ''}
+                writer.writerow({**base, 'stage': 'total', 'seconds': record.get('seconds'),
+                                 'calls': 1, 'peak_mb': record.get('peak_mb', '')})
+                for name, item in record['stages'].items():
+                    writer.writerow({**base, 'stage': name, 'seconds': item['seconds'],
+                                     'calls': item['calls'], 'peak_mb': item.get('peak_mb', '')})
+
+    def summary(self, count=3):
+        """最慢几个文件的简短说明（用于进度消息）"""
+        parts = []
+        for record in self.slowest(count):
+            stages = record['stages']
+            top_stage = max(stages, key=lambda name: stages[name]['seconds']) if stages else None
+            text = f"{os.path.basename(record['file'])} {record['seconds']:.2f}秒"
+            if top_stage:
+                text += f"（{top_stage} {stages[top_stage]['seconds']:.2f}秒）"
+            parts.append(text)
+        return "，".join(parts)
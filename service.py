@@ -0,0 +1,391 @@
+"""
+基于asyncio的本地转换服务（HTTP接口，只监听本机地址）
+
+接口:
+    POST /to-md?name=合同.docx[&mode=sections]   请求体为Word/PDF文件内容，返回Markdown
+                                                  （sections模式返回包含各章节文件的zip）
+    POST /from-md?name=笔记.md[&format=pdf]       请求体为Markdown，返回Word/PDF文件
+    GET  /metrics                                 队列深度、处理中任务数和延迟统计（JSON）
+    GET  /health
+
+name 为必填的上传文件名（不含目录），扩展名须为该接口支持的类型（/to-md: .docx/.pdf，/from-md: .md）。
+
+转换在进程池中执行；等待队列有上限，满时立即返回 503 并带 Retry-After，由调用方稍后重试。
+工作进程异常退出（如内存不足被终止）时，当时正在转换的请求返回 500，进程池随即重建，后续请求不受影响。
+结果从临时文件分块流式返回（chunked编码），不在内存中拼接完整输出。
+
+示例:
+    curl --data-binary @合同.docx "http://127.0.0.1:8765/to-md?name=合同.docx" -o 合同.md
+"""
+import os
+import json
+import time
+import shutil
+import asyncio
+import zipfile
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs, quote
+
+from batch import convert_to_markdown, convert_from_markdown, default_workers
+from api import detect_file_type
+from jobs import WorkerPool
+from utils import PDF_CHUNK_SIZE
+
+DEFAULT_PORT = 8765
+MAX_UPLOAD = 200 * 1024 * 1024  # 单个上传文件的大小上限
+STREAM_CHUNK = 256 * 1024  # 返回结果时每次发送的字节数
+LATENCY_WINDOW = 1000  # 延迟统计保留的最近请求数
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# 各接口接受的上传文件扩展名
+_UPLOAD_EXTENSIONS = {
+    '/to-md': ('.docx', '.pdf'),
+    '/from-md': ('.md',),
+}
+
+_CONTENT_TYPES = {
+    '.md': 'text/markdown; charset=utf-8',
+    '.zip': 'application/zip',
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _zip_outputs(zip_path, md_paths, base_dir):
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for md_path in md_paths:
+            archive.write(md_path, os.path.relpath(md_path, base_dir))
+    return zip_path
+
+
+def _pool_context():
+    """
+    工作进程的启动方式：POSIX上用forkserver。
+    fork方式在处理请求时创建工作进程，子进程会继承已打开的客户端连接，
+    服务端关闭连接后客户端仍收不到EOF，直到工作进程退出
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return None
+
+
+def _upload_name(params, path):
+    """校验 name 参数：只取文件名部分（防止路径穿越），并要求是该接口支持的扩展名"""
+    name = os.path.basename(params.get('name', '').replace('\\', '/'))
+    if name in ('', '.', '..'):
+        raise HTTPError(400, "需要有效的 name 参数（上传文件名）")
+    if os.path.splitext(name)[1].lower() not in _UPLOAD_EXTENSIONS[path]:
+        raise HTTPError(400, f"name 的扩展名必须是 {'/'.join(_UPLOAD_EXTENSIONS[path])}")
+    return name
+
+
+def _latency_summary(values):
+    return {
+        'count': len(values),
+        'avg': sum(values) / len(values) if values else None,
+        'p50': _percentile(values, 0.5),
+        'p95': _percentile(values, 0.95),
+        'max': max(values) if values else None,
+    }
+
+
+class ConversionService:
+    """
+    本地转换服务
+
+    用法:
+        service = ConversionService(max_workers=4, queue_size=32)
+        asyncio.run(service.serve_forever())
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, max_workers=None, queue_size=32,
+                 cache_dir=None, max_upload=MAX_UPLOAD):
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers or default_workers()
+        self.queue_size = queue_size  # 等待转换的任务上限，超出时返回503
+        self.cache_dir = cache_dir
+        self.max_upload = max_upload
+
+        self.queue = None
+        self.workers = []
+        self.pool = None
+        self.server = None
+        self.active = 0  # 正在转换的任务数
+        self.counters = {'accepted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'pool_restarts': 0}
+        self.wait_times = deque(maxlen=LATENCY_WINDOW)  # 排队耗时
+        self.run_times = deque(maxlen=LATENCY_WINDOW)  # 转换耗时
+        self.total_times = deque(maxlen=LATENCY_WINDOW)  # 从接收到开始返回结果的总耗时
+
+    async def start(self):
+        """启动监听和转换工作协程，返回实际监听的端口"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.pool = WorkerPool(self.max_workers, mp_context=_pool_context())
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'queue_size': self.queue_size,
+            'active': self.active,
+            'workers': self.max_workers,
+            **self.counters,
+            'latency_seconds': {
+                'queue_wait': _latency_summary(self.wait_times),
+                'conversion': _latency_summary(self.run_times),
+                'total': _latency_summary(self.total_times),
+            },
+        }
+
+    async def _rebuild_pool(self, executor):
+        """换用新的进程池；同时发现进程池损坏的其他工作协程不再重复重建"""
+        # 终止旧进程池会等待工作进程退出，放到线程中执行
+        if await asyncio.get_running_loop().run_in_executor(None, self.pool.rebuild, executor):
+            self.counters['pool_restarts'] += 1
+
+    async def _submit(self, func, args):
+        """提交到进程池；进程池在空闲时已损坏（工作进程被终止）的，重建后重新提交"""
+        executor = self.pool.executor
+        try:
+            return executor, executor.submit(func, *args)
+        except BrokenProcessPool:
+            await self._rebuild_pool(executor)
+            executor = self.pool.executor
+            return executor, executor.submit(func, *args)
+
+    async def _worker(self):
+        """从队列取出任务并在进程池中执行"""
+        while True:
+            func, args, future, queued_at = await self.queue.get()
+            self.wait_times.append(time.monotonic() - queued_at)
+            self.active += 1
+            started = time.monotonic()
+            executor = None
+            try:
+                executor, task = await self._submit(func, args)
+                result = await asyncio.wrap_future(task)
+                if not future.done():
+                    future.set_result(result)
+            except BrokenProcessPool as e:
+                # 转换期间工作进程异常退出：本请求失败，换用新的进程池，后续请求不受影响
+                if executor is not None:
+                    await self._rebuild_pool(executor)
+                if not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.run_times.append(time.monotonic() - started)
+                self.active -= 1
+                self.queue.task_done()
+
+    async def _convert(self, func, *args):
+        """把转换任务放入有界队列并等待结果；队列已满时抛出503"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((func, args, future, time.monotonic()))
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            raise HTTPError(503, "转换队列已满，请稍后重试")
+        self.counters['accepted'] += 1
+        try:
+            result = await future
+        except Exception:
+            self.counters['failed'] += 1
+            raise
+        self.counters['completed'] += 1
+        return result
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "无效的请求行")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, headers
+
+    async def _save_body(self, reader, headers, path):
+        """把请求体分块写入临时文件"""
+        try:
+            length = int(headers.get('content-length', ''))
+        except ValueError:
+            raise HTTPError(400, "需要Content-Length请求头")
+        if length > self.max_upload:
+            raise HTTPError(413, f"上传文件超过 {self.max_upload // (1024 * 1024)} MB 上限")
+        # 文件读写在线程中进行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, path, 'wb')
+        try:
+            remaining = length
+            while remaining:
+                chunk = await reader.read(min(STREAM_CHUNK, remaining))
+                if not chunk:
+                    raise HTTPError(400, "请求体不完整")
+                await loop.run_in_executor(None, f.write, chunk)
+                remaining -= len(chunk)
+        finally:
+            await loop.run_in_executor(None, f.close)
+
+    async def _handle(self, reader, writer):
+        received = time.monotonic()
+        work_dir = None
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, target, headers = request
+            url = urlsplit(target)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+            if url.path == '/health':
+                await self._send_json(writer, 200, {'status': 'ok'})
+                return
+            if url.path == '/metrics':
+                await self._send_json(writer, 200, self.metrics())
+                return
+            if url.path not in ('/to-md', '/from-md'):
+                raise HTTPError(404, "未知的接口")
+            if method != 'POST':
+                raise HTTPError(405, "只支持POST")
+
+            # 队列已满时在接收上传内容之前就拒绝
+            if self.queue.full():
+                self.counters['rejected'] += 1
+                raise HTTPError(503, "转换队列已满，请稍后重试")
+
+            name = _upload_name(params, url.path)
+            work_dir = tempfile.mkdtemp(prefix='md_converter_service_')
+            input_dir = os.path.join(work_dir, 'in')
+            output_dir = os.path.join(work_dir, 'out')
+            os.makedirs(input_dir)
+            os.makedirs(output_dir)
+
+            if url.path == '/to-md':
+                file_type = detect_file_type(name)
+                mode = params.get('mode', 'simple')
+                if mode not in ('simple', 'sections'):
+                    raise HTTPError(400, "mode 只能是 simple 或 sections")
+                input_path = os.path.join(input_dir, name)
+                await self._save_body(reader, headers, input_path)
+                result = await self._convert(convert_to_markdown, input_path, output_dir, mode, file_type,
+                                             1, PDF_CHUNK_SIZE, self.cache_dir)
+                if mode == 'simple' or file_type == 'pdf':
+                    output_path = result.md_paths[0]
+                else:
+                    # 分割模式的多个章节打包返回，压缩在线程中进行，不阻塞事件循环
+                    zip_path = os.path.join(work_dir, os.path.splitext(name)[0] + '.zip')
+                    output_path = await asyncio.get_running_loop().run_in_executor(
+                        None, _zip_outputs, zip_path, result.md_paths, output_dir)
+            else:
+                fmt = params.get('format', 'word')
+                if fmt not in ('word', 'pdf'):
+                    raise HTTPError(400, "format 只能是 word 或 pdf")
+                input_path = os.path.join(input_dir, name)
+                await self._save_body(reader, headers, input_path)
+                success, output_path, _ = await self._convert(convert_from_markdown, input_path, output_dir,
+                                                              fmt, self.cache_dir)
+                if not success:
+                    raise HTTPError(500, "转换失败")
+
+            self.total_times.append(time.monotonic() - received)
+            await self._send_file(writer, output_path)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {'error': str(e)}, retry_after=e.status == 503)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # 客户端已断开
+        except Exception as e:
+            await self._send_json(writer, 500, {'error': str(e)})
+        finally:
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append("Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    async def _send_json(self, writer, status, payload, retry_after=False):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': len(body)}
+        if retry_after:
+            headers['Retry-After'] = 1
+        try:
+            writer.write(self._head(status, headers) + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _send_file(self, writer, path):
+        """以chunked编码分块返回文件，drain() 让慢速客户端对服务端形成背压"""
+        name = os.path.basename(path)
+        headers = {
+            'Content-Type': _CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream'),
+            'Content-Disposition': f"attachment; filename*=UTF-8''{quote(name)}",
+            'Transfer-Encoding': 'chunked',
+        }
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, path, 'rb')
+        try:
+            writer.write(self._head(200, headers))
+            while chunk := await loop.run_in_executor(None, f.read, STREAM_CHUNK):
+                writer.write(f"{len(chunk):x}\r\n".encode('latin-1') + chunk + b"\r\n")
+                await writer.drain()
+        finally:
+            await loop.run_in_executor(None, f.close)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
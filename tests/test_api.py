@@ -0,0 +1,38 @@
+import re
+
+import pytest
+
+from api import DocumentConverter
+from jobs import CancellationToken
+
+
+def _notes(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'note{i}.md'
+        path.write_text(f'# 笔记 {i}\n\n正文 {i}\n', encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cancelled_merge_reports_progress(tmp_path, workers):
+    paths = _notes(tmp_path, 4)
+    token = CancellationToken()
+
+    def cancel(*args):
+        token.cancel()
+
+    # 单进程时先合并Markdown再整体转换，在开始转换前取消；多进程时在第一个文件完成后取消
+    if workers == 1:
+        callbacks = {'on_progress': lambda value, message: message.startswith('正在转换') and cancel()}
+    else:
+        callbacks = {'on_file_progress': cancel}
+    converter = DocumentConverter(str(tmp_path / 'out'), max_workers=workers, token=token, **callbacks)
+    result = converter.from_markdown(paths, 'word', merge=True)
+
+    assert result.cancelled and not result.success
+    completed, total = map(int, re.search(r'(\d+)/(\d+)', result.message).groups())
+    assert total == len(paths)
+    if workers > 1:
+        assert completed >= 1  # 并行转换各文件后才拼接，取消前已有文件完成
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from cache import ConversionCache, PageCache
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_hit_miss_and_restore(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    source = _write(str(tmp_path / 'in.docx'), 'source')
+    key = cache.make_key(source, mode='sections')
+    assert cache.lookup(key) is None
+
+    out = str(tmp_path / 'out')
+    paths = [_write(os.path.join(out, 'in', '01.md'), '章节一'), _write(os.path.join(out, 'in', '02.md'), '章节二')]
+    cache.store(key, out, paths, sections=2)
+
+    manifest = cache.lookup(key)
+    assert manifest['meta'] == {'sections': 2}
+    restored = cache.restore(key, manifest, str(tmp_path / 'other'))
+    assert [os.path.relpath(path, str(tmp_path / 'other')) for path in restored] == \
+        [os.path.join('in', '01.md'), os.path.join('in', '02.md')]
+    assert [_read(path) for path in restored] == ['章节一', '章节二']
+
+
+def test_key_depends_on_content_and_options(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    source = _write(str(tmp_path / 'in.md'), 'a')
+    key = cache.make_key(source, target_format='word')
+    assert key == cache.make_key(source, target_format='word')
+    assert key != cache.make_key(source, target_format='pdf')
+    _write(source, 'b')
+    assert key != cache.make_key(source, target_format='word')
+
+
+def test_store_replaces_existing_entry(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cache = ConversionCache(cache_dir)
+    source = _write(str(tmp_path / 'in.md'), 'source')
+    key = cache.make_key(source)
+    out = str(tmp_path / 'out')
+
+    cache.store(key, out, [_write(os.path.join(out, 'in.docx'), 'old')], version=1)
+    # 强制重新转换后再次写入同一条目：以新结果为准
+    cache.store(key, out, [_write(os.path.join(out, 'in.docx'), 'new')], version=2)
+
+    manifest = cache.lookup(key)
+    assert manifest['meta'] == {'version': 2}
+    assert _read(cache.restore(key, manifest, str(tmp_path / 'restored'))[0]) == 'new'
+    leftovers = [name for _, dirs, _ in os.walk(cache_dir) for name in dirs if '.tmp-' in name or '.old-' in name]
+    assert leftovers == []
+
+
+def test_convert_uses_cache(tmp_path):
+    docx = pytest.importorskip('docx')
+    from batch import convert_to_markdown
+
+    source = str(tmp_path / '报告.docx')
+    document = docx.Document()
+    document.add_paragraph('正文')
+    document.save(source)
+    out = tmp_path / 'out'
+    out.mkdir()
+    cache_dir = str(tmp_path / 'cache')
+
+    first = convert_to_markdown(source, str(out), 'simple', 'word', 1, 20, cache_dir)
+    os.remove(first.md_paths[0])
+    second = convert_to_markdown(source, str(out), 'simple', 'word', 1, 20, cache_dir)
+    forced = convert_to_markdown(source, str(out), 'simple', 'word', 1, 20, cache_dir, True)
+
+    assert (first.cached, second.cached, forced.cached) == (False, True, False)
+    assert _read(second.md_paths[0]) == _read(forced.md_paths[0])
+
+
+def test_page_cache_round_trip(tmp_path):
+    pytest.importorskip('reportlab')
+    pdfplumber = pytest.importorskip('pdfplumber')
+    from reportlab.pdfgen import canvas
+
+    pdf_path = str(tmp_path / 'a.pdf')
+    c = canvas.Canvas(pdf_path)
+    for text in ('page one', 'page two'):
+        c.drawString(72, 720, text)
+        c.showPage()
+    c.save()
+
+    cache_dir = str(tmp_path / 'cache')
+    with pdfplumber.open(pdf_path) as pdf:
+        with PageCache(cache_dir) as cache:
+            keys = [cache.make_key(page, 'inline') for page in pdf.pages]
+            assert keys[0] != keys[1]
+            assert cache.get(keys[0]) is None
+            cache.put(keys[0], 'page one\n')
+        with PageCache(cache_dir) as cache:
+            assert [cache.get(key) for key in keys] == ['page one\n', None]
+            assert (cache.hits, cache.misses) == (1, 1)
+            assert cache.make_key(pdf.pages[0], 'append') != keys[0]
+        with PageCache(cache_dir, lookup=False) as cache:
+            assert cache.get(keys[0]) is None
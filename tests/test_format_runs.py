@@ -0,0 +1,45 @@
+import pytest
+
+docx = pytest.importorskip('docx')
+
+from utils import format_runs, iter_paragraph_runs
+
+
+def _paragraph(*runs):
+    paragraph = docx.Document().add_paragraph()
+    for text, bold, italic in runs:
+        run = paragraph.add_run(text)
+        run.bold = bold
+        run.italic = italic
+    return paragraph
+
+
+def _baseline(paragraph):
+    """基线版本逐个运行格式化的结果"""
+    parts = []
+    for run in paragraph.runs:
+        content = run.text
+        if not content.strip():
+            continue
+        if run.bold:
+            content = f"**{content}**"
+        if run.italic:
+            content = f"*{content}*"
+        parts.append(content)
+    return "".join(parts)
+
+
+@pytest.mark.parametrize('runs', [
+    [('前言', False, False), ('   ', False, False), ('正文', True, False)],
+    [(' ', True, False), ('粗体', True, False), ('\t', False, False), ('斜体', False, True)],
+    [('a', False, False), ('  ', True, False), ('b', False, True), (' ', False, False)],
+])
+def test_matches_baseline_when_formats_differ(runs):
+    paragraph = _paragraph(*runs)
+    assert format_runs(list(iter_paragraph_runs(paragraph._p))) == _baseline(paragraph)
+
+
+def test_coalesces_runs_with_same_format():
+    paragraph = _paragraph(('一', True, False), ('二', True, False), (' ', True, False), ('三', True, False),
+                           ('四', False, False))
+    assert format_runs(list(iter_paragraph_runs(paragraph._p))) == "**一二三**四"
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from jobs import JobScheduler, CancellationToken, FileTimeoutError
+
+
+def work(tag, delay=0.0):
+    time.sleep(delay)
+    if tag == 'crash':
+        os._exit(1)  # 模拟工作进程被终止（如内存不足）
+    if tag == 'error':
+        raise ValueError(tag)
+    return tag
+
+
+def _run(tasks, **kwargs):
+    results = {}
+    for idx, result, error in JobScheduler(**kwargs).run(work, tasks):
+        assert idx not in results
+        results[idx] = (result, error)
+    return results
+
+
+def test_results_and_errors():
+    results = _run([('a',), ('error',), ('b',)], max_workers=2)
+    assert results[0] == ('a', None)
+    assert isinstance(results[1][1], ValueError)
+    assert results[2] == ('b', None)
+
+
+def test_crash_fails_only_the_crashing_task():
+    results = _run([('a', 0.5), ('crash', 0.2), ('b', 0.5), ('c',)], max_workers=2)
+    assert isinstance(results[1][1], BrokenProcessPool)
+    assert {idx: result for idx, (result, error) in results.items() if error is None} == {0: 'a', 2: 'b', 3: 'c'}
+
+
+def test_crash_with_single_worker():
+    results = _run([('crash',), ('a',)], max_workers=1)
+    assert isinstance(results[0][1], BrokenProcessPool)
+    assert results[1] == ('a', None)
+
+
+def test_timeout_terminates_only_the_slow_task():
+    start = time.monotonic()
+    results = _run([('slow', 60), ('fast',)], max_workers=1, timeout=1)
+    assert time.monotonic() - start < 20
+    assert isinstance(results[0][1], FileTimeoutError)
+    assert results[1] == ('fast', None)
+
+
+def test_cancel_stops_running_tasks():
+    token = CancellationToken()
+    scheduler = JobScheduler(max_workers=1, token=token)
+    start = time.monotonic()
+    results = []
+    for item in scheduler.run(work, [('a',), ('slow', 60), ('b',)]):
+        results.append(item)
+        token.cancel()
+    assert time.monotonic() - start < 20
+    assert [(idx, result) for idx, result, _ in results] == [(0, 'a')]
+
+
+def test_priorities():
+    order = [idx for idx, _, _ in JobScheduler(max_workers=1).run(work, [('a',), ('b',), ('c',)],
+                                                                  priorities=[2, 0, 1])]
+    assert order == [1, 2, 0]
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+from md_docx import (parse_markdown, iter_markdown_blocks, Heading, Paragraph, CodeBlock, Quote, ListBlock,
+                     Table, Rule)
+
+SAMPLE = """\
+标题
+===
+
+段落第一行
+第二行  
+第三行
+
+- 列表项
+
+  同一项的第二段
+
+- 第二项
+  1. 子项
+  2. 子项
+
+```python
+def f():
+
+    return 1
+顶格行
+```
+
+    缩进代码
+
+    仍是代码
+> 引用
+延续行
+
+| a | b |
+|:--|--:|
+| 1 | 2 |
+
+***
+## 结尾 ##
+"""
+
+
+def test_parse_blocks():
+    blocks = parse_markdown(SAMPLE)
+    assert [type(block) for block in blocks] == [Heading, Paragraph, ListBlock, CodeBlock, CodeBlock, Quote,
+                                                 Table, Rule, Heading]
+    assert blocks[0] == Heading(1, '标题')
+    assert blocks[1].text == '段落第一行\n第二行  \n第三行'
+    assert len(blocks[2].items) == 2 and isinstance(blocks[2].items[1][-1], ListBlock)
+    assert blocks[3].text == 'def f():\n\n    return 1\n顶格行'
+    assert blocks[4].text == '缩进代码\n\n仍是代码'
+    assert blocks[6].rows == [['1', '2']]
+    assert blocks[-1] == Heading(2, '结尾')
+
+
+@pytest.mark.parametrize('text', [SAMPLE, SAMPLE.replace('\n', '\r\n'), '', '\n\n', 'a\n\nb', '```\n\nx'])
+def test_iter_markdown_blocks_matches_parse_markdown(text):
+    stream = io.StringIO(text, newline=None)
+    assert list(iter_markdown_blocks(stream)) == parse_markdown(text)
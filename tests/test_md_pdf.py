@@ -0,0 +1,83 @@
+import pytest
+
+reportlab = pytest.importorskip('reportlab')
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+
+from md_pdf import LazyFlowables, convert_markdown_file
+
+# DocTemplate.build 对 story 列表的操作：只在头部读取、删除、放回（reportlab 5.0.1）。
+# 升级reportlab后这里失败时，需要检查 LazyFlowables 是否仍支持新版本的用法
+HEAD_OPERATIONS = {
+    ('len', None), ('get', 'index'), ('get', 'slice'), ('del', 'head'), ('del', 'head_slice'),
+    ('insert', 'head'), ('set', 'head_slice'),
+}
+
+
+class RecordingFlowables(LazyFlowables):
+    def __init__(self, iterable):
+        super().__init__(iterable)
+        self.operations = set()
+
+    def __len__(self):
+        self.operations.add(('len', None))
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self.operations.add(('get', 'slice' if isinstance(index, slice) else 'index'))
+        return super().__getitem__(index)
+
+    def __setitem__(self, index, value):
+        head = isinstance(index, slice) and index.start in (0, None) and index.stop == 0
+        self.operations.add(('set', 'head_slice' if head else repr(index)))
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            kind = 'head_slice' if index.start in (0, None) and index.step is None else repr(index)
+        else:
+            kind = 'head' if index == 0 else repr(index)
+        self.operations.add(('del', kind))
+        super().__delitem__(index)
+
+    def insert(self, index, value):
+        self.operations.add(('insert', 'head' if index == 0 else repr(index)))
+        super().insert(index, value)
+
+
+def test_build_uses_only_head_operations_and_stays_lazy(tmp_path):
+    styles = getSampleStyleSheet()
+    total = 400
+    produced = []
+    pending_at_first_page = []
+
+    def generate():
+        for i in range(total):
+            produced.append(i)
+            style = styles['Heading2'] if i % 10 == 0 else styles['Normal']  # 标题带 keepWithNext
+            yield Paragraph(f"段落 {i} " * 20 if i % 10 else f"Heading {i}", style)
+
+    class Template(SimpleDocTemplate):
+        def afterPage(self):
+            if not pending_at_first_page:
+                pending_at_first_page.append(len(produced))
+
+    story = RecordingFlowables(generate())
+    Template(str(tmp_path / 'out.pdf')).build(story)
+
+    assert story.operations <= HEAD_OPERATIONS, (reportlab.Version, story.operations - HEAD_OPERATIONS)
+    assert len(produced) == total
+    # 第一页排完时只生成了该页内容和预读的部分
+    assert pending_at_first_page[0] < total // 4
+
+
+def test_convert_markdown_file(tmp_path):
+    pypdf = pytest.importorskip('pypdf')
+    source = tmp_path / 'doc.md'
+    source.write_text("# 标题\n\n" + "\n\n".join(f"第 {i} 段 text" for i in range(300)), encoding='utf-8')
+    output = tmp_path / 'doc.pdf'
+    convert_markdown_file(str(source), str(output))
+    reader = pypdf.PdfReader(str(output))
+    assert len(reader.pages) > 1
+    assert 'text' in reader.pages[-1].extract_text()
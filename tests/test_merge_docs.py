@@ -0,0 +1,62 @@
+import zipfile
+import posixpath
+
+import pytest
+
+etree = pytest.importorskip('lxml.etree')
+Image = pytest.importorskip('PIL.Image')
+
+from md_docx import convert_markdown_file
+from merge_docs import concat_docx
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+RT_IMAGE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+
+def _part(tmp_path, name, color, shared):
+    """生成一个带有序列表、独有图片和共用图片的docx"""
+    Image.new('RGB', (4, 4), color).save(tmp_path / f'{name}.png')
+    md = tmp_path / f'{name}.md'
+    md.write_text(f"# {name}\n\n1. 第一项\n2. 第二项\n\n![]({name}.png)\n\n![]({shared})\n", encoding='utf-8')
+    output = tmp_path / f'{name}.docx'
+    convert_markdown_file(str(md), str(output))
+    return str(output)
+
+
+def test_concat_renumbers_lists_and_images(tmp_path):
+    Image.new('RGB', (4, 4), (0, 0, 255)).save(tmp_path / 'logo.png')
+    parts = [_part(tmp_path, name, color, 'logo.png')
+             for name, color in (('a', (255, 0, 0)), ('b', (0, 255, 0)), ('c', (255, 255, 0)))]
+    output = tmp_path / 'merged.docx'
+    assert concat_docx(parts, str(output), separator=True) == 3
+
+    with zipfile.ZipFile(output) as zf:
+        document = etree.fromstring(zf.read('word/document.xml'))
+        numbering = etree.fromstring(zf.read('word/numbering.xml'))
+        rels = etree.fromstring(zf.read('word/_rels/document.xml.rels'))
+        names = set(zf.namelist())
+
+    # 每个列表使用各自的编号实例（各自从1开始），引用的编号都有定义
+    num_ids = [num.get(f'{W}numId') for num in numbering.iter(f'{W}num')]
+    assert len(num_ids) == len(set(num_ids))
+    abstract_ids = [a.get(f'{W}abstractNumId') for a in numbering.iter(f'{W}abstractNum')]
+    assert len(abstract_ids) == len(set(abstract_ids))
+    assert all(num.find(f'{W}abstractNumId').get(f'{W}val') in abstract_ids for num in numbering.iter(f'{W}num'))
+    lists = []
+    for p in document.iter(f'{W}p'):
+        num_id = p.find(f'{W}pPr/{W}numPr/{W}numId')
+        if num_id is not None and num_id.get(f'{W}val') not in lists:
+            lists.append(num_id.get(f'{W}val'))
+    assert len(lists) == 3 and set(lists) <= set(num_ids)
+
+    # 关系ID唯一，图片引用都能解析；内容相同的图片只保存一份
+    rel_ids = [rel.get('Id') for rel in rels.iter(f'{REL}Relationship')]
+    assert len(rel_ids) == len(set(rel_ids))
+    images = {rel.get('Id'): posixpath.normpath(posixpath.join('word', rel.get('Target')))
+              for rel in rels.iter(f'{REL}Relationship') if rel.get('Type') == RT_IMAGE}
+    embeds = [blip.get(f'{R}embed') for blip in document.iter('{*}blip')]
+    assert len(embeds) == 6
+    assert all(embed in images and images[embed] in names for embed in embeds)
+    assert len({images[embed] for embed in embeds}) == 4
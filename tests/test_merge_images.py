@@ -0,0 +1,52 @@
+import io
+import os
+import re
+
+import pytest
+
+docx = pytest.importorskip('docx')
+Image = pytest.importorskip('PIL.Image')
+
+from api import DocumentConverter
+from utils import rebase_image_links
+
+
+def _make_docx(path):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (200, 30, 30)).save(buffer, 'PNG')
+    buffer.seek(0)
+    document = docx.Document()
+    document.add_heading('第一章', level=1)
+    document.add_paragraph('正文')
+    document.add_picture(buffer)
+    document.add_heading('第二章', level=1)
+    document.add_paragraph('结尾')
+    document.save(path)
+
+
+def test_rebase_image_links():
+    src = os.path.join('out', '手册')
+    assert rebase_image_links('![](../assets/a.png)', src, 'out') == '![](assets/a.png)'
+    assert rebase_image_links('![图](http://x/a.png)', src, 'out') == '![图](http://x/a.png)'
+    assert rebase_image_links('[链接](../a.md)', src, 'out') == '[链接](../a.md)'
+
+
+def test_sections_merge_image_links_resolve(tmp_path):
+    source = tmp_path / '手册.docx'
+    _make_docx(str(source))
+    output_dir = tmp_path / 'out'
+
+    result = DocumentConverter(str(output_dir), max_workers=1, extract_images=True).to_markdown(
+        [str(source)], mode='sections', merge=True)
+    assert result.success, result.message
+
+    merged = output_dir / '合并文档.md'
+    refs = re.findall(r'!\[[^\]]*\]\(([^)]+)\)', merged.read_text(encoding='utf-8'))
+    assert refs
+    for ref in refs:
+        assert (output_dir / ref).is_file(), ref
+
+    # 章节文件中的引用仍相对于章节所在目录
+    chapter_refs = [ref for md in (output_dir / '手册').glob('*.md')
+                    for ref in re.findall(r'!\[[^\]]*\]\(([^)]+)\)', md.read_text(encoding='utf-8'))]
+    assert chapter_refs and all(ref.startswith('../assets/') for ref in chapter_refs)
@@ -0,0 +1,51 @@
+import os
+
+from utils import merge_markdown_files
+
+
+def test_merge_normalizes_and_skips_unreadable(tmp_path):
+    a = tmp_path / 'a.md'
+    a.write_bytes(b'\xef\xbb\xbf' + 'first\r\nline\r\n'.encode('utf-8'))
+    bad = tmp_path / 'bad.md'
+    bad.write_bytes(b'ok\n' * 10 + b'\xff\xfe broken\n')
+    missing = tmp_path / 'missing.md'
+    sub = tmp_path / 'sub'
+    sub.mkdir()
+    b = sub / 'b.md'
+    b.write_bytes('![图](img/x.png)\nend\n'.encode('utf-8'))
+    output = tmp_path / 'out' / 'merged.md'
+    output.parent.mkdir()
+
+    stats = merge_markdown_files([str(a), str(bad), str(missing), str(b)], str(output))
+
+    assert stats['files'] == 2
+    data = output.read_bytes()
+    assert stats['bytes'] == len(data)
+    assert b'\xef\xbb\xbf' not in data
+    assert b'ok' not in data  # 出错文件已写出的部分被丢弃
+    text = data.decode('utf-8')
+    assert text.replace(os.linesep, '\n') == ("# a\n\nfirst\nline\n\n\n---\n\n"
+                                              "# b\n\n![图](../sub/img/x.png)\nend\n")
+    assert os.listdir(output.parent) == ['merged.md']
+
+
+def test_ordered_merger_writes_in_input_order(tmp_path):
+    from utils import OrderedMarkdownMerger
+
+    parts = []
+    for i in range(4):
+        path = tmp_path / f'{i}.md'
+        path.write_text(f'内容{i}\n', encoding='utf-8')
+        parts.append(str(path))
+    output = tmp_path / '合并文档.md'
+    merger = OrderedMarkdownMerger(str(output), 4)
+
+    merger.add(2, '二', [parts[2]])
+    merger.add(3, '三', [parts[3]])
+    assert not output.exists()  # 第0个文档完成前不写出
+    merger.add(0, '零', [parts[0]])
+    merger.skip(1)
+    assert merger.close()
+
+    assert output.read_text(encoding='utf-8') == ("# 零\n\n内容0\n\n\n---\n\n# 二\n\n内容2\n\n\n---\n\n"
+                                                  "# 三\n\n内容3\n")
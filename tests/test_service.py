@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+from service import ConversionService
+
+
+async def _request(port, target, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"POST {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), payload
+
+
+def _run(coro_factory):
+    async def main():
+        service = ConversionService(port=0, max_workers=1, queue_size=2)
+        port = await service.start()
+        try:
+            return await coro_factory(port), service
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('target', [
+    '/to-md',
+    '/to-md?name=',
+    '/to-md?name=..',
+    '/to-md?name=.',
+    '/to-md?name=a/..',
+    '/to-md?name=report.txt',
+    '/from-md?name=notes.docx',
+])
+def test_invalid_name_rejected(target):
+    (status, payload), service = _run(lambda port: _request(port, target, b'data'))
+    assert status == 400
+    assert json.loads(payload)['error']
+    assert service.counters['accepted'] == 0
+
+
+def test_from_md_converts(tmp_path):
+    (status, payload), service = _run(lambda port: _request(port, '/from-md?name=..%2Fnotes.md',
+                                                            '# 标题\n\n正文\n'.encode('utf-8')))
+    assert status == 200
+    assert service.counters['completed'] == 1
+    # chunked编码返回的docx以zip文件头开始
+    assert b'PK' in payload[:16]
@@ -0,0 +1,55 @@
+import os
+import threading
+
+import pytest
+
+from watch import FolderWatcher
+
+
+def test_output_mirrors_source_directory(tmp_path):
+    inbox = tmp_path / 'inbox'
+    watcher = FolderWatcher([str(inbox)], str(tmp_path / 'out'), recursive=True)
+    assert watcher.output_dir_for(str(inbox / 'report.docx')) == str(tmp_path / 'out')
+    assert watcher.output_dir_for(str(inbox / 'a' / 'b' / 'report.docx')) == str(tmp_path / 'out' / 'a' / 'b')
+
+
+def test_multiple_roots_are_prefixed(tmp_path):
+    watcher = FolderWatcher([str(tmp_path / 'x'), str(tmp_path / 'y')], str(tmp_path / 'out'))
+    assert watcher.output_dir_for(str(tmp_path / 'x' / 'r.md')) == str(tmp_path / 'out' / 'x')
+    assert watcher.output_dir_for(str(tmp_path / 'y' / 'r.md')) == str(tmp_path / 'out' / 'y')
+
+
+def test_duplicate_root_names_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        FolderWatcher([str(tmp_path / 'a' / 'inbox'), str(tmp_path / 'b' / 'inbox')], str(tmp_path / 'out'))
+
+
+def test_same_name_in_subdirectories_does_not_collide(tmp_path):
+    inbox = tmp_path / 'inbox'
+    for sub in ('a', 'b'):
+        (inbox / sub).mkdir(parents=True)
+        (inbox / sub / 'report.md').write_text(f'# {sub}\n', encoding='utf-8')
+    output_dir = tmp_path / 'out'
+
+    converted = []
+    done = threading.Event()
+
+    def on_event(event, path, detail):
+        if event in ('converted', 'failed'):
+            converted.append((event, detail))
+            if len(converted) == 2:
+                done.set()
+
+    watcher = FolderWatcher([str(inbox)], str(output_dir), max_workers=1, debounce=0, poll=True,
+                            poll_interval=0.1, recursive=True, initial=True, on_event=on_event)
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        assert done.wait(60)
+    finally:
+        watcher.stop()
+        thread.join()
+
+    assert sorted(converted) == [('converted', str(output_dir / 'a' / 'report.docx')),
+                                 ('converted', str(output_dir / 'b' / 'report.docx'))]
+    assert all(os.path.isfile(detail) for _, detail in converted)
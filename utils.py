@@ -1,38 +1,189 @@
-import re
+# 注意：python-docx、pdfplumber、reportlab、pypandoc 等较重的后端
+# 均在对应函数首次使用时才导入，以缩短程序启动时间
 import os
-import docx
-import pdfplumber
-import markdown
-from docx.shared import Pt
-import pypandoc
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-
-# 文本格式化函数
-def format_text_run(run):
-    """格式化单个文本段落，处理粗体、斜体和下划线"""
-    content = run.text
-    if not content.strip():
-        return ""
-        
-    if run.bold:
-        content = f"**{content}**"
-    if run.italic:
-        content = f"*{content}*"
-    if run.underline:
-        content = f"<u>{content}</u>"
-    return content
+import re
+import time
+import shutil
+import zipfile
+import posixpath
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from profiling import stage
+
+# 转换器版本，输出格式发生变化时需递增（用于使转换缓存失效）
+CONVERTER_VERSION = "6"
+
+# PDF页面分片并行时每个分片的默认页数
+PDF_CHUNK_SIZE = 20
+
+# PDF表格的处理方式：'inline' 只在表格区域以外提取正文，表格按位置插入；
+# 'append' 提取整页文字后在页末追加表格（表格中的文字会出现两次）
+PDF_TABLE_MODES = ('inline', 'append')
+PDF_TABLES = 'inline'
+
+# 超过此大小（字节）的.docx改为流式读取，不构建完整的python-docx文档对象
+DOCX_STREAM_THRESHOLD = 50 * 1024 * 1024
+
+# Word文档XML标签（WordprocessingML命名空间）
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_BODY = f'{{{W_NS}}}body'
+W_P = f'{{{W_NS}}}p'
+W_TBL = f'{{{W_NS}}}tbl'
+W_R = f'{{{W_NS}}}r'
+W_T = f'{{{W_NS}}}t'
+W_TAB = f'{{{W_NS}}}tab'
+W_BR = f'{{{W_NS}}}br'
+W_CR = f'{{{W_NS}}}cr'
+W_PPR = f'{{{W_NS}}}pPr'
+W_PSTYLE = f'{{{W_NS}}}pStyle'
+W_VAL = f'{{{W_NS}}}val'
+W_SDT = f'{{{W_NS}}}sdt'
+W_SDT_CONTENT = f'{{{W_NS}}}sdtContent'
+W_TR = f'{{{W_NS}}}tr'
+W_TC = f'{{{W_NS}}}tc'
+W_TRPR = f'{{{W_NS}}}trPr'
+W_TCPR = f'{{{W_NS}}}tcPr'
+W_GRID_BEFORE = f'{{{W_NS}}}gridBefore'
+W_GRID_AFTER = f'{{{W_NS}}}gridAfter'
+W_GRID_SPAN = f'{{{W_NS}}}gridSpan'
+W_VMERGE = f'{{{W_NS}}}vMerge'
+W_RPR = f'{{{W_NS}}}rPr'
+W_B = f'{{{W_NS}}}b'
+W_I = f'{{{W_NS}}}i'
+W_U = f'{{{W_NS}}}u'
+W_STYLE = f'{{{W_NS}}}style'
+W_STYLE_ID = f'{{{W_NS}}}styleId'
+W_NAME = f'{{{W_NS}}}name'
+
+# 包关系（.rels）中的标签和关系类型
+REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+REL_RELATIONSHIP = f'{{{REL_NS}}}Relationship'
+RT_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RT_STYLES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+RT_IMAGE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+# 图片引用：DrawingML的 a:blip（r:embed）和旧版VML的 v:imagedata（r:id）
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+R_EMBED = f'{{{R_NS}}}embed'
+R_ID = f'{{{R_NS}}}id'
+A_BLIP = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+V_IMAGEDATA = '{urn:schemas-microsoft-com:vml}imagedata'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+# 段落中可能包裹文本运行的容器（超链接、修订插入、内容控件等）
+_RUN_CONTAINERS = {f'{{{W_NS}}}{tag}' for tag in ('hyperlink', 'ins', 'smartTag', 'fldSimple', 'sdt', 'sdtContent')}
+
+# 文本运行的格式属性
+_OFF_VALUES = {'0', 'false', 'off'}
+
+def run_format(r):
+    """
+    一次读取文本运行（w:r）的格式，返回 (粗体, 斜体, 下划线)，与python-docx的判断一致：
+    <w:b/> 为真、<w:b w:val="0"/> 为假；下划线类型为 none 或缺省时为假
+    """
+    rpr = r.find(W_RPR)
+    if rpr is None:
+        return False, False, False
+    bold = italic = underline = False
+    for child in rpr:
+        tag = child.tag
+        if tag == W_B:
+            bold = child.get(W_VAL) not in _OFF_VALUES
+        elif tag == W_I:
+            italic = child.get(W_VAL) not in _OFF_VALUES
+        elif tag == W_U:
+            underline = child.get(W_VAL) not in (None, 'none')
+    return bold, italic, underline
+
+def _wrap_formatted(text, fmt):
+    """按格式包裹文本，首尾空白放在标记外，避免生成 `**a **` 这类无效的Markdown"""
+    bold, italic, underline = fmt
+    if not (bold or italic or underline):
+        return text
+    core = text.strip()
+    lead = text[:len(text) - len(text.lstrip())]
+    trail = text[len(lead) + len(core):]
+    if bold:
+        core = f"**{core}**"
+    if italic:
+        core = f"*{core}*"
+    if underline:
+        core = f"<u>{core}</u>"
+    return lead + core + trail
+
+def format_runs(runs, texts=None):
+    """
+    合并格式相同的相邻文本运行后再生成Markdown，
+    避免一段被拆成多个运行时输出 `**a****b**` 这样的碎片
+    :param runs: 段落中的 w:r 元素列表
+    :param texts: 可选，各运行已读取的文本（与runs一一对应），避免重复读取
+    """
+    if texts is None:
+        texts = [run_text(r) for r in runs]
+    
+    parts = []
+    group = []  # 当前合并组的文本片段
+    group_fmt = None
+    for r, text in zip(runs, texts):
+        # 纯空白的运行不输出（与逐个运行格式化时一致）
+        if not text.strip():
+            continue
+        fmt = run_format(r)
+        if fmt != group_fmt and group:
+            parts.append(_wrap_formatted("".join(group), group_fmt))
+            group = []
+        group_fmt = fmt
+        group.append(text)
+    if group:
+        parts.append(_wrap_formatted("".join(group), group_fmt))
+    return "".join(parts)
+
+def run_image_ids(r):
+    """
+    文本运行中引用的图片关系ID，按出现顺序返回；
+    兼容内容（mc:AlternateContent）的后备部分与首选部分是同一张图片，跳过以免重复
+    """
+    ids = []
+    for element in r.iter(A_BLIP, V_IMAGEDATA):
+        parent = element.getparent()
+        while parent is not r and parent.tag != MC_FALLBACK:
+            parent = parent.getparent()
+        if parent is r:
+            rel_id = element.get(R_EMBED if element.tag == A_BLIP else R_ID)
+            if rel_id:
+                ids.append(rel_id)
+    return ids
+
+def format_runs_with_images(runs, texts, refs):
+    """
+    同 format_runs，并在图片所在的运行之后插入图片引用
+    :param refs: 与runs一一对应，每个运行中图片的引用路径列表
+    """
+    parts = []
+    start = 0
+    for i, run_refs in enumerate(refs):
+        if run_refs:
+            parts.append(format_runs(runs[start:i + 1], texts[start:i + 1]))
+            parts.extend(f"![]({ref})" for ref in run_refs)
+            start = i + 1
+    parts.append(format_runs(runs[start:], texts[start:]))
+    return "".join(parts)
 
 # 表格处理函数
 def convert_table_to_md(table):
-    """将Word表格转换为Markdown表格"""
-    if not table.rows:
+    """将Word表格（python-docx Table）转换为Markdown表格"""
+    return convert_table_element_to_md(table._tbl)
+
+def convert_table_element_to_md(tbl):
+    """将 w:tbl 元素转换为Markdown表格，直接读取XML，不构造python-docx单元格对象"""
+    rows = table_element_rows(tbl)
+    if not rows:
         return ""
-        
+    
     # 表头
-    header_cells = table.rows[0].cells
-    header_row = [cell.text.strip() or " " for cell in header_cells]
+    header_row = [text.strip() or " " for text in rows[0]]
     
     # 构建markdown表格
     md_rows = [
@@ -41,12 +192,54 @@ def convert_table_to_md(table):
     ]
     
     # 表格内容
-    for row in table.rows[1:]:
-        cells = [cell.text.strip() or " " for cell in row.cells]
-        md_rows.append("| " + " | ".join(cells) + " |")
+    for row in rows[1:]:
+        md_rows.append("| " + " | ".join([text.strip() or " " for text in row]) + " |")
     
     return "\n".join(md_rows)
 
+def table_element_rows(tbl):
+    """
+    一次遍历 w:tbl，返回按网格列展开的单元格文本（与python-docx的 row.cells 一致）：
+    横向合并（gridSpan）的单元格在其覆盖的每一列重复，
+    纵向合并（vMerge）的后续单元格取合并起始单元格的文本
+    """
+    rows = []
+    above = []  # 上一行各网格列的文本
+    for tr in tbl:
+        if tr.tag != W_TR:
+            continue
+        row = []
+        trpr = tr.find(W_TRPR)
+        if trpr is not None and (grid_before := trpr.find(W_GRID_BEFORE)) is not None:
+            row.extend([""] * int(grid_before.get(W_VAL, 0)))
+        
+        for tc in tr:
+            if tc.tag != W_TC:
+                continue
+            span = 1
+            merged = False
+            tcpr = tc.find(W_TCPR)
+            if tcpr is not None:
+                if (grid_span := tcpr.find(W_GRID_SPAN)) is not None:
+                    span = int(grid_span.get(W_VAL, 1))
+                if (vmerge := tcpr.find(W_VMERGE)) is not None:
+                    merged = vmerge.get(W_VAL, 'continue') == 'continue'
+            
+            col = len(row)
+            if merged and col < len(above):
+                text = above[col]
+            else:
+                # 单元格文本：各段落文本以换行连接
+                text = "\n".join(["".join([run_text(r) for r in iter_paragraph_runs(p)])
+                                   for p in tc if p.tag == W_P])
+            row.extend([text] * span)
+        
+        if trpr is not None and (grid_after := trpr.find(W_GRID_AFTER)) is not None:
+            row.extend([""] * int(grid_after.get(W_VAL, 0)))
+        rows.append(row)
+        above = row
+    return rows
+
 # 标题处理函数
 def process_heading(para):
     """处理标题段落，返回markdown格式的标题"""
@@ -55,278 +248,716 @@ def process_heading(para):
         return '#' * level + ' ' + para.text
     return None
 
-# 从PDF提取文本
-def extract_text_from_pdf(pdf_path):
-    """从PDF文件提取文本内容"""
-    content = []
+# PDF表格处理函数
+def convert_pdf_table_to_md(table):
+    """将pdfplumber提取的表格（行列表）转换为Markdown表格"""
+    if not table or not table[0]:
+        return ""
+    
+    # 表头
+    header_row = [_pdf_table_cell(cell) for cell in table[0]]
+    md_table = [
+        "| " + " | ".join(header_row) + " |",
+        "| " + " | ".join(["---"] * len(header_row)) + " |"
+    ]
+    
+    # 表格内容
+    for row in table[1:]:
+        cells = [_pdf_table_cell(cell) for cell in row]
+        md_table.append("| " + " | ".join(cells) + " |")
+    
+    return "\n".join(md_table)
+
+def _pdf_table_cell(cell):
+    """单元格内的换行会打断Markdown表格行，竖线会被当作列分隔符"""
+    if not cell:
+        return " "
+    return " ".join(cell.split("\n")).replace("|", "\\|")
+
+# 按位置提取页面的正文和表格
+def iter_pdf_page_blocks(page):
+    """
+    按从上到下的顺序产出页面的文字段和Markdown表格
+    表格只定位一次：表格区域内的字符不再参与正文提取，表格插入在它所在的位置，
+    页面字符只遍历一次按表格分段。默认按线条检测表格，没有线条的页面直接提取整页文字
+    """
+    tables = page.find_tables() if (page.rects or page.lines or page.curves) else []
+    if not tables:
+        if text := page.extract_text():
+            yield text
+        return
+    
+    from pdfplumber.utils import extract_text
+    
+    tables.sort(key=lambda table: (table.bbox[1], table.bbox[0]))
+    bboxes = [table.bbox for table in tables]
+    tops = [bbox[1] for bbox in bboxes]
+    # 第i段为第i个表格上方（第i-1个表格之后）的字符
+    segments = [[] for _ in range(len(tables) + 1)]
+    for char in page.chars:
+        x = (char['x0'] + char['x1']) / 2
+        y = (char['top'] + char['bottom']) / 2
+        if any(x0 <= x <= x1 and top <= y <= bottom for x0, top, x1, bottom in bboxes):
+            continue
+        segments[bisect_right(tops, y)].append(char)
+    
+    for idx, chars in enumerate(segments):
+        if chars and (text := extract_text(chars)):
+            yield text
+        if idx < len(tables) and (md_table := convert_pdf_table_to_md(tables[idx].extract())):
+            yield md_table
+
+# 提取单个PDF页面
+def extract_pdf_page(page, page_num, images=None, tables=PDF_TABLES, page_cache=None):
+    """
+    提取单个PDF页面的文本和表格，返回该页的Markdown文本
+    :param images: 可选，images(pdfplumber图片字典) 保存图片并返回引用路径（无法导出时返回None），
+                   图片引用添加在该页末尾
+    :param tables: 表格的处理方式，见 PDF_TABLE_MODES
+    :param page_cache: 可选的 cache.PageCache，内容未变化的页面直接使用缓存的结果；导出图片时不使用
+    """
+    # 添加页码标记
+    heading = f"## 第{page_num + 1}页"
+    
+    if page_cache is not None and images is None:
+        # 缓存的是页码标记之后的内容，同一页面出现在其他文件或其他页码时同样命中
+        key = page_cache.make_key(page, tables)
+        body = page_cache.get(key)
+        if body is None:
+            body = "\n\n".join(iter_pdf_page_content(page, tables))
+            page_cache.put(key, body)
+        return f"{heading}\n\n{body}" if body else heading
+    
+    content = [heading]
+    content.extend(iter_pdf_page_content(page, tables))
+    
+    if images is not None:
+        for image in page.images:
+            if ref := images(image):
+                content.append(f"![]({ref})")
+    
+    return "\n\n".join(content)
+
+def iter_pdf_page_content(page, tables=PDF_TABLES):
+    """按 tables 指定的方式产出页面的文字段和Markdown表格"""
+    if tables == 'inline':
+        yield from iter_pdf_page_blocks(page)
+        return
+    
+    # 提取文本
+    text = page.extract_text()
+    if text:
+        yield text
+    
+    # 尝试提取表格
+    for table in page.extract_tables():
+        if md_table := convert_pdf_table_to_md(table):
+            yield md_table
+
+# 提取PDF页面区间（工作进程入口）
+def extract_pdf_page_range(pdf_path, start, end, images=None, tables=PDF_TABLES, page_cache=None):
+    """
+    在独立进程中重新打开PDF并提取 [start, end) 区间的页面
+    :return: (每页的Markdown文本列表, 引用的图片文件列表, 页面缓存的(命中数, 未命中数))
+    """
+    import pdfplumber
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = []
+        for page_num in range(start, end):
+            page = pdf.pages[page_num]
+            pages.append(extract_pdf_page(page, page_num, images, tables, page_cache))
+            # 释放页面缓存的布局对象，避免内存随页数增长
+            page.flush_cache()
+    stats = (0, 0)
+    if page_cache is not None:
+        page_cache.close()
+        stats = (page_cache.hits, page_cache.misses)
+    return pages, sorted(images.used) if images is not None else [], stats
+
+# 流式提取PDF
+def iter_pdf_markdown(pdf_path, workers=1, chunk_size=PDF_CHUNK_SIZE, images=None, tables=PDF_TABLES,
+                      page_cache=None):
+    """
+    逐页产出PDF的Markdown文本，内存占用与页数无关
+    :param pdf_path: PDF文件路径
+    :param workers: 页面分片并行的进程数，为1时顺序提取
+    :param chunk_size: 每个分片包含的页数
+    :param images: 可选，见 extract_pdf_page；需可被pickle，分片进程引用的图片合并到 images.used
+    :param tables: 表格的处理方式，见 PDF_TABLE_MODES
+    :param page_cache: 可选，见 extract_pdf_page；需可被pickle，分片进程的命中统计累加到 page_cache
+                       （结果由调用方 close() 写入）
+    :return: 生成器，产出 (页码(从1开始), 总页数, 该页Markdown文本)
+    """
+    page_count = 0
     try:
+        import pdfplumber
+        
         with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                # 添加页码标记
-                content.append(f"## 第{page_num + 1}页")
-                
-                # 提取文本
-                text = page.extract_text()
-                if text:
-                    content.append(text)
-                
-                # 尝试提取表格
-                tables = page.extract_tables()
-                for table in tables:
-                    # 转换为Markdown表格
-                    md_table = []
-                    
-                    # 表头
-                    if table and table[0]:
-                        header_row = [cell or " " for cell in table[0]]
-                        md_table.append("| " + " | ".join(header_row) + " |")
-                        md_table.append("| " + " | ".join(["---"] * len(header_row)) + " |")
-                    
-                        # 表格内容
-                        for row in table[1:]:
-                            cells = [cell or " " for cell in row]
-                            md_table.append("| " + " | ".join(cells) + " |")
-                        
-                        content.append("\n".join(md_table))
+            page_count = len(pdf.pages)
+            sharded = workers > 1 and page_count > chunk_size
+            if not sharded:
+                for page_num, page in enumerate(pdf.pages):
+                    yield page_num + 1, page_count, extract_pdf_page(page, page_num, images, tables, page_cache)
+                    page.flush_cache()
+        
+        if sharded:
+            # 按页码区间分片，每个进程重新打开文件，结果按页序重组；
+            # 同时在途的分片数有上限，已完成但未写出的结果不会无限堆积
+            starts = deque(range(0, page_count, chunk_size))
+            workers = min(workers, len(starts))
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                while starts or pending:
+                    while starts and len(pending) < workers * 2:
+                        start = starts.popleft()
+                        end = min(start + chunk_size, page_count)
+                        pending.append((start, executor.submit(extract_pdf_page_range, pdf_path, start, end,
+                                                               images, tables, page_cache)))
+                    start, future = pending.popleft()
+                    pages, used, (hits, misses) = future.result()
+                    if images is not None:
+                        images.used.update(used)
+                    if page_cache is not None:
+                        page_cache.hits += hits
+                        page_cache.misses += misses
+                    for offset, page_text in enumerate(pages):
+                        yield start + offset + 1, page_count, page_text
                 
     except Exception as e:
-        content.append(f"PDF处理错误: {str(e)}")
-    
-    return "\n\n".join(content)
+        yield page_count, page_count, f"PDF处理错误: {str(e)}"
+
+# 从PDF提取文本
+def extract_text_from_pdf(pdf_path, workers=1, chunk_size=PDF_CHUNK_SIZE, images=None, tables=PDF_TABLES,
+                          page_cache=None):
+    """
+    从PDF文件提取文本内容
+    :param pdf_path: PDF文件路径
+    :param workers: 页面分片并行的进程数，为1时顺序提取
+    :param chunk_size: 每个分片包含的页数
+    :param images: 可选，见 extract_pdf_page
+    :param tables: 表格的处理方式，见 PDF_TABLE_MODES
+    :param page_cache: 可选，见 iter_pdf_markdown
+    :return: Markdown文本
+    """
+    return "\n\n".join(text for _, _, text in iter_pdf_markdown(pdf_path, workers, chunk_size, images, tables,
+                                                                 page_cache))
+
+# 流式写出PDF的Markdown
+def write_pdf_markdown(pdf_path, md_path, workers=1, chunk_size=PDF_CHUNK_SIZE, progress=None, images=None,
+                       tables=PDF_TABLES, page_cache=None):
+    """
+    将PDF逐页转换并增量写入Markdown文件
+    :param progress: 可选回调 progress(当前页, 总页数)
+    :param images: 可选，见 extract_pdf_page
+    :param tables: 表格的处理方式，见 PDF_TABLE_MODES
+    :param page_cache: 可选，见 iter_pdf_markdown
+    :return: 总页数
+    """
+    page_count = 0
+    with open(md_path, 'w', encoding='utf-8') as f:
+        for page_num, page_count, page_text in iter_pdf_markdown(pdf_path, workers, chunk_size, images, tables,
+                                                                   page_cache):
+            if f.tell():
+                f.write("\n\n")
+            f.write(page_text)
+            if progress:
+                progress(page_num, page_count)
+    return page_count
 
 # 将Markdown转换为Word文档
-def convert_md_to_word(md_path, output_path):
+def convert_md_to_word(md_path, output_path, engine=None, resource_dir=None):
     """
     将Markdown文件转换为Word文档
     :param md_path: Markdown文件路径
     :param output_path: 输出Word文件路径
+    :param engine: 'native'（内置引擎，见 md_docx）或 'pandoc'；
+                   默认使用内置引擎，当前目录存在 reference.docx 模板时使用pandoc。
+                   首选的方式失败时自动改用另一种
+    :param resource_dir: 图片相对路径的基准目录，默认为Markdown文件所在目录
     :return: 是否成功
     """
+    if engine is None:
+        engine = 'pandoc' if os.path.exists('reference.docx') else 'native'
+    if engine == 'native' and _convert_md_to_word_native(md_path, output_path, resource_dir):
+        return True
+    
     try:
+        # 没有参考模板时优先使用常驻的pandoc server，避免每个文件启动一次pandoc进程
+        from pandoc_backend import convert_with_server
+        
+        with stage('pandoc_server'):
+            served = (not os.path.exists('reference.docx') and not resource_dir
+                      and convert_with_server(md_path, output_path, 'docx'))
+        if served:
+            return True
+        
         # 使用pypandoc转换
-        pypandoc.convert_file(
-            md_path,
-            'docx',
-            outputfile=output_path,
-            extra_args=['--reference-doc=reference.docx'] if os.path.exists('reference.docx') else []
-        )
+        import pypandoc
+        
+        with stage('pypandoc'):
+            pypandoc.convert_file(
+                md_path,
+                'docx',
+                outputfile=output_path,
+                extra_args=(['--reference-doc=reference.docx'] if os.path.exists('reference.docx') else [])
+                           + _resource_args(resource_dir)
+            )
         return True
     except Exception as e:
         print(f"转换失败: {str(e)}")
-        # 备用方法：使用python-docx手动转换
-        try:
-            # 读取Markdown文件
-            with open(md_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # 创建Word文档
-            doc = docx.Document()
-            
-            # 处理标题和内容
-            lines = md_content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    doc.add_paragraph()
-                    continue
-                    
-                # 处理标题
-                if line.startswith('#'):
-                    level = 0
-                    while line.startswith('#'):
-                        level += 1
-                        line = line[1:]
-                    line = line.strip()
-                    doc.add_heading(line, level=level)
-                # 处理普通段落
-                else:
-                    p = doc.add_paragraph()
-                    # 简单处理粗体和斜体
-                    parts = re.split(r'(\*\*.*?\*\*|\*.*?\*)', line)
-                    for part in parts:
-                        if part.startswith('**') and part.endswith('**'):
-                            p.add_run(part[2:-2]).bold = True
-                        elif part.startswith('*') and part.endswith('*'):
-                            p.add_run(part[1:-1]).italic = True
-                        elif part:
-                            p.add_run(part)
-            
-            # 保存文档
-            doc.save(output_path)
-            return True
-        except Exception as e2:
-            print(f"备用方法也失败: {str(e2)}")
-            return False
+        # 备用方法：内置引擎
+        return engine != 'native' and _convert_md_to_word_native(md_path, output_path, resource_dir)
+
+def _resource_args(resource_dir):
+    return [f'--resource-path={resource_dir}'] if resource_dir else []
+
+def _convert_md_to_word_native(md_path, output_path, resource_dir=None):
+    """使用内置引擎转换，失败时返回False"""
+    try:
+        from md_docx import convert_markdown_file
+        
+        with stage('native_docx'):
+            convert_markdown_file(md_path, output_path, resource_dir)
+        return True
+    except Exception as e:
+        print(f"内置引擎转换失败: {str(e)}")
+        return False
 
 # 将Markdown转换为PDF文档
-def convert_md_to_pdf(md_path, output_path):
+def convert_md_to_pdf(md_path, output_path, resource_dir=None):
     """
     将Markdown文件转换为PDF
     :param md_path: Markdown文件路径
     :param output_path: 输出PDF路径
+    :param resource_dir: 图片相对路径的基准目录，默认为Markdown文件所在目录
     :return: 是否成功
     """
     try:
         # 尝试使用pypandoc
-        pypandoc.convert_file(
-            md_path,
-            'pdf',
-            outputfile=output_path
-        )
+        import pypandoc
+        
+        with stage('pypandoc'):
+            pypandoc.convert_file(
+                md_path,
+                'pdf',
+                outputfile=output_path,
+                extra_args=_resource_args(resource_dir)
+            )
         return True
     except Exception as e:
         print(f"pypandoc转换失败: {str(e)}")
         
-        # 备用方法：使用reportlab手动转换
+        # 备用方法：内置的reportlab引擎（见 md_pdf）
         try:
-            # 读取Markdown文件
-            with open(md_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # 将Markdown转换为HTML
-            html = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
-            
-            # 创建PDF文档
-            doc = SimpleDocTemplate(output_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            
-            # 自定义标题样式
-            styles.add(ParagraphStyle(name='Heading1', fontSize=16, bold=True))
-            styles.add(ParagraphStyle(name='Heading2', fontSize=14, bold=True))
-            styles.add(ParagraphStyle(name='Heading3', fontSize=12, bold=True))
+            from md_pdf import convert_markdown_file
             
-            # 解析HTML并添加到PDF
-            flowables = []
-            
-            # 简单解析HTML
-            lines = html.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    flowables.append(Spacer(1, 12))
-                    continue
-                
-                # 处理标题
-                if line.startswith('<h1>'):
-                    text = line.replace('<h1>', '').replace('</h1>', '')
-                    flowables.append(Paragraph(text, styles['Heading1']))
-                elif line.startswith('<h2>'):
-                    text = line.replace('<h2>', '').replace('</h2>', '')
-                    flowables.append(Paragraph(text, styles['Heading2']))
-                elif line.startswith('<h3>'):
-                    text = line.replace('<h3>', '').replace('</h3>', '')
-                    flowables.append(Paragraph(text, styles['Heading3']))
-                # 处理段落
-                elif not (line.startswith('<table>') or line.startswith('<tr>') or line.startswith('<td>')):
-                    # 移除其他HTML标签
-                    text = re.sub(r'<[^>]*>', '', line)
-                    flowables.append(Paragraph(text, styles['Normal']))
-            
-            # 构建PDF
-            doc.build(flowables)
+            with stage('reportlab_fallback'):
+                convert_markdown_file(md_path, output_path, resource_dir)
             return True
         except Exception as e2:
             print(f"备用方法也失败: {str(e2)}")
             return False
 
+# Markdown图片引用 ![说明](路径)
+_IMAGE_LINK = re.compile(r'(!\[[^\]]*\]\()([^)\s]+)')
+
+def rebase_image_links(text, src_dir, dst_dir):
+    """把图片引用中的相对路径从相对于 src_dir 改写为相对于 dst_dir（URL和绝对路径不变）"""
+    def rebase(match):
+        target = match.group(2)
+        if '://' in target or target.startswith(('/', '#', 'data:')) or os.path.isabs(target):
+            return match.group(0)
+        path = os.path.normpath(os.path.join(src_dir, target))
+        return match.group(1) + os.path.relpath(path, dst_dir).replace(os.sep, '/')
+    return _IMAGE_LINK.sub(rebase, text)
+
+# 将Markdown文件内容追加到已打开的输出文件
+def append_markdown_file(out_file, md_path, chunk_size=1024 * 1024, out_dir=None):
+    """
+    分块复制Markdown文件内容到 out_file，不把整个文件读入内存
+    :param out_dir: 输出文件所在目录；与Markdown文件不在同一目录时逐行改写图片引用的相对路径
+    """
+    with open(md_path, 'r', encoding='utf-8') as f:
+        md_dir = os.path.dirname(os.path.abspath(md_path))
+        if out_dir is None or md_dir == os.path.abspath(out_dir):
+            shutil.copyfileobj(f, out_file, chunk_size)
+        else:
+            for line in f:
+                out_file.write(rebase_image_links(line, md_dir, out_dir) if '![' in line else line)
+
+class OrderedMarkdownMerger:
+    """
+    增量写出合并文档
+
+    各文档按完成顺序登记，但按输入顺序写入合并文件：轮到的文档立即流式写出，
+    提前完成的文档只暂存输出文件路径，因此内存占用不随批次大小增长。
+    """
+
+    def __init__(self, output_path, total):
+        self.output_path = output_path
+        self.total = total  # 文档总数
+        self.next_index = 0  # 下一个应写出的文档序号
+        self.pending = {}  # 序号 -> (标题, 文件列表)，失败的文档为None
+        self.written = 0  # 已写出的文档数
+        self.out_file = None
+
+    def add(self, index, title, md_paths):
+        """登记第 index 个文档（标题及其输出文件），并写出所有已轮到的文档"""
+        self.pending[index] = (title, md_paths)
+        self._flush()
+
+    def skip(self, index):
+        """第 index 个文档转换失败，不计入合并文档"""
+        self.pending[index] = None
+        self._flush()
+
+    def _flush(self):
+        while self.next_index in self.pending:
+            part = self.pending.pop(self.next_index)
+            self.next_index += 1
+            if part is None:
+                continue
+            title, md_paths = part
+            if self.out_file is None:
+                self.out_file = open(self.output_path, 'w', encoding='utf-8')
+            if self.written:
+                self.out_file.write("\n\n---\n\n")
+            # 添加文件标题和内容
+            self.out_file.write(f"# {title}\n\n")
+            for part_idx, md_path in enumerate(md_paths):
+                if part_idx:
+                    self.out_file.write("\n\n---\n\n")
+                # 分割模式的章节位于子目录中，其中的图片引用改为相对于合并文档
+                append_markdown_file(self.out_file, md_path, out_dir=os.path.dirname(os.path.abspath(self.output_path)))
+            self.written += 1
+
+    def close(self):
+        """
+        关闭合并文件
+        :return: 是否写出了合并文档（没有成功的文档时不创建文件）
+        """
+        if self.out_file is not None:
+            self.out_file.close()
+            self.out_file = None
+        return self.written > 0
+
+# 将一个已打开文件的剩余内容复制到另一个已打开的文件（二进制）
+def copy_file_bytes(src, dst, chunk_size=1024 * 1024):
+    """
+    优先使用 os.sendfile 在内核中完成复制（不经过Python内存），不支持时退回分块复制
+    :return: 复制的字节数
+    """
+    if hasattr(os, 'sendfile'):
+        dst.flush()
+        offset = src.tell()
+        remaining = os.fstat(src.fileno()).st_size - offset
+        copied = 0
+        try:
+            while remaining > 0:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset + copied, min(remaining, 1 << 30))
+                if sent == 0:
+                    break
+                copied += sent
+                remaining -= sent
+            return copied
+        except OSError:
+            if copied:
+                raise
+            # 目标不支持sendfile（如某些网络文件系统），退回分块复制
+    copied = 0
+    while chunk := src.read(chunk_size):
+        dst.write(chunk)
+        copied += len(chunk)
+    return copied
+
 # 将多个Markdown文件合并为一个
-def merge_markdown_files(md_paths, output_path):
+def merge_markdown_files(md_paths, output_path, chunk_size=1024 * 1024):
     """
-    合并多个Markdown文件为一个
+    合并多个Markdown文件为一个，逐个文件流式读写，内存占用与文件大小无关
+    每个文件前添加 "# 文件名" 标题，文件之间以 "---" 分隔；各文件去掉开头的BOM并统一换行符，
+    不在同一目录的文件中的图片引用改为相对于合并文件。读取出错的文件跳过，不影响其他文件。
+    先写入临时文件，完成后再替换输出文件，出错时不留下不完整的合并文件
     :param md_paths: Markdown文件路径列表
     :param output_path: 输出的合并文件路径
+    :param chunk_size: 读取缓冲区大小
+    :return: 统计信息 {'files': 合并的文件数, 'bytes': 写出的字节数, 'seconds': 耗时, 'bytes_per_sec': 速度}
     """
-    merged_content = []
-    
-    for md_path in md_paths:
-        try:
-            file_name = os.path.splitext(os.path.basename(md_path))[0]
-            with open(md_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 添加文件标题和内容
-            merged_content.append(f"# {file_name}\n\n{content}")
-        except Exception as e:
-            print(f"合并文件 {md_path} 时出错: {str(e)}")
+    start = time.perf_counter()
+    merged_files = 0
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    tmp_path = f"{output_path}.tmp-{os.getpid()}"
     
-    # 写入合并后的文件
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write("\n\n---\n\n".join(merged_content))
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            for md_path in md_paths:
+                position = out.tell()
+                try:
+                    file_name = os.path.splitext(os.path.basename(md_path))[0]
+                    md_dir = os.path.dirname(os.path.abspath(md_path))
+                    # utf-8-sig去掉BOM，通用换行模式把 \r\n 和 \r 统一为 \n
+                    with open(md_path, 'r', encoding='utf-8-sig', buffering=chunk_size) as src:
+                        # 添加分隔符和文件标题
+                        out.write(("\n\n---\n\n" if merged_files else "") + f"# {file_name}\n\n")
+                        for line in src:
+                            if md_dir != out_dir and '![' in line:
+                                line = rebase_image_links(line, md_dir, out_dir)
+                            out.write(line)
+                except Exception as e:
+                    # 丢弃该文件已写出的部分
+                    out.seek(position)
+                    out.truncate()
+                    print(f"合并文件 {md_path} 时出错: {str(e)}")
+                    continue
+                merged_files += 1
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
     
-    return True
+    written = os.path.getsize(output_path)
+    seconds = time.perf_counter() - start
+    return {
+        'files': merged_files,
+        'bytes': written,
+        'seconds': seconds,
+        'bytes_per_sec': written / seconds if seconds else 0.0
+    }
 
-# 新增函数: 简单模式Word文档转Markdown
-def extract_text_simple(doc):
-    """简单模式：提取Word文档的文本并保留格式"""
-    content = []
-    
-    # 处理段落
-    for para in doc.paragraphs:
-        # 空段落
-        if not para.text.strip():
-            content.append("\n")
+def iter_paragraph_runs(p):
+    """按顺序产出段落中的文本运行（w:r）元素"""
+    for child in p:
+        if child.tag == W_R:
+            yield child
+        elif child.tag in _RUN_CONTAINERS:
+            yield from iter_paragraph_runs(child)
+
+def run_text(r):
+    """读取文本运行的文字，与python-docx的run.text一致（制表符和换行符转换为字符）"""
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or "")
+        elif tag == W_TAB:
+            parts.append("\t")
+        elif tag == W_BR or tag == W_CR:
+            parts.append("\n")
+    return "".join(parts)
+
+def paragraph_style_id(p):
+    """读取段落的样式ID，没有显式样式时返回None"""
+    ppr = p.find(W_PPR)
+    if ppr is not None:
+        pstyle = ppr.find(W_PSTYLE)
+        if pstyle is not None:
+            return pstyle.get(W_VAL)
+    return None
+
+def heading_level(style_name):
+    """根据样式名称（如 'Heading 2'）返回标题级别，非标题返回None"""
+    if not style_name or not style_name.startswith('Heading'):
+        return None
+    try:
+        return int(style_name.replace('Heading ', ''))
+    except ValueError:
+        return None
+
+def get_style_names(doc):
+    """一次性建立 样式ID -> 样式名称 的映射，避免逐段落查询 para.style.name"""
+    return {style.style_id: style.name for style in doc.styles}
+
+def iter_body_elements(body):
+    """按文档顺序产出正文中的段落（w:p）和表格（w:tbl）元素"""
+    for child in body:
+        if child.tag == W_P or child.tag == W_TBL:
+            yield child
+        elif child.tag == W_SDT:
+            # 块级内容控件中的段落和表格
+            content = child.find(W_SDT_CONTENT)
+            if content is not None:
+                yield from iter_body_elements(content)
+
+def iter_markdown_blocks(elements, style_names, images=None):
+    """
+    单次遍历正文元素，按文档顺序产出Markdown块
+    :param elements: iter_body_elements 产出的段落/表格元素
+    :param style_names: 样式ID到样式名称的映射
+    :param images: 可选，images(关系ID) 返回图片在Markdown中的引用路径（无法解析时返回None）；
+                   为None时不输出图片。标题和表格中的图片不输出
+    :return: 生成器，产出 (标题级别或None, 段落纯文本或None, Markdown文本)；
+             表格的纯文本为None，空段落的Markdown为 "\n"
+    """
+    for element in elements:
+        if element.tag == W_TBL:
+            with stage('tables'):
+                table_md = convert_table_element_to_md(element)
+            yield None, None, table_md
             continue
         
-        # 处理标题
-        if heading := process_heading(para):
-            content.append(heading)
-            continue
-            
-        # 处理普通段落
-        formatted_runs = [format_text_run(run) for run in para.runs]
-        formatted_text = "".join(formatted_runs)
-        if formatted_text:
-            content.append(formatted_text)
-    
-    # 处理表格
-    for table in doc.tables:
-        content.append(convert_table_to_md(table))
-    
+        runs = list(iter_paragraph_runs(element))
+        texts = [run_text(r) for r in runs]
+        text = "".join(texts)
+        level = heading_level(style_names.get(paragraph_style_id(element)))
+        refs = None
+        if images is not None and not level:
+            refs = [[ref for rel_id in run_image_ids(r) if (ref := images(rel_id))] for r in runs]
+        
+        # 含图片的段落
+        if refs and any(refs):
+            yield None, text, format_runs_with_images(runs, texts, refs)
+        # 空段落
+        elif not text.strip():
+            yield level, text, "\n"
+        # 标题
+        elif level:
+            yield level, text, '#' * level + ' ' + text
+        # 普通段落
+        else:
+            yield None, text, format_runs(runs, texts)
+
+def iter_document_blocks(doc, images=None):
+    """按文档顺序产出python-docx文档的Markdown块，见 iter_markdown_blocks"""
+    return iter_markdown_blocks(iter_body_elements(doc.element.body), get_style_names(doc), images)
+
+def docx_relationships(zf, part=''):
+    """
+    读取部件的关系 {关系ID: (关系类型, 目标部件在zip中的路径)}，外部链接的目标为None
+    :param zf: 已打开的 zipfile.ZipFile
+    :param part: 部件在zip中的路径，空字符串表示包本身（_rels/.rels）
+    """
+    from lxml import etree
+
+    source_dir, name = posixpath.split(part)
+    try:
+        rels = etree.fromstring(zf.read(posixpath.join(source_dir, '_rels', name + '.rels')))
+    except KeyError:
+        return {}
+    relationships = {}
+    for rel in rels.iter(REL_RELATIONSHIP):
+        target = rel.get('Target')
+        if rel.get('TargetMode') == 'External':
+            target = None
+        elif target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(source_dir, target))
+        relationships[rel.get('Id')] = (rel.get('Type'), target)
+    return relationships
+
+def docx_main_part(zf):
+    """主文档部件在zip中的路径（通常为 word/document.xml）"""
+    for rel_type, target in docx_relationships(zf).values():
+        if rel_type == RT_OFFICE_DOCUMENT and target:
+            return target
+    return 'word/document.xml'
+
+def read_docx_style_names(zf, document_part):
+    """
+    直接读取 styles.xml 建立 样式ID -> 样式名称 的映射，结果与 get_style_names 一致
+    :param zf: 已打开的 zipfile.ZipFile
+    :param document_part: 主文档部件在zip中的路径
+    """
+    from lxml import etree
+    from docx.styles import BabelFish  # 内置样式的内部名称（如 heading 1）与界面名称的对应
+
+    styles_part = next((target for rel_type, target in docx_relationships(zf, document_part).values()
+                        if rel_type == RT_STYLES and target), None)
+    if styles_part is None:
+        return {}
+    try:
+        styles = etree.fromstring(zf.read(styles_part))
+    except KeyError:
+        return {}
+    names = {}
+    for style in styles.iter(W_STYLE):
+        name = style.find(W_NAME)
+        name = name.get(W_VAL) if name is not None else None
+        names[style.get(W_STYLE_ID)] = BabelFish.internal2ui(name) if name is not None else None
+    return names
+
+def iter_docx_body_elements(zf, document_part):
+    """
+    流式解析主文档XML，按文档顺序产出正文中的段落和表格元素（同 iter_body_elements）；
+    每个正文子元素处理完后立即清除并从树中移除，内存占用只与单个段落/表格的大小有关
+    """
+    from lxml import etree
+
+    with zf.open(document_part) as stream:
+        body = None
+        depth = 0
+        for event, element in etree.iterparse(stream, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                depth += 1
+                if depth == 2 and element.tag == W_BODY:
+                    body = element
+                continue
+            depth -= 1
+            # 只在正文的直接子元素结束时处理，此时其内容已完整解析
+            if body is not None and depth == 2:
+                yield from iter_body_elements((element,))
+                element.clear()
+                body.remove(element)
+
+def iter_docx_blocks(docx_path, images=None):
+    """流式读取.docx文件，按文档顺序产出Markdown块，见 iter_markdown_blocks"""
+    with zipfile.ZipFile(docx_path) as zf:
+        document_part = docx_main_part(zf)
+        style_names = read_docx_style_names(zf, document_part)
+        yield from iter_markdown_blocks(iter_docx_body_elements(zf, document_part), style_names, images)
+
+def use_docx_streaming(docx_path, threshold=DOCX_STREAM_THRESHOLD):
+    """文件大小超过阈值时使用流式读取；threshold为None表示从不使用，0表示总是使用"""
+    return threshold is not None and os.path.getsize(docx_path) >= threshold
+
+# 新增函数: 简单模式Word文档转Markdown
+def extract_text_simple(doc, images=None):
+    """简单模式：按文档顺序提取Word文档的段落和表格并保留格式；images见 iter_markdown_blocks"""
+    return markdown_from_blocks(iter_document_blocks(doc, images))
+
+def markdown_from_blocks(blocks):
+    """将Markdown块拼接为简单模式的文档文本"""
+    content = [md for _, _, md in blocks if md]
     return "\n\n".join(content)
 
+def write_markdown_blocks(blocks, md_path):
+    """将Markdown块逐个写入文件，输出与 markdown_from_blocks 相同，但不在内存中拼接全文"""
+    with open(md_path, 'w', encoding='utf-8') as f:
+        separator = ""
+        for _, _, md in blocks:
+            if md:
+                f.write(separator)
+                f.write(md)
+                separator = "\n\n"
+
 # 新增函数: 分割模式Word文档转Markdown
-def extract_text_with_sections(doc):
-    """分割模式：按一级标题提取Word文档内容并分割为多个章节"""
+def extract_text_with_sections(doc, images=None):
+    """分割模式：按一级标题提取Word文档内容并分割为多个章节，表格保留在所在章节中"""
+    return sections_from_blocks(iter_document_blocks(doc, images))
+
+def sections_from_blocks(blocks):
+    """将Markdown块按一级标题分割为章节字典 {标题: 内容}"""
     sections = {}
     current_section = []
     current_title = "前言"  # 默认标题
     
-    # 处理段落
-    for para in doc.paragraphs:
+    for level, text, md in blocks:
         # 处理一级标题 - 分割点
-        if para.style.name == 'Heading 1':
+        if level == 1:
             # 保存之前的部分
             if current_section:
                 sections[current_title] = "\n\n".join(current_section)
             # 开始新的部分
-            current_title = para.text.strip()
-            current_section = []
-            current_section.append('# ' + para.text)
-            continue
-            
-        # 空段落
-        if not para.text.strip():
-            current_section.append("\n")
+            current_title = text.strip()
+            current_section = ['# ' + text]
             continue
         
-        # 处理其他级别标题
-        if para.style.name.startswith('Heading'):
-            level = int(para.style.name.replace('Heading ', ''))
-            current_section.append('#' * level + ' ' + para.text)
-            continue
-            
-        # 处理普通段落
-        formatted_runs = [format_text_run(run) for run in para.runs]
-        formatted_text = "".join(formatted_runs)
-        if formatted_text:
-            current_section.append(formatted_text)
-    
-    # 处理表格
-    for table in doc.tables:
-        current_section.append(convert_table_to_md(table))
+        if md:
+            current_section.append(md)
     
     # 保存最后一个部分
     if current_section:
         sections[current_title] = "\n\n".join(current_section)
     
-    return sections 
\ No newline at end of file
+    return sections
@@ -0,0 +1,326 @@
+"""
+监视文件夹，自动转换新增/修改的文件
+
+- 文件系统事件：安装了 watchdog 时使用（Linux上基于inotify）；未安装或指定 poll=True 时
+  定期扫描目录比较修改时间和大小（网络共享盘上inotify通常收不到事件，此时应使用轮询）
+- 防抖：文件在 debounce 秒内没有再变化（且大小稳定）才视为写入完成，避免转换写到一半的文件
+- 就绪的文件进入有界队列，由常驻进程池转换；队列满时文件留在待处理列表中稍后重试
+- 工作进程异常退出（如转换超大PDF时内存不足）时重建进程池，受影响的文件放回待处理列表重新转换；
+  同一文件连续 MAX_CRASH_RETRIES 次随工作进程崩溃后记为失败，直到文件再次变化
+- .docx/.pdf 转为Markdown，.md 转为Word/PDF；输出目录中的文件和Office临时文件（~$开头）会被忽略
+- 输出按源文件相对于监视目录的位置存放（监视多个目录时再以各监视目录名区分），
+  不同子目录中的同名文件不会互相覆盖
+"""
+import os
+import sys
+import time
+import queue
+import signal
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import convert_to_markdown, convert_from_markdown, default_workers
+from jobs import WorkerPool
+from utils import PDF_CHUNK_SIZE
+
+WATCH_EXTENSIONS = ('.docx', '.pdf', '.md')
+MAX_CRASH_RETRIES = 2
+
+
+def _file_state(path):
+    """(修改时间, 大小)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _ignore_interrupt():
+    """进程池工作进程忽略Ctrl+C，由主进程统一停止"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class FolderWatcher:
+    """
+    监视一个或多个输入目录并持续转换
+
+    用法:
+        watcher = FolderWatcher(['inbox'], 'out', on_event=print)
+        watcher.run()  # 阻塞直到 stop() 被调用（例如在另一个线程或信号处理中）
+    on_event(事件, 文件路径, 详情) 的事件包括 'info'、'queued'、'converted'、'failed'。
+    """
+
+    def __init__(self, input_dirs, output_dir, mode='simple', target_format='word', max_workers=None,
+                 cache_dir=None, debounce=2.0, poll=False, poll_interval=1.0, queue_size=1000,
+                 recursive=False, initial=False, pdf_chunk_size=PDF_CHUNK_SIZE, on_event=None):
+        self.input_dirs = [os.path.abspath(path) for path in input_dirs]
+        self.output_dir = os.path.abspath(output_dir)
+        if len(self.input_dirs) > 1:
+            # 多个监视目录的输出以目录名区分，目录名重复时无法区分
+            names = [os.path.basename(path) for path in self.input_dirs]
+            duplicates = sorted({name for name in names if names.count(name) > 1})
+            if duplicates:
+                raise ValueError(f"监视目录名称重复，输出会互相覆盖: {', '.join(duplicates)}")
+        self.mode = mode  # Word转换模式 'simple' 或 'sections'
+        self.target_format = target_format  # Markdown的目标格式 'word' 或 'pdf'
+        self.max_workers = max_workers or default_workers()
+        self.cache_dir = cache_dir
+        self.debounce = debounce  # 文件最后一次变化后等待的秒数
+        self.poll = poll  # 强制使用轮询
+        self.poll_interval = poll_interval
+        self.recursive = recursive
+        self.initial = initial  # 启动时是否转换目录中已有的文件
+        self.pdf_chunk_size = pdf_chunk_size
+        self.on_event = on_event
+
+        self.work_queue = queue.Queue(maxsize=queue_size)
+        self.pending = {}  # 路径 -> (最后一次变化的时间, 当时的文件状态)
+        self.queued = {}  # 路径 -> 已放入工作队列、尚未转换完成的文件状态
+        self.known = {}  # 路径 -> 已成功转换（或启动时已存在）的文件状态
+        self.failed = {}  # 路径 -> 转换失败的文件状态，文件再次变化前不再重试
+        self.crashes = {}  # 路径 -> 转换时工作进程异常退出的次数
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        # 限制已提交但未完成的任务数，队列中的积压由有界队列承担
+        self.in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+
+    def _emit(self, event, path, detail=""):
+        if self.on_event:
+            self.on_event(event, path, detail)
+
+    def accepts(self, path):
+        """是否为需要转换的文件"""
+        name = os.path.basename(path)
+        if name.startswith('~$') or name.startswith('.'):
+            return False
+        if os.path.splitext(name)[1].lower() not in WATCH_EXTENSIONS:
+            return False
+        path = os.path.abspath(path)
+        # 输出目录位于监视目录中时，忽略转换结果，避免循环转换
+        return os.path.commonpath([path, self.output_dir]) != self.output_dir
+
+    def notify(self, path):
+        """记录一次文件变化（由事件处理器或轮询调用）"""
+        if not self.accepts(path):
+            return
+        path = os.path.abspath(path)
+        state = _file_state(path)
+        if state is None or self.known.get(path) == state:
+            return
+        with self.lock:
+            if state in (self.queued.get(path), self.failed.get(path)):
+                return
+            # 轮询时未变化的文件会被重复报告，只有状态变化才重新计时
+            if path not in self.pending or self.pending[path][1] != state:
+                self.pending[path] = (time.monotonic(), state)
+
+    def _scan(self):
+        """遍历监视目录，产出所有文件路径"""
+        for input_dir in self.input_dirs:
+            if self.recursive:
+                for root, dirs, files in os.walk(input_dir):
+                    for name in files:
+                        yield os.path.join(root, name)
+            else:
+                try:
+                    entries = list(os.scandir(input_dir))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_file():
+                        yield entry.path
+
+    def _start_observer(self):
+        """启动watchdog观察器，不可用时返回None（改用轮询）"""
+        if self.poll:
+            return None
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                # 移动/重命名时关注目标路径（常见的“先写临时文件再改名”）
+                watcher.notify(getattr(event, 'dest_path', None) or event.src_path)
+
+        observer = Observer()
+        for input_dir in self.input_dirs:
+            observer.schedule(Handler(), input_dir, recursive=self.recursive)
+        observer.start()
+        return observer
+
+    def _dispatch_ready(self):
+        """把已稳定的文件放入工作队列；队列满时保留在待处理列表中"""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [(path, state) for path, (changed, state) in self.pending.items()
+                          if now - changed >= self.debounce]
+        for path, state in candidates:
+            current = _file_state(path)
+            with self.lock:
+                if current is None:
+                    self.pending.pop(path, None)  # 文件已被删除
+                    continue
+                if current != state:
+                    self.pending[path] = (now, current)  # 仍在写入，重新计时
+                    continue
+            try:
+                self.work_queue.put_nowait((path, current))
+            except queue.Full:
+                return
+            with self.lock:
+                if self.pending.get(path, (None, None))[1] == current:
+                    del self.pending[path]
+                self.queued[path] = current
+            self._emit('queued', path)
+
+    def _watch_loop(self):
+        """检测变化并分发就绪文件（后台线程）"""
+        observer = self._start_observer()
+        if observer is None:
+            self._emit('info', "", f"使用轮询监视（间隔 {self.poll_interval} 秒）")
+        last_poll = 0
+        try:
+            while not self.stop_event.is_set():
+                if observer is None and time.monotonic() - last_poll >= self.poll_interval:
+                    last_poll = time.monotonic()
+                    for path in self._scan():
+                        self.notify(path)
+                self._dispatch_ready()
+                self.stop_event.wait(0.2)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def output_dir_for(self, path):
+        """源文件的输出目录：在输出目录下镜像源文件相对于所在监视目录的位置"""
+        directory = os.path.dirname(path)
+        # 监视目录相互嵌套时以最近的一个为准
+        root = max((input_dir for input_dir in self.input_dirs
+                    if os.path.commonpath([directory, input_dir]) == input_dir), key=len)
+        parts = [self.output_dir]
+        if len(self.input_dirs) > 1:
+            parts.append(os.path.basename(root))
+        return os.path.normpath(os.path.join(*parts, os.path.relpath(directory, root)))
+
+    def _submit(self, executor, path, state):
+        """提交转换任务；进程池已损坏时抛出 BrokenProcessPool"""
+        from_md = path.lower().endswith('.md')
+        output_dir = self.output_dir_for(path)
+        os.makedirs(output_dir, exist_ok=True)
+        if from_md:
+            future = executor.submit(convert_from_markdown, path, output_dir, self.target_format,
+                                     self.cache_dir)
+        else:
+            file_type = 'pdf' if path.lower().endswith('.pdf') else 'word'
+            future = executor.submit(convert_to_markdown, path, output_dir, self.mode, file_type,
+                                     1, self.pdf_chunk_size, self.cache_dir)
+        future.add_done_callback(lambda f: self._done(path, state, f, from_md))
+
+    def _requeue(self, path, state):
+        """放回待处理列表，稍后重新分发；期间文件已再次变化的以新状态为准"""
+        with self.lock:
+            if self.queued.get(path) == state:
+                del self.queued[path]
+            self.pending.setdefault(path, (time.monotonic(), state))
+
+    def _finish(self, path, state, success):
+        """记录转换结果：成功的文件不再转换，失败的文件等到再次变化时重试"""
+        with self.lock:
+            if self.queued.get(path) == state:
+                del self.queued[path]
+            self.crashes.pop(path, None)
+            if success:
+                self.known[path] = state
+                self.failed.pop(path, None)
+            else:
+                self.failed[path] = state
+
+    def _done(self, path, state, future, from_md):
+        self.in_flight.release()
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # 工作进程异常退出：进行中的文件都会收到这个异常，无法得知是哪个文件导致的，
+            # 全部放回待处理列表；反复随崩溃失败的文件不再重试
+            crashes = self.crashes.get(path, 0) + 1
+            if crashes > MAX_CRASH_RETRIES:
+                self._finish(path, state, False)
+                self._emit('failed', path, f"转换时工作进程连续 {crashes} 次异常退出")
+                return
+            self.crashes[path] = crashes
+            self._requeue(path, state)
+            self._emit('info', path, "工作进程异常退出，稍后重新转换")
+            return
+        except Exception as e:
+            self._finish(path, state, False)
+            self._emit('failed', path, str(e))
+            return
+        if not from_md:
+            self._finish(path, state, True)
+            self._emit('converted', path, ", ".join(result.md_paths))
+        elif result[0]:
+            self._finish(path, state, True)
+            self._emit('converted', path, result[1])
+        else:
+            self._finish(path, state, False)
+            self._emit('failed', path, "转换失败")
+
+    def run(self):
+        """开始监视并转换，阻塞直到 stop() 被调用"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        for path in self._scan():
+            if self.accepts(path):
+                if self.initial:
+                    self.notify(path)
+                else:
+                    self.known[os.path.abspath(path)] = _file_state(path)
+
+        watch_thread = threading.Thread(target=self._watch_loop, daemon=True)
+        watch_thread.start()
+        pool = WorkerPool(self.max_workers, initializer=_ignore_interrupt)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    path, state = self.work_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                # 进程池忙时在这里等待，队列随之积压，满后新文件留在待处理列表中
+                while not self.in_flight.acquire(timeout=0.5):
+                    if self.stop_event.is_set():
+                        return
+                executor = pool.executor
+                try:
+                    self._submit(executor, path, state)
+                except BrokenProcessPool:
+                    # 工作进程已异常退出：换用新的进程池，文件放回待处理列表
+                    self.in_flight.release()
+                    pool.rebuild(executor)
+                    self._requeue(path, state)
+                    self._emit('info', "", "工作进程异常退出，已重建进程池")
+        finally:
+            self.stop_event.set()
+            watch_thread.join()
+            pool.shutdown()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def queue_depth(self):
+        """(工作队列中的文件数, 等待防抖的文件数)"""
+        with self.lock:
+            return self.work_queue.qsize(), len(self.pending)
+
+
+def print_event(event, path, detail=""):
+    """默认的事件输出"""
+    message = " ".join(part for part in (path, detail) if part)
+    print(f"[{time.strftime('%H:%M:%S')}] {event}: {message}", file=sys.stderr, flush=True)
@@ -1,249 +1,21 @@
-import docx
-import re
 import os
 import sys
-import pdfplumber  # PDF处理库
-import markdown  # Markdown处理
-import docxtpl  # Word模板
-from docx.shared import Pt, Inches  # Word文档样式
-from reportlab.lib.pagesizes import letter  # PDF生成
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-import pypandoc  # 通用文档转换
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, 
                            QFileDialog, QVBoxLayout, QHBoxLayout, QWidget, 
                            QTextEdit, QProgressBar, QMessageBox, QListWidget,
-                           QGroupBox, QRadioButton, QButtonGroup, QCheckBox, QTabWidget)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                           QGroupBox, QRadioButton, QButtonGroup, QCheckBox, QTabWidget,
+                           QSpinBox)
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 
-# 导入自定义模块
+# 导入自定义模块（转换后端在首次使用时才加载，见utils.py）
 from converters import ToMarkdownThread, FromMarkdownThread
-from utils import (format_text_run, convert_table_to_md, process_heading, 
+from batch import default_workers
+from cache import default_cache_dir
+from utils import (convert_table_to_md, process_heading, 
                    extract_text_from_pdf, convert_md_to_word, convert_md_to_pdf,
                    extract_text_simple, extract_text_with_sections)
 
-# 辅助函数：格式化文本运行
-def format_text_run(run):
-    """格式化单个文本段落，处理粗体、斜体和下划线"""
-    content = run.text
-    if not content.strip():
-        return ""
-        
-    if run.bold:
-        content = f"**{content}**"
-    if run.italic:
-        content = f"*{content}*"
-    if run.underline:
-        content = f"<u>{content}</u>"
-    return content
-
-# 辅助函数：处理表格
-def convert_table_to_md(table):
-    """将Word表格转换为Markdown表格"""
-    if not table.rows:
-        return ""
-        
-    # 表头
-    header_cells = table.rows[0].cells
-    header_row = [cell.text.strip() or " " for cell in header_cells]
-    
-    # 构建markdown表格
-    md_rows = [
-        "| " + " | ".join(header_row) + " |",
-        "| " + " | ".join(["---"] * len(header_row)) + " |"
-    ]
-    
-    # 表格内容
-    for row in table.rows[1:]:
-        cells = [cell.text.strip() or " " for cell in row.cells]
-        md_rows.append("| " + " | ".join(cells) + " |")
-    
-    return "\n".join(md_rows)
-
-# 辅助函数：获取标题级别和内容
-def process_heading(para):
-    """处理标题段落，返回markdown格式的标题"""
-    if para.style.name.startswith('Heading'):
-        level = int(para.style.name.replace('Heading ', ''))
-        return '#' * level + ' ' + para.text
-    return None
-
-# 从PDF提取文本
-def extract_text_from_pdf(pdf_path):
-    """从PDF文件提取文本内容"""
-    content = []
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                # 添加页码标记
-                content.append(f"## 第{page_num + 1}页")
-                
-                # 提取文本
-                text = page.extract_text()
-                if text:
-                    content.append(text)
-                
-                # 尝试提取表格
-                tables = page.extract_tables()
-                for table in tables:
-                    # 转换为Markdown表格
-                    md_table = []
-                    
-                    # 表头
-                    if table and table[0]:
-                        header_row = [cell or " " for cell in table[0]]
-                        md_table.append("| " + " | ".join(header_row) + " |")
-                        md_table.append("| " + " | ".join(["---"] * len(header_row)) + " |")
-                    
-                        # 表格内容
-                        for row in table[1:]:
-                            cells = [cell or " " for cell in row]
-                            md_table.append("| " + " | ".join(cells) + " |")
-                        
-                        content.append("\n".join(md_table))
-                
-    except Exception as e:
-        content.append(f"PDF处理错误: {str(e)}")
-    
-    return "\n\n".join(content)
-
-# 新增：将Markdown转换为Word文档
-def convert_md_to_word(md_path, output_path):
-    """
-    将Markdown文件转换为Word文档
-    :param md_path: Markdown文件路径
-    :param output_path: 输出Word文件路径
-    :return: 是否成功
-    """
-    try:
-        # 使用pypandoc转换
-        pypandoc.convert_file(
-            md_path,
-            'docx',
-            outputfile=output_path,
-            extra_args=['--reference-doc=reference.docx'] if os.path.exists('reference.docx') else []
-        )
-        return True
-    except Exception as e:
-        print(f"转换失败: {str(e)}")
-        # 备用方法：使用python-docx手动转换
-        try:
-            # 读取Markdown文件
-            with open(md_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # 创建Word文档
-            doc = docx.Document()
-            
-            # 处理标题和内容
-            lines = md_content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    doc.add_paragraph()
-                    continue
-                    
-                # 处理标题
-                if line.startswith('#'):
-                    level = 0
-                    while line.startswith('#'):
-                        level += 1
-                        line = line[1:]
-                    line = line.strip()
-                    doc.add_heading(line, level=level)
-                # 处理普通段落
-                else:
-                    p = doc.add_paragraph()
-                    # 简单处理粗体和斜体
-                    parts = re.split(r'(\*\*.*?\*\*|\*.*?\*)', line)
-                    for part in parts:
-                        if part.startswith('**') and part.endswith('**'):
-                            p.add_run(part[2:-2]).bold = True
-                        elif part.startswith('*') and part.endswith('*'):
-                            p.add_run(part[1:-1]).italic = True
-                        elif part:
-                            p.add_run(part)
-            
-            # 保存文档
-            doc.save(output_path)
-            return True
-        except Exception as e2:
-            print(f"备用方法也失败: {str(e2)}")
-            return False
-
-# 新增：将Markdown转换为PDF文档
-def convert_md_to_pdf(md_path, output_path):
-    """
-    将Markdown文件转换为PDF
-    :param md_path: Markdown文件路径
-    :param output_path: 输出PDF路径
-    :return: 是否成功
-    """
-    try:
-        # 尝试使用pypandoc
-        pypandoc.convert_file(
-            md_path,
-            'pdf',
-            outputfile=output_path
-        )
-        return True
-    except Exception as e:
-        print(f"pypandoc转换失败: {str(e)}")
-        
-        # 备用方法：使用reportlab手动转换
-        try:
-            # 读取Markdown文件
-            with open(md_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # 将Markdown转换为HTML
-            html = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
-            
-            # 创建PDF文档
-            doc = SimpleDocTemplate(output_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            
-            # 自定义标题样式
-            styles.add(ParagraphStyle(name='Heading1', fontSize=16, bold=True))
-            styles.add(ParagraphStyle(name='Heading2', fontSize=14, bold=True))
-            styles.add(ParagraphStyle(name='Heading3', fontSize=12, bold=True))
-            
-            # 解析HTML并添加到PDF
-            flowables = []
-            
-            # 简单解析HTML (这是一个非常基础的实现，真实情况需要更复杂的HTML解析)
-            lines = html.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    flowables.append(Spacer(1, 12))
-                    continue
-                
-                # 处理标题
-                if line.startswith('<h1>'):
-                    text = line.replace('<h1>', '').replace('</h1>', '')
-                    flowables.append(Paragraph(text, styles['Heading1']))
-                elif line.startswith('<h2>'):
-                    text = line.replace('<h2>', '').replace('</h2>', '')
-                    flowables.append(Paragraph(text, styles['Heading2']))
-                elif line.startswith('<h3>'):
-                    text = line.replace('<h3>', '').replace('</h3>', '')
-                    flowables.append(Paragraph(text, styles['Heading3']))
-                # 处理段落
-                elif not (line.startswith('<table>') or line.startswith('<tr>') or line.startswith('<td>')):
-                    # 移除其他HTML标签
-                    text = re.sub(r'<[^>]*>', '', line)
-                    flowables.append(Paragraph(text, styles['Normal']))
-            
-            # 构建PDF
-            doc.build(flowables)
-            return True
-        except Exception as e2:
-            print(f"备用方法也失败: {str(e2)}")
-            return False
-
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -348,6 +120,10 @@ class MainWindow(QMainWindow):
         
         mode_layout.addWidget(self.simple_mode_radio)
         mode_layout.addWidget(self.sections_mode_radio)
+        
+        # 增量转换 - 只对分割模式有效
+        self.incremental_checkbox = QCheckBox("增量转换（只重写内容变化的章节，删除已不存在的章节）")
+        mode_layout.addWidget(self.incremental_checkbox)
         self.to_md_mode_group.setLayout(mode_layout)
         layout.addWidget(self.to_md_mode_group)
         
@@ -355,6 +131,32 @@ class MainWindow(QMainWindow):
         self.to_md_merge_checkbox = QCheckBox("将多个文档合并为一个Markdown文件")
         layout.addWidget(self.to_md_merge_checkbox)
         
+        # 图片导出
+        self.to_md_images_checkbox = QCheckBox("导出图片（保存到输出目录的assets文件夹，相同图片只保存一份）")
+        layout.addWidget(self.to_md_images_checkbox)
+        
+        # 并行进程数
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("并行进程数:"))
+        self.to_md_workers_spin = QSpinBox()
+        self.to_md_workers_spin.setRange(1, max(default_workers() * 2, 1))
+        self.to_md_workers_spin.setValue(default_workers())
+        workers_layout.addWidget(self.to_md_workers_spin)
+        
+        # 单文件超时，0表示不限制
+        workers_layout.addWidget(QLabel("单文件超时(秒):"))
+        self.to_md_timeout_spin = QSpinBox()
+        self.to_md_timeout_spin.setRange(0, 24 * 3600)
+        self.to_md_timeout_spin.setSpecialValueText("不限制")
+        self.to_md_timeout_spin.setValue(0)
+        workers_layout.addWidget(self.to_md_timeout_spin)
+        workers_layout.addStretch(1)
+        layout.addLayout(workers_layout)
+        
+        # 缓存选项
+        self.to_md_cache_checkbox = QCheckBox("使用转换缓存（跳过内容未变化的文件）")
+        layout.addWidget(self.to_md_cache_checkbox)
+        
         # 连接文件类型切换事件
         self.word_type_radio.toggled.connect(self.toggle_to_md_mode_options)
         self.pdf_type_radio.toggled.connect(self.toggle_to_md_mode_options)
@@ -383,6 +185,16 @@ class MainWindow(QMainWindow):
         )
         layout.addWidget(self.to_md_convert_btn)
         
+        # 暂停/取消按钮（仅在转换过程中可用）
+        control_layout = QHBoxLayout()
+        self.to_md_pause_btn = self.create_button("暂停", self.toggle_to_md_pause)
+        self.to_md_cancel_btn = self.create_button("取消", self.cancel_to_md_conversion)
+        self.to_md_pause_btn.setEnabled(False)
+        self.to_md_cancel_btn.setEnabled(False)
+        control_layout.addWidget(self.to_md_pause_btn)
+        control_layout.addWidget(self.to_md_cancel_btn)
+        layout.addLayout(control_layout)
+        
         # 进度显示
         self.to_md_progress_label = QLabel("就绪")
         layout.addWidget(self.to_md_progress_label)
@@ -441,6 +253,10 @@ class MainWindow(QMainWindow):
         self.from_md_merge_checkbox = QCheckBox("将多个Markdown文件合并为一个输出文件")
         layout.addWidget(self.from_md_merge_checkbox)
         
+        # 缓存选项
+        self.from_md_cache_checkbox = QCheckBox("使用转换缓存（跳过内容未变化的文件）")
+        layout.addWidget(self.from_md_cache_checkbox)
+        
         # 输出目录
         dir_layout = QHBoxLayout()
         dir_layout.addWidget(QLabel("输出目录:"))
@@ -465,6 +281,16 @@ class MainWindow(QMainWindow):
         )
         layout.addWidget(self.from_md_convert_btn)
         
+        # 暂停/取消按钮（仅在转换过程中可用）
+        control_layout = QHBoxLayout()
+        self.from_md_pause_btn = self.create_button("暂停", self.toggle_from_md_pause)
+        self.from_md_cancel_btn = self.create_button("取消", self.cancel_from_md_conversion)
+        self.from_md_pause_btn.setEnabled(False)
+        self.from_md_cancel_btn.setEnabled(False)
+        control_layout.addWidget(self.from_md_pause_btn)
+        control_layout.addWidget(self.from_md_cancel_btn)
+        layout.addLayout(control_layout)
+        
         # 进度显示
         self.from_md_progress_label = QLabel("就绪")
         layout.addWidget(self.from_md_progress_label)
@@ -557,7 +383,12 @@ class MainWindow(QMainWindow):
             self.to_md_dir_path.text(), 
             mode, 
             merge_output, 
-            file_type
+            file_type,
+            self.to_md_workers_spin.value(),
+            cache_dir=default_cache_dir() if self.to_md_cache_checkbox.isChecked() else None,
+            incremental=mode == 'sections' and self.incremental_checkbox.isChecked(),
+            timeout=self.to_md_timeout_spin.value() or None,
+            extract_images=self.to_md_images_checkbox.isChecked()
         )
         self.to_md_thread.update_progress.connect(self.update_to_md_progress)
         self.to_md_thread.finished.connect(self.to_md_conversion_finished)
@@ -591,7 +422,8 @@ class MainWindow(QMainWindow):
             self.from_md_file_paths,
             self.from_md_dir_path.text(),
             target_format,
-            merge_output
+            merge_output,
+            cache_dir=default_cache_dir() if self.from_md_cache_checkbox.isChecked() else None
         )
         self.from_md_thread.update_progress.connect(self.update_from_md_progress)
         self.from_md_thread.finished.connect(self.from_md_conversion_finished)
@@ -607,7 +439,15 @@ class MainWindow(QMainWindow):
         self.pdf_type_radio.setEnabled(enabled)
         self.simple_mode_radio.setEnabled(enabled and self.word_type_radio.isChecked())
         self.sections_mode_radio.setEnabled(enabled and self.word_type_radio.isChecked())
+        self.incremental_checkbox.setEnabled(enabled and self.word_type_radio.isChecked())
         self.to_md_merge_checkbox.setEnabled(enabled)
+        self.to_md_images_checkbox.setEnabled(enabled)
+        self.to_md_workers_spin.setEnabled(enabled)
+        self.to_md_timeout_spin.setEnabled(enabled)
+        self.to_md_cache_checkbox.setEnabled(enabled)
+        self.to_md_pause_btn.setEnabled(not enabled)
+        self.to_md_pause_btn.setText("暂停")
+        self.to_md_cancel_btn.setEnabled(not enabled)
     
     def toggle_from_md_controls(self, enabled=True):
         """启用或禁用从Markdown转换选项卡的UI控件"""
@@ -617,6 +457,42 @@ class MainWindow(QMainWindow):
         self.target_word_radio.setEnabled(enabled)
         self.target_pdf_radio.setEnabled(enabled)
         self.from_md_merge_checkbox.setEnabled(enabled)
+        self.from_md_cache_checkbox.setEnabled(enabled)
+        self.from_md_pause_btn.setEnabled(not enabled)
+        self.from_md_pause_btn.setText("暂停")
+        self.from_md_cancel_btn.setEnabled(not enabled)
+    
+    def toggle_to_md_pause(self):
+        """暂停或继续转Markdown（进行中的文件会继续完成）"""
+        self.toggle_thread_pause(self.to_md_thread, self.to_md_pause_btn, self.to_md_log_area)
+    
+    def toggle_from_md_pause(self):
+        """暂停或继续从Markdown转换"""
+        self.toggle_thread_pause(self.from_md_thread, self.from_md_pause_btn, self.from_md_log_area)
+    
+    def toggle_thread_pause(self, thread, button, log_area):
+        if thread.token.paused:
+            thread.resume()
+            button.setText("暂停")
+            log_area.append("继续转换...")
+        else:
+            thread.pause()
+            button.setText("继续")
+            log_area.append("已暂停，正在处理的文件完成后不再开始新文件")
+    
+    def cancel_to_md_conversion(self):
+        """取消转Markdown，正在处理的文件会被立即终止"""
+        self.to_md_thread.cancel()
+        self.to_md_cancel_btn.setEnabled(False)
+        self.to_md_pause_btn.setEnabled(False)
+        self.to_md_log_area.append("正在取消...")
+    
+    def cancel_from_md_conversion(self):
+        """取消从Markdown转换"""
+        self.from_md_thread.cancel()
+        self.from_md_cancel_btn.setEnabled(False)
+        self.from_md_pause_btn.setEnabled(False)
+        self.from_md_log_area.append("正在取消...")
     
     def update_to_md_progress(self, value, message):
         """更新转Markdown选项卡的进度"""
@@ -641,6 +517,9 @@ class MainWindow(QMainWindow):
         if success:
             self.to_md_log_area.append(message)
             QMessageBox.information(self, "转换完成", message)
+        elif self.to_md_thread.token.cancelled:
+            self.to_md_log_area.append(message)
+            QMessageBox.information(self, "已取消", message)
         else:
             self.to_md_log_area.append(f"错误: {message}")
             QMessageBox.critical(self, "转换失败", message)
@@ -653,6 +532,9 @@ class MainWindow(QMainWindow):
         if success:
             self.from_md_log_area.append(message)
             QMessageBox.information(self, "转换完成", message)
+        elif self.from_md_thread.token.cancelled:
+            self.from_md_log_area.append(message)
+            QMessageBox.information(self, "已取消", message)
         else:
             self.from_md_log_area.append(f"错误: {message}")
             QMessageBox.critical(self, "转换失败", message)